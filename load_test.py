@@ -0,0 +1,416 @@
+"""
+Load Test Harness
+Simulates a class of students joining a session and taking the quiz.
+
+Each virtual student replays the real browser flow against a running server:
+
+    join          POST /join/                              (session code entry)
+    request_code  POST /session/<id>/request-code/         (email queued in the outbox)
+    verify_code   POST /session/<id>/verify-code/
+    register      POST /new/register/   (first run)    or
+    login         POST /new/login/      (returning student)
+    session_home  GET  /session-home/
+    quiz_load     GET  /quiz/
+    quiz_submit   POST /quiz/
+    dashboard     GET  /student-dashboard/
+
+request_code only queues the email; the process_email_outbox worker delivers
+it. With --spawn-server or --outbox-worker the harness runs that worker next
+to the server, wired to a local SMTP sink, and drains what is left of the
+outbox before counting the emails received. A request_code answered with the
+"Too many requests" throttle message counts as an error.
+
+Usage:
+    # Let the harness start the server and outbox worker (wired to a local SMTP sink)
+    # and create a session
+    python load_test.py --spawn-server --create-session --students 500 --concurrency 50 --ramp-up 30
+
+    # Against an already running server started with
+    #   SMTP_HOST=127.0.0.1 SMTP_PORT=1025 SMTP_USE_TLS=false SESSION_CODE_IP_LIMIT=1000000 \
+    #   python manage.py runserver
+    python load_test.py --session-id 7 --session-code ABCD1234 --smtp-port 1025 --outbox-worker
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from survey.smtp_sink import SMTPSink
+
+STEPS = [
+    'join', 'request_code', 'verify_code', 'register', 'login',
+    'session_home', 'quiz_load', 'quiz_submit', 'dashboard',
+]
+
+QUESTION_RE = re.compile(r'name="(text_question|question)_(\d+)"')
+
+# Shown by request_session_code when the session-code throttle refuses a request
+THROTTLED_TEXT = 'Too many requests'
+
+
+def print_section(title):
+    print("\n" + "=" * 70)
+    print(f"  {title}")
+    print("=" * 70)
+
+
+class StepFailed(Exception):
+    pass
+
+
+class Stats:
+    """Thread-safe latency and error collector, keyed by step name"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.error_samples = defaultdict(list)
+        self.flows_completed = 0
+        self._lock = threading.Lock()
+
+    def record(self, step, seconds, ok, detail=''):
+        with self._lock:
+            self.latencies[step].append(seconds)
+            if not ok:
+                self.errors[step] += 1
+                if len(self.error_samples[step]) < 3:
+                    self.error_samples[step].append(detail)
+
+    def flow_done(self):
+        with self._lock:
+            self.flows_completed += 1
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def csrf_token(session):
+    return session.cookies.get('csrftoken', '')
+
+
+class VirtualStudent:
+    """One student walking through the join + quiz flow"""
+
+    def __init__(self, base_url, session_id, session_code, email, stats, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.session_id = session_id
+        self.session_code = session_code
+        self.email = email
+        self.stats = stats
+        self.timeout = timeout
+        self.http = requests.Session()
+
+    def call(self, step, method, path, data=None, expect_status=(200,), expect_location=None, reject_text=None):
+        url = f"{self.base_url}{path}"
+        if method == 'POST':
+            data = dict(data or {})
+            data['csrfmiddlewaretoken'] = csrf_token(self.http)
+        start = time.perf_counter()
+        try:
+            response = self.http.request(
+                method, url, data=data, allow_redirects=False, timeout=self.timeout,
+                headers={'Referer': url},
+            )
+        except requests.RequestException as e:
+            self.stats.record(step, time.perf_counter() - start, False, str(e))
+            raise StepFailed(step)
+        elapsed = time.perf_counter() - start
+
+        location = response.headers.get('Location', '')
+        ok = response.status_code in expect_status
+        if ok and expect_location:
+            ok = any(fragment in location for fragment in expect_location)
+        detail = f"{response.status_code} {location}".strip()
+        if ok and reject_text and reject_text in response.text:
+            ok, detail = False, f"{detail} ({reject_text})"
+        self.stats.record(step, elapsed, ok, detail)
+        if not ok:
+            raise StepFailed(step)
+        return response
+
+    def run(self):
+        # Prime the CSRF cookie
+        self.http.get(f"{self.base_url}/join/", timeout=self.timeout)
+
+        self.call('join', 'POST', '/join/', {'session_code': self.session_code},
+                  expect_status=(302,), expect_location=['/identify/'])
+
+        self.http.get(f"{self.base_url}/session/{self.session_id}/request-code/", timeout=self.timeout)
+        self.call('request_code', 'POST', f'/session/{self.session_id}/request-code/',
+                  {'email': self.email}, reject_text=THROTTLED_TEXT)
+
+        response = self.call('verify_code', 'POST', f'/session/{self.session_id}/verify-code/',
+                             {'session_code': self.session_code, 'email': self.email},
+                             expect_status=(302,), expect_location=['/new/register/', '/new/login/'])
+
+        if '/new/register/' in response.headers['Location']:
+            self.call('register', 'POST', '/new/register/', {
+                'name': f"Load Student {self.email.split('@')[0]}",
+                'phone': f"9{random.randint(0, 999999999):09d}",
+                'password': 'loadtest123',
+            }, expect_status=(302,), expect_location=['/session-home/'])
+        else:
+            self.call('login', 'POST', '/new/login/', {'password': 'loadtest123'},
+                      expect_status=(302,), expect_location=['/session-home/'])
+
+        self.call('session_home', 'GET', '/session-home/')
+
+        quiz_page = self.call('quiz_load', 'GET', '/quiz/')
+        answers = {}
+        for kind, question_id in set(QUESTION_RE.findall(quiz_page.text)):
+            if kind == 'text_question':
+                answers[f"text_question_{question_id}"] = 'Load test answer'
+            else:
+                answers[f"question_{question_id}"] = str(random.randint(1, 4))
+        if answers:
+            self.call('quiz_submit', 'POST', '/quiz/', answers, expect_status=(200, 302))
+
+        self.call('dashboard', 'GET', '/student-dashboard/')
+        self.stats.flow_done()
+
+
+def create_session(questions):
+    """Create an active session with `questions` multiple choice questions (uses Django ORM)"""
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'questionnaire_project.settings')
+    django.setup()
+
+    from datetime import timedelta
+    from django.utils import timezone
+    from survey.models import ClassSession, Question
+
+    now = timezone.now()
+    session = ClassSession.objects.create(
+        title=f"Load Test {now:%Y-%m-%d %H:%M}",
+        teacher='Load Tester',
+        start_time=now - timedelta(minutes=1),
+        end_time=now + timedelta(hours=2),
+    )
+    Question.objects.bulk_create([
+        Question(
+            class_session=session,
+            text=f"Load test question {i + 1}?",
+            question_type='multiple_choice',
+            option1='A', option2='B', option3='C', option4='D',
+            correct_option=random.randint(1, 4),
+        )
+        for i in range(questions)
+    ])
+    return session.id, session.session_code
+
+
+def wait_for_port(host, port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.25)
+    return False
+
+
+def smtp_env(smtp_port):
+    env = dict(os.environ)
+    env.update({
+        'SMTP_HOST': '127.0.0.1',
+        'SMTP_PORT': str(smtp_port),
+        'SMTP_USE_TLS': 'false',
+        'SMTP_USE_SSL': 'false',
+    })
+    # Keep the Gmail path in smtp_email disabled so all mail goes to the sink
+    env.pop('SENDER_EMAIL', None)
+    return env
+
+
+def spawn_server(port, smtp_port):
+    env = smtp_env(smtp_port)
+    # Every virtual student comes from 127.0.0.1, so the per-IP session-code
+    # limit would refuse all but the first SESSION_CODE_IP_LIMIT of them
+    env['SESSION_CODE_IP_LIMIT'] = str(10 ** 9)
+    process = subprocess.Popen(
+        [sys.executable, 'manage.py', 'runserver', '--noreload', f'127.0.0.1:{port}'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    if not wait_for_port('127.0.0.1', port):
+        process.terminate()
+        raise SystemExit(f"Server did not start on port {port}")
+    return process
+
+
+def start_outbox_worker(smtp_port):
+    """process_email_outbox in the background, delivering to the SMTP sink"""
+    return subprocess.Popen(
+        [sys.executable, 'manage.py', 'process_email_outbox', '--poll-interval', '0.5'],
+        env=smtp_env(smtp_port), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+def drain_outbox(smtp_port):
+    """Deliver whatever is still queued, then return"""
+    subprocess.run(
+        [sys.executable, 'manage.py', 'process_email_outbox', '--once'],
+        env=smtp_env(smtp_port), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False,
+    )
+
+
+def run_load(args, session_id, session_code):
+    stats = Stats()
+    run_id = uuid.uuid4().hex[:6]
+    delay_per_student = args.ramp_up / args.students if args.students else 0
+    started = time.perf_counter()
+
+    def student_task(index):
+        # Ramp-up: student i starts i * (ramp_up / students) seconds after the run began
+        wait = started + index * delay_per_student - time.perf_counter()
+        if wait > 0:
+            time.sleep(wait)
+        email = f"{args.email_prefix}+{run_id if not args.reuse_emails else 'x'}-{index}@example.com"
+        student = VirtualStudent(args.base_url, session_id, session_code, email, stats, args.timeout)
+        try:
+            student.run()
+        except StepFailed:
+            pass
+        except Exception as e:
+            stats.record('unexpected', 0.0, False, repr(e))
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(student_task, range(args.students)))
+
+    return stats, time.perf_counter() - started
+
+
+def build_report(stats, duration, sink):
+    total_requests = sum(len(v) for v in stats.latencies.values())
+    report = {
+        'duration_s': round(duration, 3),
+        'flows_completed': stats.flows_completed,
+        'total_requests': total_requests,
+        'throughput_rps': round(total_requests / duration, 2) if duration else 0,
+        'emails_received': sink.message_count if sink else None,
+        'steps': {},
+    }
+    for step in STEPS + ['unexpected']:
+        values = sorted(stats.latencies.get(step, []))
+        if not values:
+            continue
+        report['steps'][step] = {
+            'count': len(values),
+            'errors': stats.errors.get(step, 0),
+            'error_rate': round(stats.errors.get(step, 0) / len(values), 4),
+            'p50_ms': round(percentile(values, 50) * 1000, 2),
+            'p95_ms': round(percentile(values, 95) * 1000, 2),
+            'p99_ms': round(percentile(values, 99) * 1000, 2),
+            'max_ms': round(values[-1] * 1000, 2),
+            'error_samples': stats.error_samples.get(step, []),
+        }
+    return report
+
+
+def print_report(report):
+    print_section("LOAD TEST RESULTS")
+    print(f"\nDuration:         {report['duration_s']} s")
+    print(f"Flows completed:  {report['flows_completed']}")
+    print(f"Total requests:   {report['total_requests']}")
+    print(f"Throughput:       {report['throughput_rps']} req/s")
+    if report['emails_received'] is not None:
+        print(f"Emails received:  {report['emails_received']} (local SMTP sink)")
+
+    print(f"\n{'Step':<14}{'Count':>7}{'Errors':>8}{'Err %':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    print("-" * 77)
+    for step, row in report['steps'].items():
+        print(f"{step:<14}{row['count']:>7}{row['errors']:>8}{row['error_rate'] * 100:>7.1f}%"
+              f"{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}{row['max_ms']:>10}")
+        for sample in row['error_samples']:
+            print(f"    ✗ {sample}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate a class joining a session and taking the quiz')
+    parser.add_argument('--base-url', default=None, help='Server URL (default http://127.0.0.1:<port>)')
+    parser.add_argument('--port', type=int, default=8000, help='Port for --spawn-server / default base URL')
+    parser.add_argument('--spawn-server', action='store_true',
+                        help='Start manage.py runserver and the outbox worker wired to the SMTP sink')
+    parser.add_argument('--outbox-worker', action='store_true',
+                        help='Start the process_email_outbox worker wired to the SMTP sink')
+    parser.add_argument('--smtp-port', type=int, default=1025, help='Port for the local SMTP sink (0 = disabled)')
+    parser.add_argument('--session-id', type=int, help='Existing session id')
+    parser.add_argument('--session-code', help='Existing session code')
+    parser.add_argument('--create-session', action='store_true', help='Create an active session for the run')
+    parser.add_argument('--questions', type=int, default=10, help='Questions for --create-session')
+    parser.add_argument('--students', type=int, default=100, help='Number of virtual students')
+    parser.add_argument('--concurrency', type=int, default=20, help='Students running at the same time')
+    parser.add_argument('--ramp-up', type=float, default=10.0, help='Seconds over which students start')
+    parser.add_argument('--timeout', type=float, default=30.0, help='Per-request timeout in seconds')
+    parser.add_argument('--email-prefix', default='loadtest', help='Local part prefix for generated emails')
+    parser.add_argument('--reuse-emails', action='store_true', help='Reuse emails across runs (exercises login)')
+    parser.add_argument('--json', dest='json_path', help='Also write the report as JSON to this file')
+    args = parser.parse_args()
+
+    args.base_url = args.base_url or f"http://127.0.0.1:{args.port}"
+
+    if args.create_session:
+        session_id, session_code = create_session(args.questions)
+        print(f"✓ Created session {session_id} with code {session_code}")
+    elif args.session_id and args.session_code:
+        session_id, session_code = args.session_id, args.session_code
+    else:
+        parser.error('Provide --session-id and --session-code, or use --create-session')
+
+    sink = SMTPSink(port=args.smtp_port).start() if args.smtp_port else None
+    if sink:
+        print(f"✓ SMTP sink listening on 127.0.0.1:{sink.port}")
+
+    server = worker = None
+    smtp_port = sink.port if sink else 1025
+    try:
+        if args.spawn_server:
+            server = spawn_server(args.port, smtp_port)
+            print(f"✓ Server started on {args.base_url}")
+        if args.spawn_server or args.outbox_worker:
+            worker = start_outbox_worker(smtp_port)
+            print("✓ Outbox worker started")
+
+        print(f"\n🚀 {args.students} students, concurrency {args.concurrency}, ramp-up {args.ramp_up}s")
+        stats, duration = run_load(args, session_id, session_code)
+        if worker:
+            # Stop after its current batch, then send what is left before counting
+            worker.terminate()
+            worker.wait()
+            worker = None
+            drain_outbox(smtp_port)
+        report = build_report(stats, duration, sink)
+        print_report(report)
+
+        if args.json_path:
+            with open(args.json_path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+            print(f"\n✓ Report written to {args.json_path}")
+    finally:
+        for process in (worker, server):
+            if process:
+                process.terminate()
+                process.wait()
+        if sink:
+            sink.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@
 ASGI config for questionnaire_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Served by gunicorn with uvicorn workers when SERVER_MODE=asgi (see startup.sh).
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
@@ -14,3 +15,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'questionnaire_project.settings')
 
 application = get_asgi_application()
+
+# Write buffered page hits on a timer too, so quiet workers don't hold them
+from survey.middleware import hit_buffer  # noqa: E402
+
+hit_buffer.start_background_flush()
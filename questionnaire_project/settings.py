@@ -13,7 +13,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 import os
 from decouple import config
-import dj_database_url
+
+from .databases import database_config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -57,6 +58,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'survey.middleware.RequestProfilingMiddleware',  # Opt-in request profiler
+    'survey.replicas.ReplicaRoutingMiddleware',  # Read replica routing
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'survey.middleware.HitCountMiddleware',  # Hit counter middleware
@@ -87,13 +90,21 @@ WSGI_APPLICATION = 'questionnaire_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# 'wsgi' (gunicorn sync workers) or 'asgi' (gunicorn with uvicorn workers), see startup.sh
+SERVER_MODE = config('SERVER_MODE', default='wsgi')
+
 # Check if DATABASE_URL is provided (for cloud PostgreSQL)
 DATABASE_URL = config('DATABASE_URL', default=None)
 
+# Under ASGI persistent connections would be kept per thread and never reused,
+# so without a pool they are closed after each request. Add ?pool=true to the
+# URL for a bounded connection pool per process (questionnaire_project/databases.py).
+DATABASE_CONN_MAX_AGE = 0 if SERVER_MODE == 'asgi' else 600
+
 if DATABASE_URL:
     # Use cloud PostgreSQL database
     DATABASES = {
-        'default': dj_database_url.parse(DATABASE_URL, conn_max_age=600)
+        'default': database_config(DATABASE_URL, conn_max_age=DATABASE_CONN_MAX_AGE)
     }
 else:
     # Fallback to SQLite for local development
@@ -104,6 +115,29 @@ else:
         }
     }
 
+# Optional read replicas of DATABASE_URL, comma-separated. Dashboards, exports and
+# REST lists read from them (survey/replicas.py); writes stay on 'default'.
+DATABASE_REPLICA_URLS = [url.strip() for url in config('DATABASE_REPLICA_URLS', default='').split(',') if url.strip()]
+REPLICA_DATABASES = {
+    f'replica{number}': {
+        **database_config(url, conn_max_age=DATABASE_CONN_MAX_AGE),
+        'TEST': {'MIRROR': 'default'},
+    }
+    for number, url in enumerate(DATABASE_REPLICA_URLS, start=1)
+}
+DATABASES.update(REPLICA_DATABASES)
+DATABASE_REPLICAS = list(REPLICA_DATABASES)
+DATABASE_ROUTERS = ['survey.replicas.ReplicaRouter']
+
+# GET requests to these URL names read from a replica (* matches anything)
+REPLICA_READ_VIEWS = [
+    'admin_dashboard', 'admin_session_view', 'admin_attendee_view', 'admin_broadcasts',
+    'admin_export', 'admin_session_export',
+    'admin:*_changelist',
+    'api:dashboard_stats', 'api:*-list', 'api:api-session-attendees', 'api:api-session-questions',
+]
+REPLICA_STICKY_SECONDS = 10  # After a write, that visitor reads from the primary this long (replica lag)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -161,13 +195,89 @@ DEFAULT_FROM_EMAIL = 'Quiz Portal <noreply@quizportal.com>'
 SMTP_HOST = os.environ.get('SMTP_HOST')
 if SMTP_HOST:
     # override defaults to use SMTP
-    EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+    # Pooled backend: keeps logged-in SMTP connections open between sends
+    EMAIL_BACKEND = 'survey.smtp_pool.PooledEmailBackend'
     EMAIL_HOST = os.environ.get('SMTP_HOST')
     EMAIL_PORT = int(os.environ.get('SMTP_PORT', 587))
     EMAIL_HOST_USER = os.environ.get('SMTP_USER', '')
     EMAIL_HOST_PASSWORD = os.environ.get('SMTP_PASSWORD', '')
     EMAIL_USE_TLS = os.environ.get('SMTP_USE_TLS', 'True').lower() in ('1', 'true', 'yes')
     EMAIL_USE_SSL = os.environ.get('SMTP_USE_SSL', 'False').lower() in ('1', 'true', 'yes')
+    EMAIL_TIMEOUT = int(os.environ.get('SMTP_TIMEOUT', 20))
+
+# SMTP connection pool (survey/smtp_pool.py), per worker process
+SMTP_POOL_MAX_CONNECTIONS = int(os.environ.get('SMTP_POOL_MAX_CONNECTIONS', 4))  # Open connections per account
+SMTP_POOL_MAX_IDLE = int(os.environ.get('SMTP_POOL_MAX_IDLE', 240))  # Seconds an idle connection is kept
+
+# Email outbox (survey/outbox.py): views queue mail, `manage.py process_email_outbox` sends it
+EMAIL_OUTBOX_MAX_ATTEMPTS = 6  # Then the message becomes a dead letter
+EMAIL_OUTBOX_BACKOFF_BASE = 30  # Seconds before the first retry; doubles each attempt
+EMAIL_OUTBOX_BACKOFF_MAX = 3600  # Longest wait between retries
+EMAIL_OUTBOX_DEDUPE_WINDOW = 300  # Seconds a sent message blocks an identical one to the same recipient
+EMAIL_OUTBOX_LOCK_TIMEOUT = 300  # Seconds before a message claimed by a dead worker is retried
+
+# Email bodies are rendered once per session and cached (survey/email_rendering.py)
+EMAIL_RENDER_CACHE_SIZE = 256  # Sessions x email types kept in memory
+
+# ===== Cache =====
+# Shared between gunicorn workers: Redis when REDIS_URL is set, else the database
+# cache table on PostgreSQL (`manage.py createcachetable`, run by startup.sh), else
+# per-process memory for local development.
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL}}
+elif DATABASE_URL:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'django_cache'}}
+else:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+# Cached session lookups by code and id (survey/session_codes.py)
+SESSION_CACHE_TTL = 300  # Seconds a session stays in the shared cache
+SESSION_CACHE_NEGATIVE_TTL = 30  # Seconds an unknown code is remembered as invalid
+SESSION_CACHE_LOCAL_TTL = 5  # Seconds a worker trusts its in-process copy (bounds staleness after edits)
+SESSION_CACHE_LOCAL_SIZE = 1024  # Entries in the in-process LRU
+
+# Key for the session-code permutation (survey/session_codes.py). Changing it
+# changes which codes future sessions get; defaults to a random key generated
+# and stored in the database with the code counter.
+SESSION_CODE_KEY = os.environ.get('SESSION_CODE_KEY', '')
+
+# Homepage session listing cache (survey/homepage.py); entries also expire at
+# the next session start or end
+HOMEPAGE_CACHE_MAX_TTL = 300
+
+# Admin dashboard and API ?search= results come from the search index (survey/search.py)
+SEARCH_MAX_RESULTS = 500  # Best matches kept per search
+
+# Admin CSV/XLSX exports stream rows in chunks of this many (survey/exports.py)
+EXPORT_CHUNK_SIZE = 2000
+
+# Page hits are buffered and written in bulk (survey/middleware.py)
+HIT_BUFFER_SIZE = 50  # Hits per bulk INSERT
+HIT_BUFFER_SECONDS = 10  # ...or sooner, once the oldest waiting hit is this old
+
+# Live session updates over Server-Sent Events (survey/live.py)
+LIVE_POLL_INTERVAL = 1.0  # Seconds between a stream's checks for new events (cache reads only)
+LIVE_STREAM_TIMEOUT = 300  # Seconds before an ASGI stream closes and the browser reconnects
+LIVE_RETRY_MS = 2000  # Reconnect delay the browser is told to use after an ASGI stream
+# WSGI never holds a stream (it would tie up a worker): each request gets a
+# snapshot and the browser asks again after this many milliseconds
+LIVE_SNAPSHOT_RETRY_MS = 10000
+LIVE_HEARTBEAT_INTERVAL = 15  # Seconds of silence before a keep-alive comment is sent
+LIVE_EVENT_TTL = 300  # Seconds a published event stays readable
+
+# Session-code email limits (survey/throttle.py)
+SESSION_CODE_EMAIL_LIMIT = 1  # Emails per address and session...
+SESSION_CODE_EMAIL_WINDOW = 300  # ...per this many seconds; repeats get "already sent"
+# A classroom behind one NAT address shares this limit, so it is generous: the
+# per-email limit is the main guard
+SESSION_CODE_IP_LIMIT = int(os.environ.get('SESSION_CODE_IP_LIMIT', 100))  # Requests per client IP and session...
+SESSION_CODE_IP_WINDOW = 600  # ...per this many seconds; more are refused
+
+# Reverse proxies in front of the app that append to X-Forwarded-For. The client
+# IP is taken that many entries from the right; with 0 the header is ignored
+# (anyone can send it) and REMOTE_ADDR is used.
+TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT', 0))
 
 # ========================================
 # TO SEE YOUR SESSION CODE (file backend):
@@ -177,6 +287,16 @@ if SMTP_HOST:
 # 4. Copy the session code from the file
 # ========================================
 
+# ===== Request Profiling =====
+# Admins can profile any page by adding ?_profile=1 (or the X-Profile-Request: 1 header).
+# Set REQUEST_PROFILING_SAMPLE_RATE (0.0 - 1.0) to also profile a random fraction of
+# requests to the views listed below. Profiles are listed at /manage/profiles/.
+REQUEST_PROFILING_DIR = BASE_DIR / 'profiles'
+REQUEST_PROFILING_SAMPLE_RATE = float(os.environ.get('REQUEST_PROFILING_SAMPLE_RATE', 0))
+REQUEST_PROFILING_VIEWS = ['admin_dashboard', 'quiz', 'api:*']  # URL names; trailing * matches a prefix
+REQUEST_PROFILING_INTERVAL = 0.005  # Seconds between stack samples
+REQUEST_PROFILING_KEEP = 200  # Older profiles are deleted
+
 # ===== REST Framework Configuration =====
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
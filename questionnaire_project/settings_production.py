@@ -5,7 +5,8 @@ This file overrides settings.py for production environment
 
 from .settings import *
 import os
-import dj_database_url
+
+from .databases import database_config
 
 # Security Settings
 DEBUG = False
@@ -23,19 +24,20 @@ SECURE_BROWSER_XSS_FILTER = True
 SECURE_CONTENT_TYPE_NOSNIFF = True
 X_FRAME_OPTIONS = 'DENY'
 
+# Azure App Service's front end adds the client address to X-Forwarded-For
+TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT', 1))
+
 # HSTS Settings
 SECURE_HSTS_SECONDS = 31536000
 SECURE_HSTS_INCLUDE_SUBDOMAINS = True
 SECURE_HSTS_PRELOAD = True
 
 # Database - Use Azure PostgreSQL
+# (add ?pool=true&pool_max_size=N to DATABASE_URL for a connection pool, see databases.py)
 DATABASES = {
-    'default': dj_database_url.parse(
-        os.environ.get('DATABASE_URL'),
-        conn_max_age=600,
-        conn_health_checks=True,
-    )
+    'default': database_config(os.environ.get('DATABASE_URL'), conn_max_age=DATABASE_CONN_MAX_AGE)
 }
+DATABASES.update(REPLICA_DATABASES)
 
 # CORS Settings for React Frontend
 CORS_ALLOWED_ORIGINS = os.environ.get('CORS_ALLOWED_ORIGINS', '').split(',')
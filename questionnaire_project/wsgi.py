@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'questionnaire_project.settings')
 
 application = get_wsgi_application()
+
+# Write buffered page hits on a timer too, so quiet workers don't hold them
+from survey.middleware import hit_buffer  # noqa: E402
+
+hit_buffer.start_background_flush()
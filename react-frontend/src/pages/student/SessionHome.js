@@ -42,6 +42,39 @@ const SessionHome = () => {
     fetchSessionData();
   }, [id]);
 
+  // Live updates from the server: edited times, progress and deletion
+  useEffect(() => {
+    if (!attendeeId || !window.EventSource) return;
+
+    const events = APIService.openSessionEvents(id, attendeeId);
+
+    events.addEventListener('state', (event) => {
+      const state = JSON.parse(event.data);
+      setSession((current) => (
+        current && (current.start_time !== state.start_time || current.end_time !== state.end_time)
+          ? { ...current, start_time: state.start_time, end_time: state.end_time }
+          : current
+      ));
+    });
+
+    events.addEventListener('progress', (event) => {
+      const stats = JSON.parse(event.data);
+      setProgress((current) => ({
+        ...current,
+        total_questions: stats.total,
+        answered: stats.answered,
+        pending: stats.pending,
+      }));
+    });
+
+    events.addEventListener('gone', () => {
+      events.close();
+      setError('This session is no longer available.');
+    });
+
+    return () => events.close();
+  }, [id, attendeeId]);
+
   useEffect(() => {
     if (session) {
       updateSessionStatus();
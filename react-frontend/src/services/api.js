@@ -177,6 +177,18 @@ class APIService {
     return response.data;
   }
 
+  /**
+   * Open a live stream of session status (and the attendee's progress)
+   * Events: 'state', 'progress', 'questions', 'gone' - see survey/live.py
+   * @param {number} sessionId 
+   * @param {number} attendeeId - Optional: also stream this attendee's progress
+   * @returns {EventSource} - call close() when done
+   */
+  openSessionEvents(sessionId, attendeeId) {
+    const query = attendeeId ? `?attendee=${attendeeId}` : '';
+    return new EventSource(`${API_BASE_URL}/sessions/${sessionId}/events/${query}`);
+  }
+
   /**
    * Get currently active sessions
    */
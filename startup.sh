@@ -15,14 +15,34 @@ python manage.py collectstatic --noinput
 # Run database migrations
 python manage.py migrate --noinput
 
+# Shared cache table (used when REDIS_URL is not set)
+python manage.py createcachetable
+
 # Create superuser if not exists (optional)
 # python manage.py createsuperuser --noinput || true
 
+# Start the email outbox worker in the background
+python manage.py process_email_outbox &
+
 # Start Gunicorn
-gunicorn questionnaire_project.wsgi:application \
-    --bind 0.0.0.0:8000 \
-    --workers 4 \
-    --timeout 120 \
-    --access-logfile '-' \
-    --error-logfile '-' \
-    --log-level info
+# SERVER_MODE=asgi runs uvicorn workers instead of sync ones: async views and
+# live session streams then wait without holding a worker, so one process can
+# serve thousands of waiting students.
+if [ "$SERVER_MODE" = "asgi" ]; then
+    gunicorn questionnaire_project.asgi:application \
+        --worker-class uvicorn_worker.UvicornWorker \
+        --bind 0.0.0.0:8000 \
+        --workers 4 \
+        --timeout 120 \
+        --access-logfile '-' \
+        --error-logfile '-' \
+        --log-level info
+else
+    gunicorn questionnaire_project.wsgi:application \
+        --bind 0.0.0.0:8000 \
+        --workers 4 \
+        --timeout 120 \
+        --access-logfile '-' \
+        --error-logfile '-' \
+        --log-level info
+fi
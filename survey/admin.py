@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ClassSession, Attendee, Question, Response, Review, Admin
+from .models import ClassSession, Attendee, Question, Response, Review, Admin, EmailOutbox
 from django.db import models
 from django.contrib.auth.models import Group, User
 
@@ -89,7 +89,7 @@ class ResponseAdmin(admin.ModelAdmin):
     list_display = ['attendee', 'class_session', 'question', 'selected_option', 'is_correct']
     readonly_fields = ['attendee', 'question', 'selected_option']
     search_fields = ['attendee__name', 'attendee__email', 'question__text']
-    list_filter = ['question__class_session', 'selected_option']
+    list_filter = ['class_session', 'selected_option']
     list_per_page = 30
     actions = ['delete_selected']
 
@@ -185,6 +185,22 @@ class AdminModelAdmin(admin.ModelAdmin):
     date_hierarchy = 'created_at'
     actions = ['delete_selected']
 
+# 🔹 Email outbox: inspect queued/dead mail and requeue dead letters
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ['to_email', 'kind', 'subject', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at']
+    list_filter = ['status', 'kind']
+    search_fields = ['to_email', 'subject', 'dedupe_key']
+    readonly_fields = ['created_at', 'sent_at', 'locked_at', 'last_error']
+    date_hierarchy = 'created_at'
+    actions = ['requeue_selected']
+
+    def requeue_selected(self, request, queryset):
+        from .outbox import requeue_dead
+        count = requeue_dead(queryset)
+        self.message_user(request, f"Requeued {count} dead-letter message(s)")
+    requeue_selected.short_description = 'Requeue selected dead letters'
+
 # 🔹 Clean up default admin
 admin.site.unregister(Group)
 admin.site.unregister(User)
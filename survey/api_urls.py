@@ -15,7 +15,7 @@ from .rest_api_views import (
 )
 
 # Import from api_views
-from .api_views import check_participant_exists, send_session_code_email, verify_session_code_with_email, student_login_api, get_attendee_completed_sessions
+from .api_views import check_participant_exists, send_session_code_email, verify_session_code_with_email, student_login_api, get_attendee_completed_sessions, session_events_api
 
 # Create router for ViewSets - Student + Admin endpoints
 router = DefaultRouter()
@@ -41,6 +41,7 @@ urlpatterns = [
     # AJAX endpoints for session access
     path('sessions/send_code/', send_session_code_email, name='send_session_code'),
     path('sessions/verify_code/', verify_session_code_with_email, name='verify_session_code'),
+    path('sessions/<int:session_id>/events/', session_events_api, name='session_events'),
     path('student/login/', student_login_api, name='student_login_api'),
     path('student/<int:attendee_id>/completed-sessions/', get_attendee_completed_sessions, name='attendee_completed_sessions'),
 
@@ -1,12 +1,17 @@
 ﻿"""
 API views for AJAX requests
 """
+from asgiref.sync import sync_to_async
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
-from django.core.mail import send_mail
-from django.conf import settings
 from .models import Attendee, ClassSession
+from .email_rendering import render_email
+from . import live
+from .middleware import get_client_ip
+from .outbox import enqueue_email
+from .session_codes import alookup_session_code
+from .throttle import check_session_code_request, format_wait
 import json
 
 
@@ -61,7 +66,7 @@ def check_participant_exists(request):
 
 @csrf_exempt
 @require_http_methods(["POST"])
-def send_session_code_email(request):
+async def send_session_code_email(request):
     """
     Send session code to user's email
     Request body: { "email": "user@example.com", "session_code": "ABC12345" }
@@ -78,37 +83,35 @@ def send_session_code_email(request):
             }, status=400)
 
         # Verify session code exists
-        try:
-            session = ClassSession.objects.get(session_code=session_code)
-        except ClassSession.DoesNotExist:
+        session = await alookup_session_code(session_code)
+        if session is None:
             return JsonResponse({
                 'success': False,
                 'message': 'Invalid session code.'
             }, status=404)
 
-        # Send email
-        subject = f'Your Session Code for {session.title}'
-        message = f"""
-Hello,
-
-You requested to join the session: {session.title}
-Teacher: {session.teacher}
-
-Your session code is: {session_code}
-
-Please use this code to complete your registration.
+        outcome, retry_after = await sync_to_async(check_session_code_request)(email, session, get_client_ip(request))
+        if outcome == 'rate_limited':
+            response = JsonResponse({
+                'success': False,
+                'message': f'Too many requests. Please try again in {format_wait(retry_after)}.',
+                'retry_after': retry_after,
+            }, status=429)
+            response['Retry-After'] = str(retry_after)
+            return response
+        if outcome == 'already_sent':
+            return JsonResponse({
+                'success': True,
+                'already_sent': True,
+                'message': f'Session code already sent to {email}. Please check your inbox.',
+                'retry_after': retry_after,
+            })
 
-Best regards,
-Workshop Team
-        """
+        # Send email
+        subject, message, _ = render_email('session_code_request', session=session)
 
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [email],
-            fail_silently=False,
-        )
+        # Queued; the process_email_outbox worker delivers it
+        await sync_to_async(enqueue_email)(email, subject, message, kind='session_code', class_session=session)
 
         return JsonResponse({
             'success': True,
@@ -124,7 +127,7 @@ Workshop Team
 
 @csrf_exempt
 @require_http_methods(["POST"])
-def verify_session_code_with_email(request):
+async def verify_session_code_with_email(request):
     """
     Verify session code and check if user is new or existing
     Request body: { 
@@ -146,9 +149,8 @@ def verify_session_code_with_email(request):
             }, status=400)
 
         # Verify session code exists
-        try:
-            session = ClassSession.objects.get(session_code=session_code)
-        except ClassSession.DoesNotExist:
+        session = await alookup_session_code(session_code)
+        if session is None:
             return JsonResponse({
                 'valid': False,
                 'message': 'Invalid session code. Please check and try again.'
@@ -162,7 +164,7 @@ def verify_session_code_with_email(request):
             }, status=400)
 
         # Check if user already exists
-        user_exists = Attendee.objects.filter(email__iexact=email).exists()
+        user_exists = await Attendee.objects.filter(email__iexact=email).aexists()
 
         return JsonResponse({
             'valid': True,
@@ -277,7 +279,7 @@ def get_attendee_completed_sessions(request, attendee_id):
         completed_session_ids = Response.objects.filter(
             attendee=attendee
         ).values_list(
-            'question__class_session_id', flat=True
+            'class_session_id', flat=True
         ).distinct()
         
         return JsonResponse({
@@ -296,3 +298,19 @@ def get_attendee_completed_sessions(request, attendee_id):
             'success': False,
             'message': f'Error: {str(e)}'
         }, status=500)
+
+
+@require_http_methods(["GET"])
+async def session_events_api(request, session_id):
+    """
+    Live session status as Server-Sent Events (see survey/live.py)
+    Pass ?attendee=<id> to also receive that attendee's progress
+    """
+    attendee_id = request.GET.get('attendee')
+    if attendee_id and not attendee_id.isdigit():
+        return JsonResponse({
+            'success': False,
+            'message': 'attendee must be an attendee id'
+        }, status=400)
+    watcher = live.SessionWatcher(session_id, int(attendee_id) if attendee_id else None)
+    return live.stream_response(request, watcher)
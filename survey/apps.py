@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class SurveyConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'survey'
+
+    def ready(self):
+        # Connects the signals that keep the session lookup and homepage
+        # caches and the search index fresh, and publish live session updates
+        from . import homepage, live, search, session_codes  # noqa: F401
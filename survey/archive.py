@@ -0,0 +1,487 @@
+"""
+Columnar archives of finished sessions and old page hits
+
+An archive is one binary file holding several tables column by column, so
+repeated values compress well and analytics can read just the columns they
+need. The layout (all integers little-endian):
+
+    b'SVYARC01'
+    column blocks, each starting on an 8-byte boundary
+    footer: UTF-8 JSON describing tables, row groups and blocks
+    footer length (uint64)
+    b'SVYARC01'
+
+Tables are written in row groups of ROW_GROUP_SIZE rows, so writing never
+holds more than one group in memory. Within a group each column is:
+
+- int64 / float64: a typed array (ids and foreign keys are int64)
+- bool: one byte per row
+- datetime: int64 microseconds since the Unix epoch, UTC
+- str: int64 end offsets plus one UTF-8 blob
+- dict: int32 codes into a str dictionary, chosen automatically when a
+  column repeats its values (paths, user agents, IPs)
+
+Columns with missing values get a one-byte-per-row null mask. Blocks are
+zlib-compressed unless the archive is written with compress=False; the
+arrays of an uncompressed archive can be read in place from a memory map
+(ArchiveReader.array returns a zero-copy memoryview).
+
+archive_sessions (management command) writes, inspects and loads archives;
+loading reuses the import_data chunk import (survey/transfer.py), so ids are
+remapped and an interrupted load can be resumed.
+"""
+import datetime
+import json
+import mmap
+import struct
+import sys
+import uuid
+import zlib
+from array import array
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.db import models
+from django.utils import timezone
+
+from .deletion import _raw_delete
+from .models import (
+    Attendee, Broadcast, ClassSession, EmailOutbox, HitCounter, Question, QuizProgress, Response, Review,
+    SessionAttendance, TransferIdMap,
+)
+from .transfer import MODELS, _default_use_copy, _id_map, import_chunk
+
+MAGIC = b'SVYARC01'
+VERSION = 1
+ROW_GROUP_SIZE = 65536
+ALIGNMENT = 8
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+# Dictionary-encode a string column when it has at most this share of distinct values
+DICTIONARY_RATIO = 0.5
+
+ARRAY_CODES = {'int64': 'q', 'float64': 'd', 'codes': 'i', 'offsets': 'q'}
+
+
+def column_type(field):
+    """Archive column type for a model field"""
+    if isinstance(field, models.BooleanField):
+        return 'bool'
+    if isinstance(field, models.DateTimeField):
+        return 'datetime'
+    if isinstance(field, models.FloatField):
+        return 'float64'
+    if isinstance(field, (models.IntegerField, models.AutoField, models.ForeignKey)):
+        return 'int64'
+    return 'str'
+
+
+def model_columns(model, names=None):
+    return [
+        (field.attname, column_type(field)) for field in model._meta.concrete_fields
+        if names is None or field.attname in names
+    ]
+
+
+def _to_bytes(values, kind):
+    data = array(ARRAY_CODES[kind], values)
+    if sys.byteorder == 'big':
+        data.byteswap()
+    return data.tobytes()
+
+
+def _from_bytes(buffer, kind):
+    data = array(ARRAY_CODES[kind])
+    data.frombytes(buffer)
+    if sys.byteorder == 'big':
+        data.byteswap()
+    return data
+
+
+def _encode_strings(values):
+    blob = bytearray()
+    ends = []
+    for value in values:
+        blob += value.encode('utf-8')
+        ends.append(len(blob))
+    return _to_bytes(ends, 'offsets'), bytes(blob)
+
+
+def _decode_strings(ends_buffer, blob):
+    ends = _from_bytes(ends_buffer, 'offsets')
+    values = []
+    start = 0
+    for end in ends:
+        values.append(blob[start:end].decode('utf-8'))
+        start = end
+    return values
+
+
+def _microseconds(value):
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value, datetime.timezone.utc)
+    return (value - EPOCH) // datetime.timedelta(microseconds=1)
+
+
+# ============= WRITING =============
+
+class ArchiveWriter:
+    """Write tables to an archive file; use as a context manager or call close()"""
+
+    def __init__(self, path, compress=True, meta=None):
+        self.file = open(path, 'wb')
+        self.file.write(MAGIC)
+        self.compress = compress
+        self.footer = {
+            'version': VERSION,
+            'source': uuid.uuid4().hex,
+            'created_at': timezone.now().isoformat(),
+            'meta': meta or {},
+            'tables': {},
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.file.close()
+
+    def _block(self, data):
+        padding = -self.file.tell() % ALIGNMENT
+        self.file.write(b'\0' * padding)
+        offset = self.file.tell()
+        stored = zlib.compress(data, 6) if self.compress else data
+        self.file.write(stored)
+        return {'offset': offset, 'length': len(stored), 'size': len(data),
+                'codec': 'zlib' if self.compress else 'none'}
+
+    def _column(self, values, kind):
+        block = {}
+        if any(value is None for value in values):
+            block['nulls'] = self._block(bytes(value is None for value in values))
+        if kind in ('int64', 'float64'):
+            zero = 0 if kind == 'int64' else 0.0
+            block['data'] = self._block(_to_bytes([zero if v is None else v for v in values], kind))
+        elif kind == 'bool':
+            block['data'] = self._block(bytes(bool(v) for v in values))
+        elif kind == 'datetime':
+            block['data'] = self._block(_to_bytes([0 if v is None else _microseconds(v) for v in values], 'int64'))
+        else:
+            values = ['' if v is None else str(v) for v in values]
+            distinct = {}
+            for value in values:
+                distinct.setdefault(value, len(distinct))
+            if len(distinct) <= max(1, len(values) * DICTIONARY_RATIO):
+                ends, blob = _encode_strings(list(distinct))
+                block['encoding'] = 'dict'
+                block['data'] = self._block(_to_bytes([distinct[v] for v in values], 'codes'))
+                block['dictionary'] = {'ends': self._block(ends), 'blob': self._block(blob)}
+            else:
+                ends, blob = _encode_strings(values)
+                block['encoding'] = 'plain'
+                block['ends'] = self._block(ends)
+                block['data'] = self._block(blob)
+        return block
+
+    def write_table(self, label, columns, rows, row_group_size=ROW_GROUP_SIZE):
+        """
+        Write ``rows`` (dicts, or tuples in ``columns`` order) as table ``label``.
+        ``columns`` is [(name, type)]. Returns the row count.
+        """
+        table = {'rows': 0, 'columns': columns, 'groups': []}
+        self.footer['tables'][label] = table
+        names = [name for name, _ in columns]
+        group = []
+
+        def flush():
+            if not group:
+                return
+            if isinstance(group[0], dict):
+                series = [[row[name] for row in group] for name in names]
+            else:
+                series = list(zip(*group))
+            table['groups'].append({
+                'rows': len(group),
+                'columns': {name: self._column(list(values), kind)
+                            for (name, kind), values in zip(columns, series)},
+            })
+            table['rows'] += len(group)
+            group.clear()
+
+        for row in rows:
+            group.append(row)
+            if len(group) >= row_group_size:
+                flush()
+        flush()
+        return table['rows']
+
+    def close(self):
+        footer = json.dumps(self.footer).encode('utf-8')
+        self.file.write(footer)
+        self.file.write(struct.pack('<Q', len(footer)))
+        self.file.write(MAGIC)
+        self.file.close()
+
+
+# ============= READING =============
+
+class ArchiveReader:
+    """Read an archive through a memory map"""
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(MAGIC)] != MAGIC or self.map[-len(MAGIC):] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a session archive")
+        (length,) = struct.unpack('<Q', self.map[-len(MAGIC) - 8:-len(MAGIC)])
+        end = len(self.map) - len(MAGIC) - 8
+        self.footer = json.loads(bytes(self.map[end - length:end]).decode('utf-8'))
+        self.tables = self.footer['tables']
+        self.source = self.footer['source']
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if not self.map.closed:
+            self.map.close()
+        self.file.close()
+
+    def _bytes(self, block):
+        view = memoryview(self.map)[block['offset']:block['offset'] + block['length']]
+        if block['codec'] == 'zlib':
+            return zlib.decompress(view)
+        return view
+
+    def array(self, label, name, group=0):
+        """
+        The raw array of a numeric, bool or datetime column in one row group:
+        a zero-copy memoryview of the map for uncompressed archives
+        (int64, float64, or bytes for bool). Release the view before closing
+        the reader.
+        """
+        kind = dict(self.tables[label]['columns'])[name]
+        data = self._bytes(self.tables[label]['groups'][group]['columns'][name]['data'])
+        if kind == 'bool':
+            return memoryview(data)
+        kind = 'float64' if kind == 'float64' else 'int64'
+        if sys.byteorder == 'big':
+            return memoryview(_from_bytes(data, kind))
+        return memoryview(data).cast(ARRAY_CODES[kind])
+
+    def _decode(self, block, kind):
+        if kind in ('int64', 'float64'):
+            values = list(_from_bytes(self._bytes(block['data']), kind))
+        elif kind == 'bool':
+            values = [bool(byte) for byte in self._bytes(block['data'])]
+        elif kind == 'datetime':
+            values = [EPOCH + datetime.timedelta(microseconds=v)
+                      for v in _from_bytes(self._bytes(block['data']), 'int64')]
+        elif block['encoding'] == 'dict':
+            dictionary = _decode_strings(
+                self._bytes(block['dictionary']['ends']), bytes(self._bytes(block['dictionary']['blob'])),
+            )
+            values = [dictionary[code] for code in _from_bytes(self._bytes(block['data']), 'codes')]
+        else:
+            values = _decode_strings(self._bytes(block['ends']), bytes(self._bytes(block['data'])))
+        if 'nulls' in block:
+            nulls = self._bytes(block['nulls'])
+            values = [None if nulls[i] else value for i, value in enumerate(values)]
+        return values
+
+    def column(self, label, name):
+        """Every value of one column, decoded"""
+        kind = dict(self.tables[label]['columns'])[name]
+        values = []
+        for group in self.tables[label]['groups']:
+            values.extend(self._decode(group['columns'][name], kind))
+        return values
+
+    def row_groups(self, label):
+        """The table's rows as lists of dicts, one list per row group"""
+        columns = self.tables[label]['columns']
+        names = [name for name, _ in columns]
+        for group in self.tables[label]['groups']:
+            series = [self._decode(group['columns'][name], kind) for name, kind in columns]
+            yield [dict(zip(names, values)) for values in zip(*series)]
+
+    def sizes(self, label):
+        """(stored, uncompressed) bytes of a table"""
+        stored = raw = 0
+
+        def walk(node):
+            nonlocal stored, raw
+            if 'offset' in node:
+                stored += node['length']
+                raw += node['size']
+                return
+            for value in node.values():
+                if isinstance(value, dict):
+                    walk(value)
+
+        for group in self.tables[label]['groups']:
+            walk(group['columns'])
+        return stored, raw
+
+
+# ============= SESSIONS =============
+
+# Outbox rows outlive their session (the deletion only clears these links), so
+# only the links are archived, with the fields that identify the row again
+OUTBOX_LINK_COLUMNS = {'id', 'to_email', 'created_at', 'class_session_id', 'broadcast_id'}
+
+
+def session_querysets(session_ids):
+    """
+    {label: queryset} of everything deleting the sessions removes or unlinks
+    (see deletion.session_steps), parents first
+    """
+    in_sessions = models.Q(class_session_id__in=session_ids) | models.Q(attendee__class_session_id__in=session_ids)
+    return {
+        'survey.ClassSession': ClassSession.objects.filter(id__in=session_ids),
+        'survey.Attendee': Attendee.objects.filter(class_session_id__in=session_ids),
+        'survey.Question': Question.objects.filter(class_session_id__in=session_ids),
+        'survey.Response': Response.objects.filter(
+            models.Q(question__class_session_id__in=session_ids) | models.Q(attendee__class_session_id__in=session_ids)
+        ),
+        'survey.QuizProgress': QuizProgress.objects.filter(in_sessions),
+        'survey.SessionAttendance': SessionAttendance.objects.filter(in_sessions),
+        'survey.Review': Review.objects.filter(attendee__class_session_id__in=session_ids),
+        'survey.Broadcast': Broadcast.objects.filter(class_session_id__in=session_ids),
+        'survey.EmailOutbox': EmailOutbox.objects.filter(
+            models.Q(class_session_id__in=session_ids) | models.Q(broadcast__class_session_id__in=session_ids)
+        ),
+    }
+
+
+def write_archive(path, session_ids=(), hits_before=None, compress=True, chunk_size=2000, progress=None):
+    """
+    Archive the sessions with everything that hangs off them, plus the page
+    hits older than ``hits_before`` (if given). Returns the archive's footer.
+    ``progress(label, rows)`` is called after each table.
+    """
+    querysets = session_querysets(list(session_ids)) if session_ids else {}
+    if hits_before is not None:
+        querysets['survey.HitCounter'] = HitCounter.objects.filter(timestamp__lt=hits_before)
+
+    meta = {'sessions': sorted(session_ids), 'hits_before': hits_before.isoformat() if hits_before else None}
+    with ArchiveWriter(path, compress=compress, meta=meta) as writer:
+        for label, queryset in querysets.items():
+            columns = model_columns(queryset.model, OUTBOX_LINK_COLUMNS if label == 'survey.EmailOutbox' else None)
+            rows = (
+                queryset.order_by('pk').values_list(*[name for name, _ in columns])
+                .iterator(chunk_size=chunk_size)
+            )
+            count = writer.write_table(label, columns, rows)
+            if progress:
+                progress(label, count)
+    return writer.footer
+
+
+def load_archive(path, using='default', chunk_size=2000, progress=None):
+    """
+    Load an archive back through transfer.import_chunk: rows get new ids,
+    sessions whose code still exists are merged, and loading the same archive
+    again skips what is already there. Rows pointing at a session or attendee
+    that isn't in the archive are skipped. Page hits keep their user if the
+    account still exists, and outbox rows that still exist get their session
+    and broadcast links back. Returns {label: counts}.
+    """
+    use_copy = _default_use_copy(using)
+    results = {}
+    with ArchiveReader(path) as reader:
+        if 'survey.HitCounter' in reader.tables:
+            # Users aren't archived: map the hits' users onto the accounts that still exist
+            user_ids = set(reader.column('survey.HitCounter', 'user_id')) - {None}
+            existing = User.objects.using(using).filter(id__in=user_ids).values_list('id', flat=True)
+            TransferIdMap.objects.using(using).bulk_create(
+                [TransferIdMap(source=reader.source, model='auth.User', old_id=pk, new_id=pk) for pk in existing],
+                ignore_conflicts=True,
+            )
+        for label in MODELS:
+            if label not in reader.tables:
+                continue
+            model = apps.get_model(label)
+            counts = {'created': 0, 'merged': 0, 'skipped': 0, 'resumed': 0}
+            for rows in reader.row_groups(label):
+                for start in range(0, len(rows), chunk_size):
+                    chunk = import_chunk(model, label, rows[start:start + chunk_size], reader.source,
+                                         using=using, use_copy=use_copy)
+                    for key, value in chunk.items():
+                        counts[key] += value
+            results[label] = counts
+            if progress:
+                progress(label, counts)
+        if 'survey.EmailOutbox' in reader.tables:
+            results['survey.EmailOutbox'] = relink_outbox(reader, using)
+            if progress:
+                progress('survey.EmailOutbox', results['survey.EmailOutbox'])
+    if 'survey.Broadcast' in results:
+        # The sessions have ended: don't let the worker pick an unfinished broadcast up again
+        loaded = TransferIdMap.objects.using(using).filter(source=reader.source, model='survey.Broadcast')
+        Broadcast.objects.using(using).filter(
+            id__in=loaded.values('new_id'), status__in=[Broadcast.STATUS_PENDING, Broadcast.STATUS_RUNNING],
+        ).update(status=Broadcast.STATUS_CANCELLED)
+    if 'survey.Response' in results:
+        # Archives written before Response.class_session existed don't have it
+        Response.objects.using(using).fill_class_session()
+    return results
+
+
+def relink_outbox(reader, using='default'):
+    """
+    Point the outbox rows archived with their sessions back at the loaded
+    sessions and broadcasts. A row is relinked only while it is still there
+    (same id, recipient and creation time) and unlinked. Returns counts:
+    merged (relinked), resumed (already linked) and skipped (gone).
+    """
+    counts = {'created': 0, 'merged': 0, 'skipped': 0, 'resumed': 0}
+    outbox = EmailOutbox.objects.using(using)
+    for rows in reader.row_groups('survey.EmailOutbox'):
+        sessions = _id_map(
+            reader.source, 'survey.ClassSession', {row['class_session_id'] for row in rows} - {None}, using)
+        broadcasts = _id_map(reader.source, 'survey.Broadcast', {row['broadcast_id'] for row in rows} - {None}, using)
+        current = {
+            pk: (to_email, created_at, class_session_id, broadcast_id)
+            for pk, to_email, created_at, class_session_id, broadcast_id in outbox.filter(
+                id__in=[row['id'] for row in rows]
+            ).values_list('id', 'to_email', 'created_at', 'class_session_id', 'broadcast_id')
+        }
+        # One UPDATE per (session, broadcast) pair, not per row
+        links = {}
+        for row in rows:
+            target = (sessions.get(row['class_session_id']), broadcasts.get(row['broadcast_id']))
+            found = current.get(row['id'])
+            if not found or found[:2] != (row['to_email'], row['created_at']):
+                counts['skipped'] += 1
+            elif found[2:] == target:
+                counts['resumed'] += 1
+            elif found[2:] == (None, None):
+                links.setdefault(target, []).append(row['id'])
+            else:
+                counts['skipped'] += 1
+        for (class_session_id, broadcast_id), ids in links.items():
+            counts['merged'] += outbox.filter(id__in=ids, class_session=None, broadcast=None).update(
+                class_session_id=class_session_id, broadcast_id=broadcast_id,
+            )
+    return counts
+
+
+def delete_archived_hits(path, chunk_size=2000):
+    """Delete the page hits stored in an archive, ``chunk_size`` per query. Returns the count."""
+    deleted = 0
+    with ArchiveReader(path) as reader:
+        if 'survey.HitCounter' not in reader.tables:
+            return 0
+        ids = reader.column('survey.HitCounter', 'id')
+    for start in range(0, len(ids), chunk_size):
+        deleted += _raw_delete(HitCounter, ids[start:start + chunk_size])
+    return deleted
@@ -0,0 +1,292 @@
+"""
+Hot-path benchmarks
+
+Wall-clock benchmarks for the pages and serializers that carry most of the
+traffic. Run them with ``python manage.py run_benchmarks``; results are written
+as JSON and can be compared against a stored baseline to catch regressions.
+
+Every benchmark is a function taking the fixtures built by prepare_fixtures()
+and performing one iteration. Each iteration runs inside a transaction that is
+rolled back, so write paths (quiz POST, hit counting) leave the data unchanged.
+"""
+import contextlib
+import gc
+import os
+import platform
+import statistics
+import time
+from datetime import timedelta
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.db import SessionStore
+from django.db import connection, transaction
+from django.db.models import Count
+from django.http import HttpResponse
+from django.test import Client, RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+
+from .middleware import HitCountMiddleware
+from .models import Admin, Attendee, ClassSession, Question, Response, SessionAttendance
+from .serializers import AttendeeSerializer, QuizSessionSerializer, ResponseSerializer
+
+BENCHMARKS = {}
+
+# Rows handed to each serializer benchmark
+SERIALIZER_ROWS = 100
+
+
+def benchmark(name):
+    """Register a benchmark function under ``name``"""
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+def prepare_fixtures(questions=10):
+    """
+    Create a running session with questions, a student who has joined it but
+    answered nothing, and an admin. Returns the logged-in clients and objects
+    the benchmarks use. Expects the bulk data (e.g. generate_synthetic_data)
+    to be loaded already.
+    """
+    now = timezone.now()
+    session = ClassSession.objects.create(
+        title='Benchmark Session', teacher='Benchmark Teacher',
+        start_time=now - timedelta(hours=1), end_time=now + timedelta(days=1),
+    )
+    quiz_questions = []
+    for n in range(questions):
+        if n == questions - 1:
+            quiz_questions.append(Question.objects.create(
+                class_session=session, text=f"Benchmark text question {n}", question_type='text_response',
+            ))
+        else:
+            quiz_questions.append(Question.objects.create(
+                class_session=session, text=f"Benchmark question {n}", question_type='multiple_choice',
+                option1='A', option2='B', option3='C', option4='D', correct_option=1,
+            ))
+    student = Attendee.objects.create(
+        name='Benchmark Student', email='benchmark-student@example.com', phone='+10000000000',
+        class_session=session, password=make_password('benchmark'),
+    )
+    SessionAttendance.objects.create(attendee=student, class_session=session)
+    admin = Admin.objects.create(
+        username='benchmark-admin', email='benchmark-admin@example.com', password=make_password('benchmark'),
+    )
+
+    anon_client = Client()
+    student_client = Client()
+    client_session = student_client.session
+    client_session.update({'attendee_id': student.id, 'class_session_id': session.id})
+    client_session.save()
+    admin_client = Client()
+    client_session = admin_client.session
+    client_session.update({'is_admin': True, 'admin_id': admin.id, 'admin_username': admin.username})
+    client_session.save()
+
+    quiz_answers = {'feedback_content': 'Benchmark feedback'}
+    for question in quiz_questions:
+        if question.question_type == 'text_response':
+            quiz_answers[f"text_question_{question.id}"] = 'Benchmark answer'
+        else:
+            quiz_answers[f"question_{question.id}"] = '1'
+
+    return {
+        'session': session,
+        'student': student,
+        'admin': admin,
+        'anon_client': anon_client,
+        'student_client': student_client,
+        'admin_client': admin_client,
+        'quiz_answers': quiz_answers,
+        'factory': RequestFactory(),
+    }
+
+
+# ----- Views (full request/response cycle, middleware included) -----
+
+@benchmark('view.home')
+def bench_home(fx):
+    fx['anon_client'].get(reverse('home'))
+
+
+@benchmark('view.quiz.get')
+def bench_quiz_get(fx):
+    fx['student_client'].get(reverse('quiz'))
+
+
+@benchmark('view.quiz.post')
+def bench_quiz_post(fx):
+    fx['student_client'].post(reverse('quiz'), fx['quiz_answers'])
+
+
+@benchmark('view.session_home')
+def bench_session_home(fx):
+    fx['student_client'].get(reverse('session_home'))
+
+
+@benchmark('view.admin_dashboard')
+def bench_admin_dashboard(fx):
+    fx['admin_client'].get(reverse('admin_dashboard'))
+
+
+# ----- Serializers -----
+
+@benchmark('serializer.attendee')
+def bench_attendee_serializer(fx):
+    attendees = Attendee.objects.select_related('class_session').order_by('-id')[:SERIALIZER_ROWS]
+    AttendeeSerializer(attendees, many=True).data
+
+
+@benchmark('serializer.quiz_session')
+def bench_quiz_session_serializer(fx):
+    sessions = ClassSession.objects.annotate(attendee_count=Count('attendee')).order_by('-id')[:SERIALIZER_ROWS]
+    QuizSessionSerializer(sessions, many=True).data
+
+
+@benchmark('serializer.response')
+def bench_response_serializer(fx):
+    responses = Response.objects.select_related('attendee', 'question').order_by('-id')[:SERIALIZER_ROWS]
+    ResponseSerializer(responses, many=True).data
+
+
+# ----- Middleware -----
+
+def _middleware_request(fx):
+    request = fx['factory'].get('/benchmark/')
+    request.session = SessionStore()
+    request.user = AnonymousUser()
+    return request
+
+
+def _empty_view(request):
+    return HttpResponse('ok')
+
+
+@benchmark('middleware.passthrough')
+def bench_passthrough(fx):
+    """Reference point for middleware.hitcount: same request, no middleware"""
+    _empty_view(_middleware_request(fx))
+
+
+@benchmark('middleware.hitcount')
+def bench_hitcount(fx):
+    HitCountMiddleware(_empty_view)(_middleware_request(fx))
+
+
+# ----- Runner -----
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def run_one(func, fx, repeat=30, warmup=5):
+    """Time ``repeat`` iterations of one benchmark; returns its stats in ms"""
+    # Views print debug output; keep it out of the report and the timings
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(warmup):
+            with transaction.atomic():
+                func(fx)
+                transaction.set_rollback(True)
+
+        # Counted with a wrapper rather than connection.queries, which the
+        # test client resets at the start of every request
+        queries = []
+        with transaction.atomic():
+            with connection.execute_wrapper(lambda execute, sql, *args: queries.append(sql) or execute(sql, *args)):
+                func(fx)
+            transaction.set_rollback(True)
+
+        # Like timeit, keep the garbage collector from landing in random samples
+        samples = []
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for _ in range(repeat):
+                with transaction.atomic():
+                    start = time.perf_counter()
+                    func(fx)
+                    samples.append((time.perf_counter() - start) * 1000)
+                    transaction.set_rollback(True)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+    return {
+        'median_ms': round(statistics.median(samples), 4),
+        'mean_ms': round(statistics.mean(samples), 4),
+        'min_ms': round(min(samples), 4),
+        'p95_ms': round(percentile(samples, 95), 4),
+        'stdev_ms': round(statistics.stdev(samples), 4) if len(samples) > 1 else 0.0,
+        'queries': len(queries),
+        'repeat': repeat,
+    }
+
+
+def run_benchmarks(fx, names=None, repeat=30, warmup=5, progress=None):
+    """Run the selected benchmarks (all by default); returns {name: stats}"""
+    results = {}
+    for name, func in BENCHMARKS.items():
+        if names and not any(name.startswith(prefix) for prefix in names):
+            continue
+        results[name] = run_one(func, fx, repeat=repeat, warmup=warmup)
+        if progress:
+            progress(name, results[name])
+    return results
+
+
+def environment_info():
+    return {
+        'vendor': connection.vendor,
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'machine': platform.machine(),
+    }
+
+
+def compare(results, baseline, threshold=0.25, metric='min_ms'):
+    """
+    Compare current results with a baseline. A benchmark regresses when
+    ``metric`` is more than ``threshold`` (0.25 = 25%) slower than the
+    baseline's, or when it runs more queries than before. The minimum is the
+    default metric because it is the least sensitive to other load on the
+    machine; use median_ms or p95_ms on a quiet, dedicated runner.
+
+    Returns a list of rows: {name, baseline_ms, current_ms, change, status, note}.
+    """
+    rows = []
+    baseline_results = baseline.get('benchmarks', {})
+    for name in sorted(set(results) | set(baseline_results)):
+        current = results.get(name)
+        previous = baseline_results.get(name)
+        row = {
+            'name': name,
+            'baseline_ms': previous[metric] if previous else None,
+            'current_ms': current[metric] if current else None,
+            'change': None,
+            'status': 'ok',
+            'note': '',
+        }
+        if previous is None:
+            row['status'] = 'new'
+        elif current is None:
+            row['status'] = 'missing'
+        else:
+            if previous[metric] > 0:
+                row['change'] = current[metric] / previous[metric] - 1
+            if row['change'] is not None and row['change'] > threshold:
+                row['status'] = 'regression'
+            elif row['change'] is not None and row['change'] < -threshold:
+                row['status'] = 'improved'
+            if current['queries'] > previous['queries']:
+                row['status'] = 'regression'
+                row['note'] = f"queries {previous['queries']} -> {current['queries']}"
+        rows.append(row)
+    return rows
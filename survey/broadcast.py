@@ -0,0 +1,163 @@
+"""
+Session-code broadcasts
+
+Announces a session's code to everyone who attended an earlier session.
+Recipients are attendees paged by id in chunks (one message per distinct
+email address: addresses this broadcast already queued are skipped), rendered
+with the cached per-session skeleton from email_rendering and handed to the
+email outbox, which does the actual sending.
+
+- Throttle: each queued message gets a delivery slot ``60 / rate_per_minute``
+  seconds after the previous one, so the outbox worker spreads the sends out.
+- Resume: the broadcast stores the id of the last attendee it went through,
+  so an interrupted run carries on where it stopped. The outbox dedupe also
+  skips anyone who was already queued.
+
+Broadcasts created from the admin page are advanced by the
+process_email_outbox worker; ``manage.py send_session_code --broadcast``
+runs one in the foreground.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from .email_rendering import render_email
+from .models import Attendee, Broadcast, EmailOutbox, SessionAttendance
+from .outbox import enqueue_bulk, make_dedupe_key
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+def recipients_queryset(session):
+    """
+    Attendees who attended any session, excluding addresses that already
+    joined ``session``. Rows are {'id', 'email', 'name'} ordered by id, the
+    resume cursor; an address shared by several attendees appears once per
+    attendee, so callers page with ``id__gt`` and skip repeated addresses.
+    """
+    already_joined = Attendee.objects.filter(attendance_history__class_session=session).values('email')
+    return (
+        Attendee.objects.filter(Exists(SessionAttendance.objects.filter(attendee=OuterRef('pk'))))
+        .exclude(email='')
+        .exclude(email__in=already_joined)
+        .values('id', 'email', 'name')
+        .order_by('id')
+    )
+
+
+def create_broadcast(session, rate_per_minute=60, created_by=''):
+    broadcast = Broadcast.objects.create(
+        class_session=session,
+        rate_per_minute=rate_per_minute,
+        created_by=created_by,
+        # Addresses are matched case-insensitively, like the outbox dedupe key
+        total_recipients=recipients_queryset(session).order_by().values(address=Lower('email')).distinct().count(),
+    )
+    return broadcast
+
+
+def run_chunk(broadcast_id, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Queue the next chunk of recipients for a broadcast. The broadcast row is
+    locked while the chunk is queued, so two workers never double up.
+    Returns the updated broadcast, or None if another worker holds it or it is
+    not active.
+    """
+    with transaction.atomic():
+        broadcast = (
+            Broadcast.objects.select_for_update(skip_locked=True)
+            .select_related('class_session')
+            .filter(id=broadcast_id, status__in=[Broadcast.STATUS_PENDING, Broadcast.STATUS_RUNNING])
+            .first()
+        )
+        if broadcast is None:
+            return None
+
+        now = timezone.now()
+        if broadcast.status == Broadcast.STATUS_PENDING:
+            broadcast.status = Broadcast.STATUS_RUNNING
+            broadcast.started_at = now
+
+        session = broadcast.class_session
+        attendees = list(
+            recipients_queryset(session).filter(id__gt=broadcast.last_recipient_id)[:chunk_size]
+        )
+        # Addresses seen earlier in this chunk or queued by an earlier one don't count again
+        recipients = {}
+        for attendee in attendees:
+            recipients.setdefault(make_dedupe_key('broadcast', attendee['email'], session), attendee)
+        already_queued = set(EmailOutbox.objects.filter(
+            broadcast=broadcast, dedupe_key__in=list(recipients),
+        ).values_list('dedupe_key', flat=True))
+        recipients = [recipient for key, recipient in recipients.items() if key not in already_queued]
+
+        interval = timedelta(seconds=60.0 / max(1, broadcast.rate_per_minute))
+        slot = max(now, broadcast.next_send_at or now)
+        messages = []
+        for recipient in recipients:
+            subject, body, html_body = render_email('session_announcement', session, recipient['name'] or 'there')
+            messages.append({
+                'kind': 'broadcast',
+                'to_email': recipient['email'],
+                'subject': subject,
+                'body': body,
+                'html_body': html_body,
+                'class_session': session,
+                'broadcast': broadcast,
+                'next_attempt_at': slot,
+            })
+            slot += interval
+
+        queued, skipped = enqueue_bulk(messages)
+        # Skipped recipients didn't use their slot
+        broadcast.next_send_at = slot - interval * skipped
+        broadcast.queued_count += queued
+        broadcast.skipped_count += skipped
+        if attendees:
+            broadcast.last_recipient_id = attendees[-1]['id']
+        if len(attendees) < chunk_size:
+            broadcast.status = Broadcast.STATUS_COMPLETED
+            broadcast.finished_at = timezone.now()
+        broadcast.save()
+    return broadcast
+
+
+def run_broadcast(broadcast_id, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """Queue every remaining recipient of a broadcast; ``progress(broadcast)`` is called per chunk"""
+    while True:
+        updated = run_chunk(broadcast_id, chunk_size=chunk_size)
+        if updated is None:
+            return Broadcast.objects.get(id=broadcast_id)
+        if progress:
+            progress(updated)
+        if updated.status != Broadcast.STATUS_RUNNING:
+            return updated
+
+
+def advance_broadcasts(chunk_size=DEFAULT_CHUNK_SIZE):
+    """Queue one chunk of every active broadcast (called by the outbox worker between batches)"""
+    active = Broadcast.objects.filter(
+        status__in=[Broadcast.STATUS_PENDING, Broadcast.STATUS_RUNNING]
+    ).values_list('id', flat=True)
+    return [run_chunk(broadcast_id, chunk_size=chunk_size) for broadcast_id in active]
+
+
+def attach_delivery_stats(broadcasts):
+    """Set ``broadcast.delivery`` to its outbox status counts, in one query for all broadcasts"""
+    counts = {}
+    rows = (
+        EmailOutbox.objects.filter(broadcast__in=broadcasts)
+        .values_list('broadcast_id', 'status')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    for broadcast_id, status, total in rows:
+        counts[(broadcast_id, status)] = total
+    for broadcast in broadcasts:
+        broadcast.delivery = {
+            status: counts.get((broadcast.id, status), 0) for status in ('pending', 'sending', 'sent', 'dead')
+        }
+    return broadcasts
@@ -0,0 +1,37 @@
+"""
+Health checks and connection pool metrics for the configured databases
+
+Pools live in each worker process, so the numbers describe the process that
+answered the request (see questionnaire_project/databases.py for pool
+settings). Shown to admins at /manage/database/.
+"""
+import time
+
+from django.db import DatabaseError, connections
+
+
+def database_status():
+    """{alias: {ok, error, latency_ms, pooled, pool}} for every database, checked with SELECT 1"""
+    status = {}
+    for alias in connections:
+        connection = connections[alias]
+        started = time.perf_counter()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            error = ''
+        except DatabaseError as e:
+            print(f"Database {alias} health check failed: {e}")
+            error = str(e)
+        pool = getattr(connection, 'pool', None)
+        status[alias] = {
+            'vendor': connection.vendor,
+            'ok': not error,
+            'error': error,
+            'latency_ms': round((time.perf_counter() - started) * 1000, 2),
+            'pooled': pool is not None,
+            # psycopg_pool counters: pool_size, pool_available, requests_waiting,
+            # requests_wait_ms, connections_errors, connections_lost, ...
+            'pool': pool.get_stats() if pool is not None else None,
+        }
+    return status
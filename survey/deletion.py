@@ -0,0 +1,179 @@
+"""
+Background deletion of sessions and attendees
+
+Calling .delete() on a session makes Django collect every related response,
+progress row, attendance and review in Python before deleting any of them,
+all inside the request. Admin deletes create a DeletionJob instead, and the
+process_email_outbox worker carries it out between email batches:
+
+- Each kind has a fixed list of steps, children before parents, so no step
+  leaves a row pointing at a deleted one.
+- A chunk selects at most ``chunk_size`` ids of the current step and deletes
+  them with one raw DELETE, in a transaction with the job row (locked, so
+  two workers never run the same job). The job's step index is the resume
+  cursor.
+- Email outbox rows are kept, with their session/broadcast link cleared, as
+  Django's SET_NULL would.
+- The sessions or attendees themselves go last through the ORM. By then
+  nothing depends on them, so it's cheap, and the post_delete handlers
+  (session caches, homepage, live "gone" events) still run. Rows added while
+  the job ran are cascaded by Django as usual.
+
+Search index rows are dropped by the database triggers (migration 0020).
+"""
+import time
+from collections import namedtuple
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import (
+    Attendee, Broadcast, ClassSession, DeletionJob, EmailOutbox, Question,
+    QuizProgress, Response, Review, SessionAttendance,
+)
+
+DEFAULT_CHUNK_SIZE = 1000
+
+# action: 'delete' (raw DELETE), 'orm' (Model.delete() with signals) or a
+# dict of fields to clear with UPDATE
+Step = namedtuple('Step', 'label queryset action')
+
+
+def session_steps(ids):
+    # Attendees whose current session is deleted go too (Attendee.class_session cascades)
+    return [
+        Step('responses', Response.objects.filter(question__class_session_id__in=ids), 'delete'),
+        Step('responses', Response.objects.filter(attendee__class_session_id__in=ids), 'delete'),
+        Step('quiz progress', QuizProgress.objects.filter(class_session_id__in=ids), 'delete'),
+        Step('quiz progress', QuizProgress.objects.filter(attendee__class_session_id__in=ids), 'delete'),
+        Step('attendance', SessionAttendance.objects.filter(class_session_id__in=ids), 'delete'),
+        Step('attendance', SessionAttendance.objects.filter(attendee__class_session_id__in=ids), 'delete'),
+        Step('reviews', Review.objects.filter(attendee__class_session_id__in=ids), 'delete'),
+        Step('email outbox', EmailOutbox.objects.filter(broadcast__class_session_id__in=ids), {'broadcast': None}),
+        Step('email outbox', EmailOutbox.objects.filter(class_session_id__in=ids), {'class_session': None}),
+        Step('broadcasts', Broadcast.objects.filter(class_session_id__in=ids), 'delete'),
+        Step('questions', Question.objects.filter(class_session_id__in=ids), 'delete'),
+        Step('attendees', Attendee.objects.filter(class_session_id__in=ids), 'delete'),
+        Step('sessions', ClassSession.objects.filter(id__in=ids), 'orm'),
+    ]
+
+
+def attendee_steps(ids):
+    return [
+        Step('responses', Response.objects.filter(attendee_id__in=ids), 'delete'),
+        Step('quiz progress', QuizProgress.objects.filter(attendee_id__in=ids), 'delete'),
+        Step('attendance', SessionAttendance.objects.filter(attendee_id__in=ids), 'delete'),
+        Step('reviews', Review.objects.filter(attendee_id__in=ids), 'delete'),
+        Step('attendees', Attendee.objects.filter(id__in=ids), 'orm'),
+    ]
+
+
+STEPS = {
+    DeletionJob.KIND_SESSIONS: session_steps,
+    DeletionJob.KIND_ATTENDEES: attendee_steps,
+}
+
+
+def create_deletion_job(kind, ids, description='', created_by=''):
+    return DeletionJob.objects.create(
+        kind=kind, target_ids=sorted(set(ids)), description=description[:255], created_by=created_by,
+    )
+
+
+def _raw_delete(model, pks):
+    table = connection.ops.quote_name(model._meta.db_table)
+    column = connection.ops.quote_name(model._meta.pk.column)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE {column} IN ({', '.join(['%s'] * len(pks))})", pks)
+        return cursor.rowcount
+
+
+def _apply(step, pks):
+    """Carry out ``step`` on ``pks``; returns the number of rows deleted"""
+    model = step.queryset.model
+    if isinstance(step.action, dict):
+        model.objects.filter(pk__in=pks).update(**step.action)
+        return 0
+    if step.action == 'orm':
+        return model.objects.filter(pk__in=pks).delete()[0]
+    return _raw_delete(model, pks)
+
+
+def run_chunk(job_id, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Delete the next chunk of a job's rows. Returns the updated job, or None
+    if another worker holds it or it is not active.
+    """
+    with transaction.atomic():
+        job = (
+            DeletionJob.objects.select_for_update(skip_locked=True)
+            .filter(id=job_id, status__in=[DeletionJob.STATUS_PENDING, DeletionJob.STATUS_RUNNING])
+            .first()
+        )
+        if job is None:
+            return None
+
+        steps = STEPS[job.kind](job.target_ids)
+        try:
+            with transaction.atomic():
+                if job.status == DeletionJob.STATUS_PENDING:
+                    job.status = DeletionJob.STATUS_RUNNING
+                    job.started_at = timezone.now()
+                    job.total_rows = sum(
+                        step.queryset.count() for step in steps if not isinstance(step.action, dict)
+                    )
+                # Skip past finished steps until one has rows left
+                while job.step < len(steps):
+                    step = steps[job.step]
+                    job.step_label = step.label
+                    pks = list(step.queryset.order_by('pk').values_list('pk', flat=True)[:chunk_size])
+                    if pks:
+                        job.deleted_rows += _apply(step, pks)
+                        break
+                    job.step += 1
+        except Exception as e:
+            print(f"Deletion job {job.id} failed at {job.step_label}: {e}")
+            job.status = DeletionJob.STATUS_FAILED
+            job.error = str(e)
+            job.finished_at = timezone.now()
+        else:
+            if job.step >= len(steps):
+                job.status = DeletionJob.STATUS_COMPLETED
+                job.step_label = ''
+                job.finished_at = timezone.now()
+        job.save()
+    return job
+
+
+def run_job(job_id, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """Run a job to the end in the foreground; ``progress(job)`` is called per chunk"""
+    while True:
+        updated = run_chunk(job_id, chunk_size=chunk_size)
+        if updated is None:
+            return DeletionJob.objects.get(id=job_id)
+        if progress:
+            progress(updated)
+        if updated.status != DeletionJob.STATUS_RUNNING:
+            return updated
+
+
+def advance_deletion_jobs(chunk_size=DEFAULT_CHUNK_SIZE, max_seconds=1.0):
+    """
+    Run chunks of the active jobs, in turn, for up to ``max_seconds`` (called by
+    the outbox worker between batches). Returns each job after its last chunk.
+    """
+    deadline = time.monotonic() + max_seconds
+    latest = {}
+    active = list(
+        DeletionJob.objects.filter(
+            status__in=[DeletionJob.STATUS_PENDING, DeletionJob.STATUS_RUNNING]
+        ).order_by('created_at').values_list('id', flat=True)
+    )
+    while active and time.monotonic() < deadline:
+        for job_id in list(active):
+            job = run_chunk(job_id, chunk_size=chunk_size)
+            if job is not None:
+                latest[job_id] = job
+            if job is None or job.status != DeletionJob.STATUS_RUNNING:
+                active.remove(job_id)
+    return list(latest.values())
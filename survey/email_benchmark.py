@@ -0,0 +1,156 @@
+"""
+Email delivery benchmark
+
+Measures messages per second through the local SMTP sink for each way the
+app can send mail:
+
+- per_message: Django's SMTP backend opening a new connection for every
+  message (connect, EHLO, login, send, QUIT), as send_mail and smtp_email
+  did before the pool;
+- pooled: the same messages through PooledEmailBackend (survey/smtp_pool.py),
+  which is what send_mail and smtp_email.send_session_code_smtp use now;
+- outbox: messages queued with the outbox (the cost a web request pays),
+  then delivered by the worker loop (claim_batch + deliver_batch). Needs a
+  database.
+
+Run it with ``python manage.py benchmark_email``. The sink's latency and
+failure injection make the numbers resemble a remote provider.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.mail import EmailMultiAlternatives
+from django.core.mail.backends.smtp import EmailBackend as SMTPBackend
+
+from .email_rendering import render_email
+from .smtp_pool import PooledEmailBackend, close_all_pools
+
+PATHS = ('per_message', 'pooled', 'outbox')
+
+SENDER = 'Quiz Portal <noreply@quizportal.com>'
+
+
+def build_messages(session, count):
+    """``count`` session-code emails (subject, body, html, recipient) for the benchmark"""
+    messages = []
+    for n in range(count):
+        subject, body, html = render_email('session_code', session=session, recipient_name=f"Student {n}")
+        messages.append((subject, body, html, f"bench-{n}@example.com"))
+    return messages
+
+
+def _email(message, connection):
+    subject, body, html, to_email = message
+    email = EmailMultiAlternatives(subject, body, SENDER, [to_email], connection=connection)
+    email.attach_alternative(html, 'text/html')
+    return email
+
+
+def _run_parallel(send_one, messages, concurrency):
+    """Send every message with ``concurrency`` threads; returns (seconds, sent, errors)"""
+    sent = errors = 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for ok in executor.map(send_one, messages):
+            if ok:
+                sent += 1
+            else:
+                errors += 1
+    return time.perf_counter() - started, sent, errors
+
+
+def bench_per_message(sink, messages, concurrency):
+    def send_one(message):
+        backend = SMTPBackend(host=sink.host, port=sink.port, username='', password='',
+                              use_tls=False, use_ssl=False, timeout=10)
+        try:
+            return backend.send_messages([_email(message, backend)]) == 1
+        except Exception:
+            return False
+    return _run_parallel(send_one, messages, concurrency)
+
+
+def bench_pooled(sink, messages, concurrency):
+    close_all_pools()
+    backend = PooledEmailBackend(host=sink.host, port=sink.port, username='', password='',
+                                 use_tls=False, use_ssl=False, timeout=10)
+    backend.pool.max_connections = concurrency
+
+    def send_one(message):
+        try:
+            return backend.send_messages([_email(message, backend)]) == 1
+        except Exception:
+            return False
+    try:
+        return _run_parallel(send_one, messages, concurrency)
+    finally:
+        close_all_pools()
+
+
+def bench_outbox(sink, messages, batch_size=50):
+    """
+    Queue the messages, then drain the outbox with one worker loop.
+    Returns (enqueue_seconds, deliver_seconds, sent, errors).
+    """
+    from .models import EmailOutbox
+    from .outbox import claim_batch, deliver_batch, enqueue_email
+
+    EmailOutbox.objects.all().delete()
+    started = time.perf_counter()
+    for subject, body, html, to_email in messages:
+        enqueue_email(to_email, subject, body, html, kind='benchmark')
+    enqueue_seconds = time.perf_counter() - started
+
+    close_all_pools()
+    connection = PooledEmailBackend(host=sink.host, port=sink.port, username='', password='',
+                                    use_tls=False, use_ssl=False, timeout=10)
+    sent = errors = 0
+    started = time.perf_counter()
+    try:
+        while True:
+            batch = claim_batch(batch_size)
+            if not batch:
+                break
+            counts = deliver_batch(batch, connection=connection, default_from=SENDER)
+            sent += counts['sent']
+            errors += counts['retry'] + counts['dead']
+    finally:
+        close_all_pools()
+    deliver_seconds = time.perf_counter() - started
+    EmailOutbox.objects.filter(kind='benchmark').delete()
+    return enqueue_seconds, deliver_seconds, sent, errors
+
+
+def _rate(count, seconds):
+    return round(count / seconds, 1) if seconds else None
+
+
+def run_email_benchmarks(sink, messages, paths=PATHS, concurrency=4, batch_size=50, progress=None):
+    """Run the selected paths against ``sink``; returns {path: stats}"""
+    results = {}
+    for path in paths:
+        sink.reset()
+        if path == 'outbox':
+            enqueue_seconds, seconds, sent, errors = bench_outbox(sink, messages, batch_size=batch_size)
+            stats = {
+                'enqueue_seconds': round(enqueue_seconds, 4),
+                'enqueue_per_sec': _rate(len(messages), enqueue_seconds),
+            }
+        else:
+            bench = bench_per_message if path == 'per_message' else bench_pooled
+            seconds, sent, errors = bench(sink, messages, concurrency)
+            stats = {}
+        sink_stats = sink.stats()
+        stats.update({
+            'messages': len(messages),
+            'seconds': round(seconds, 4),
+            'messages_per_sec': _rate(sent, seconds),
+            'sent': sent,
+            'errors': errors,
+            'connections': sink_stats['connections'],
+            'received': sink_stats['received'],
+        })
+        results[path] = stats
+        if progress:
+            progress(path, stats)
+    return results
@@ -0,0 +1,94 @@
+"""
+Email rendering
+
+Email bodies live in survey/templates/survey/emails/ as <name>_subject.txt,
+<name>.txt and (optionally) <name>.html. Templates are compiled once per
+process.
+
+Most of an email only depends on the session (title, teacher, code, start
+time). render_email() renders that once per session with a placeholder where
+the recipient's name goes and keeps the result in an LRU cache, so each
+further recipient costs two string replacements instead of a template render.
+The cache is keyed on the session's field values, so editing a session never
+serves stale text.
+"""
+from functools import lru_cache
+
+from django.conf import settings
+from django.template import TemplateDoesNotExist
+from django.template.loader import get_template
+from django.utils import timezone
+from django.utils.html import escape
+
+# Stands in for the recipient's name in the cached skeleton; letters and
+# digits only, so HTML autoescaping leaves it untouched
+RECIPIENT_PLACEHOLDER = 'QzRecipientName7f3a'
+
+_templates = {}
+
+
+def get_email_templates(name):
+    """(subject, text, html) compiled templates for an email; html may be None"""
+    templates = _templates.get(name)
+    if templates is None:
+        try:
+            html = get_template(f'survey/emails/{name}.html')
+        except TemplateDoesNotExist:
+            html = None
+        templates = (
+            get_template(f'survey/emails/{name}_subject.txt'),
+            get_template(f'survey/emails/{name}.txt'),
+            html,
+        )
+        _templates[name] = templates
+    return templates
+
+
+class _SessionSnapshot:
+    """The session fields the templates use, detached from the model instance"""
+
+    def __init__(self, session_id, title, teacher, session_code, start_time):
+        self.id = session_id
+        self.title = title
+        self.teacher = teacher
+        self.session_code = session_code
+        self.start_time = start_time
+
+
+def _session_key(session):
+    if session is None:
+        return None
+    start_time = timezone.localtime(session.start_time) if session.start_time else None
+    return (session.id, session.title, session.teacher, session.session_code, start_time)
+
+
+@lru_cache(maxsize=getattr(settings, 'EMAIL_RENDER_CACHE_SIZE', 256))
+def _render_skeleton(name, session_key):
+    subject_template, text_template, html_template = get_email_templates(name)
+    context = {'name': RECIPIENT_PLACEHOLDER}
+    if session_key is not None:
+        context['session'] = _SessionSnapshot(*session_key)
+    subject = ' '.join(subject_template.render(context).split())
+    text = text_template.render(context).strip() + '\n'
+    html = html_template.render(context) if html_template else ''
+    return subject, text, html
+
+
+def render_email(name, session=None, recipient_name=''):
+    """
+    Render email ``name`` for one recipient; returns (subject, plain_message, html_message).
+    html_message is '' for text-only emails.
+    """
+    subject, text, html = _render_skeleton(name, _session_key(session))
+    recipient_name = recipient_name or ''
+    return (
+        subject.replace(RECIPIENT_PLACEHOLDER, recipient_name),
+        text.replace(RECIPIENT_PLACEHOLDER, recipient_name),
+        html.replace(RECIPIENT_PLACEHOLDER, escape(recipient_name)),
+    )
+
+
+def clear_render_cache():
+    """Forget compiled templates and cached skeletons (e.g. after editing a template)"""
+    _templates.clear()
+    _render_skeleton.cache_clear()
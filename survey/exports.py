@@ -0,0 +1,331 @@
+"""
+Streaming CSV and XLSX exports for admins
+
+Each dataset is a values_list() projection read with .iterator(chunk_size=
+EXPORT_CHUNK_SIZE), so rows go out as they are fetched and a worker holds one
+chunk at a time however large the table is (PostgreSQL uses a server-side
+cursor for this). Derived columns such as correctness and scores are computed
+in the query, never per row in Python.
+
+XLSX files are written without extra dependencies: the workbook is a zip
+streamed with data descriptors, and the sheet uses inline strings so nothing
+has to be collected before the first row is sent.
+
+Datasets (all of them can be limited to one session):
+- attendees: contact details (never passwords), with session join times
+- responses: every answer, the chosen option's text and whether it was correct
+- scores: correct answers and score per attendee per session
+- feedback: reviews and quiz feedback
+"""
+import csv
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import (
+    BooleanField, Case, CharField, Count, F, IntegerField, OuterRef, Q, Subquery, Value, When,
+)
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Attendee, Question, Response, Review, SessionAttendance
+from .replicas import routed_iterator
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# Bytes gathered before a chunk is sent
+BUFFER_SIZE = 64 * 1024
+
+MULTIPLE_CHOICE = 'multiple_choice'
+
+
+def _chunk_size():
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+
+# ============= DATASETS =============
+# Each returns (header, rows); rows is a lazily read values_list queryset
+
+def attendee_rows(session_id=None):
+    if session_id is None:
+        header = ['Attendee ID', 'Name', 'Email', 'Phone', 'Age', 'Place',
+                  'Current Session ID', 'Has Submitted', 'Registered At']
+        rows = Attendee.objects.order_by('id').values_list(
+            'id', 'name', 'email', 'phone', 'age', 'place',
+            'class_session_id', 'has_submitted', 'created_at',
+        )
+    else:
+        header = ['Attendee ID', 'Name', 'Email', 'Phone', 'Age', 'Place',
+                  'Session ID', 'Has Submitted', 'Joined At']
+        rows = SessionAttendance.objects.filter(class_session_id=session_id).order_by('id').values_list(
+            'attendee_id', 'attendee__name', 'attendee__email', 'attendee__phone', 'attendee__age',
+            'attendee__place', 'class_session_id', 'has_submitted', 'joined_at',
+        )
+    return header, rows
+
+
+def response_rows(session_id=None):
+    header = ['Response ID', 'Session ID', 'Session', 'Attendee ID', 'Attendee', 'Email',
+              'Question ID', 'Question', 'Question Type', 'Selected Option', 'Selected Answer',
+              'Text Response', 'Correct']
+    responses = Response.objects.all()
+    if session_id is not None:
+        responses = responses.filter(class_session_id=session_id)
+    rows = responses.order_by('id').annotate(
+        selected_answer=Case(
+            *[When(selected_option=number, then=F(f'question__option{number}')) for number in range(1, 5)],
+            default=Value(''),
+            output_field=CharField(),
+        ),
+        correct=Case(
+            When(question__question_type=MULTIPLE_CHOICE,
+                 selected_option=F('question__correct_option'), then=Value(True)),
+            When(question__question_type=MULTIPLE_CHOICE, then=Value(False)),
+            default=Value(None),
+            output_field=BooleanField(null=True),
+        ),
+    ).values_list(
+        'id', 'class_session_id', 'class_session__title',
+        'attendee_id', 'attendee__name', 'attendee__email',
+        'question_id', 'question__text', 'question__question_type', 'selected_option', 'selected_answer',
+        'text_response', 'correct',
+    )
+    return header, rows
+
+
+def score_rows(session_id=None):
+    header = ['Session ID', 'Session', 'Attendee ID', 'Attendee', 'Email',
+              'Answered', 'Correct', 'Multiple Choice Questions', 'Score %']
+    responses = Response.objects.all()
+    if session_id is not None:
+        responses = responses.filter(class_session_id=session_id)
+    multiple_choice_total = Question.objects.filter(
+        class_session=OuterRef('class_session'), question_type=MULTIPLE_CHOICE,
+    ).order_by().values('class_session').annotate(total=Count('id')).values('total')
+    rows = responses.values(
+        'class_session_id', 'class_session__title',
+        'attendee_id', 'attendee__name', 'attendee__email',
+    ).annotate(
+        answered=Count('id'),
+        correct=Count('id', filter=Q(
+            question__question_type=MULTIPLE_CHOICE, selected_option=F('question__correct_option'),
+        )),
+        multiple_choice_total=Subquery(multiple_choice_total, output_field=IntegerField()),
+    ).order_by('class_session_id', 'attendee_id').values_list(
+        'class_session_id', 'class_session__title',
+        'attendee_id', 'attendee__name', 'attendee__email',
+        'answered', 'correct', 'multiple_choice_total',
+    )
+    return header, _with_score(rows)
+
+
+def _with_score(rows):
+    # Same rounding as the admin attendee page
+    for row in rows.iterator(chunk_size=_chunk_size()):
+        correct, total = row[-2], row[-1] or 0
+        yield (*row[:-1], total, round(correct / total * 100, 2) if total else 0)
+
+
+def feedback_rows(session_id=None):
+    header = ['Review ID', 'Type', 'Attendee ID', 'Attendee', 'Email', 'Session ID', 'Content', 'Submitted At']
+    reviews = Review.objects.all()
+    if session_id is not None:
+        # Reviews aren't linked to a session, only to the attendee's current one
+        reviews = reviews.filter(attendee__class_session_id=session_id)
+    rows = reviews.order_by('id').values_list(
+        'id', 'feedback_type', 'attendee_id', 'attendee__name', 'attendee__email',
+        'attendee__class_session_id', 'content', 'submitted_at',
+    )
+    return header, rows
+
+
+DATASETS = {
+    'attendees': attendee_rows,
+    'responses': response_rows,
+    'scores': score_rows,
+    'feedback': feedback_rows,
+}
+
+
+def _iterate(rows):
+    if hasattr(rows, 'iterator'):
+        return rows.iterator(chunk_size=_chunk_size())
+    return rows
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'tzinfo'):
+        value = timezone.localtime(value) if timezone.is_aware(value) else value
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return str(value)
+
+
+# ============= CSV =============
+
+class _Echo:
+    """File-like object csv.writer writes to; returns the line instead of storing it"""
+
+    def write(self, value):
+        return value
+
+
+def _csv_safe(value):
+    # Stop answers typed by students running as formulas when opened in a spreadsheet
+    if isinstance(value, str) and value[:1] in ('=', '+', '-', '@'):
+        return "'" + value
+    return value
+
+
+def iter_csv(header, rows):
+    writer = csv.writer(_Echo())
+    buffer = ['\ufeff' + writer.writerow(header)]  # BOM so Excel reads UTF-8
+    size = 0
+    for row in _iterate(rows):
+        line = writer.writerow([
+            value if isinstance(value, (int, float)) and not isinstance(value, bool)
+            else _csv_safe(_text(value))
+            for value in row
+        ])
+        buffer.append(line)
+        size += len(line)
+        if size >= BUFFER_SIZE:
+            yield ''.join(buffer).encode('utf-8')
+            buffer, size = [], 0
+    yield ''.join(buffer).encode('utf-8')
+
+
+# ============= XLSX =============
+
+XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'
+    ),
+}
+
+WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+)
+
+SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+SHEET_END = '</sheetData></worksheet>'
+
+# Characters XML 1.0 doesn't allow, even escaped
+_INVALID_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _cell(value):
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c><v>{value}</v></c>'
+    text = _INVALID_XML.sub('', escape(_text(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return '<row>' + ''.join(_cell(value) for value in values) + '</row>'
+
+
+class _ZipSink:
+    """Unseekable file zipfile writes to; the written bytes are collected with take()"""
+
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self.parts)
+        self.parts, self.size = [], 0
+        return data
+
+
+def iter_xlsx(header, rows, sheet_name='Export'):
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as workbook:
+        for name, content in XLSX_PARTS.items():
+            workbook.writestr(name, content)
+        workbook.writestr('xl/workbook.xml', WORKBOOK.format(name=escape(sheet_name[:31])))
+        # Unseekable output, so the sheet's sizes go in a data descriptor after it
+        with workbook.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write((SHEET_START + _xlsx_row(header)).encode('utf-8'))
+            for row in _iterate(rows):
+                sheet.write(_xlsx_row(row).encode('utf-8'))
+                if sink.size >= BUFFER_SIZE:
+                    yield sink.take()
+            sheet.write(SHEET_END.encode('utf-8'))
+    yield sink.take()
+
+
+# ============= RESPONSES =============
+
+async def _aiter(chunks):
+    # Each chunk is produced in the sync thread that owns the database cursor
+    next_chunk = sync_to_async(next)
+    while True:
+        chunk = await next_chunk(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def export_response(request, dataset, fmt, session_id=None):
+    """StreamingHttpResponse with ``dataset`` as a CSV or XLSX download"""
+    header, rows = DATASETS[dataset](session_id)
+    filename = dataset if session_id is None else f'{dataset}-session-{session_id}'
+    if fmt == 'xlsx':
+        chunks = iter_xlsx(header, rows, sheet_name=dataset.title())
+    else:
+        chunks = iter_csv(header, rows)
+    # Rows are read while streaming, after the routing middleware has returned
+    chunks = routed_iterator(chunks)
+    if isinstance(request, ASGIRequest):
+        # A sync iterator would be read into memory in full before sending
+        chunks = _aiter(chunks)
+    response = StreamingHttpResponse(chunks, content_type=FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    response['X-Accel-Buffering'] = 'no'
+    return response
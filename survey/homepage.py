@@ -0,0 +1,124 @@
+"""
+Cached homepage session listing
+
+The homepage is the busiest anonymous page, and its data only changes when a
+session is added, edited or removed, or when one starts or ends. So the
+listing (every session that hasn't ended, with its attendee count) is loaded
+in one query and cached until the next start or end time found in the data,
+capped at HOMEPAGE_CACHE_MAX_TTL seconds. Countdowns and the current/upcoming
+split are worked out from the cached times on every request, so they are exact
+even though the list isn't reloaded.
+
+Edits bump a version number that is part of the cache key, so a request that
+was loading the list while a session changed can't store a stale copy under
+the live key. Attendee counts are only refreshed with the rest of the list.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import ClassSession
+
+VERSION_KEY = 'homepage:version'
+
+FIELDS = ('id', 'title', 'teacher', 'start_time', 'end_time')
+
+
+def _listing_key(version):
+    return f"homepage:sessions:v{version}"
+
+
+def _version():
+    try:
+        return cache.get_or_set(VERSION_KEY, 1, None)
+    except Exception as e:
+        print(f"Homepage cache error: {e}")
+        return None
+
+
+def load_sessions(now):
+    """Sessions that haven't ended yet, with attendee counts (one query)"""
+    return list(
+        ClassSession.objects.filter(end_time__gte=now)
+        .annotate(attendee_count=Count('attendances'))
+        .order_by('start_time')
+        .values(*FIELDS, 'attendee_count')
+    )
+
+
+def seconds_until_change(sessions, now):
+    """Seconds until the next session starts or ends, capped at HOMEPAGE_CACHE_MAX_TTL"""
+    max_ttl = getattr(settings, 'HOMEPAGE_CACHE_MAX_TTL', 300)
+    boundaries = [
+        moment for session in sessions
+        for moment in (session['start_time'], session['end_time']) if moment > now
+    ]
+    if not boundaries:
+        return max_ttl
+    # Round up so the entry never outlives the boundary by less than a second
+    return max(1, min(max_ttl, int((min(boundaries) - now).total_seconds()) + 1))
+
+
+def cached_sessions(now=None):
+    """Sessions that haven't ended (as of the last load), from the cache when possible"""
+    now = now or timezone.now()
+    version = _version()
+    if version is not None:
+        try:
+            sessions = cache.get(_listing_key(version))
+        except Exception as e:
+            print(f"Homepage cache error: {e}")
+            sessions = None
+        if sessions is not None:
+            return sessions
+
+    sessions = load_sessions(now)
+    if version is not None:
+        try:
+            cache.set(_listing_key(version), sessions, seconds_until_change(sessions, now))
+        except Exception as e:
+            print(f"Homepage cache error: {e}")
+    return sessions
+
+
+def _with_countdown(session, target, now, status):
+    time_diff = target - now
+    session = dict(session, status=status)
+    session['countdown_days'] = time_diff.days
+    session['countdown_hours'], remainder = divmod(time_diff.seconds, 3600)
+    session['countdown_minutes'], session['countdown_seconds'] = divmod(remainder, 60)
+    session['countdown_total_seconds'] = int(time_diff.total_seconds())
+    return session
+
+
+def homepage_sessions(now=None):
+    """(current sessions ordered by end time, future sessions ordered by start time) with countdowns"""
+    now = now or timezone.now()
+    current, future = [], []
+    for session in cached_sessions(now):
+        if session['start_time'] > now:
+            future.append(_with_countdown(session, session['start_time'], now, 'future'))
+        elif session['end_time'] >= now:
+            current.append(_with_countdown(session, session['end_time'], now, 'current'))
+    current.sort(key=lambda session: session['end_time'])
+    return current, future
+
+
+def invalidate_homepage():
+    try:
+        cache.add(VERSION_KEY, 1, None)
+        cache.incr(VERSION_KEY)
+    except Exception as e:
+        print(f"Homepage cache error: {e}")
+
+
+@receiver(post_save, sender=ClassSession)
+@receiver(post_delete, sender=ClassSession)
+def _session_changed(sender, instance, **kwargs):
+    invalidate_homepage()
+    # A homepage load inside the transaction's lifetime may have cached the old rows
+    transaction.on_commit(invalidate_homepage)
@@ -0,0 +1,444 @@
+"""
+Live session updates (Server-Sent Events)
+
+session_home.html used to reload itself every minute, costing a full render
+plus the QuizProgress get_or_create and progress queries per waiting student.
+Pages now open an EventSource on one of the streams below and update in place.
+
+Events are published to channels kept in the Django cache, so every worker
+sees them. publish() bumps a per-channel counter with cache.incr() and stores
+the event under its number; a stream remembers the last number it sent and
+fetches only newer events. A waiting student therefore costs a couple of cache
+reads every LIVE_POLL_INTERVAL seconds and no database queries.
+
+Channels:
+
+- ``sessions``: any session created, edited or deleted (the homepage);
+- ``session:<id>``: the session was edited or deleted, or questions changed;
+- ``progress:<session id>:<attendee id>``: the attendee's progress was saved.
+
+Stream events:
+
+- ``state``: status (waiting/active/expired) with seconds until start/end.
+  Sent on connect, when the session starts or ends, and when it is edited;
+- ``progress``: total/answered/pending questions for the attendee. Sent on
+  connect and when questions or the attendee's progress change;
+- ``questions``: a question was added or removed;
+- ``sessions``: the schedule changed (homepage stream);
+- ``gone``: the session was deleted; the stream ends.
+
+Under ASGI streams are held open: they wait on a LiveHub, which polls once for
+every stream on the event loop, hold no thread, and close after
+LIVE_STREAM_TIMEOUT seconds. Under WSGI a held stream would tie up a worker,
+so each request gets a snapshot instead: the current events, an ``id:`` with
+the channel cursors, and a ``retry`` of LIVE_SNAPSHOT_RETRY_MS. The browser
+reconnects after that delay sending the id back as Last-Event-ID, and is told
+about anything published in between.
+"""
+import asyncio
+import json
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import ClassSession, Question, QuizProgress, Response
+from .session_codes import get_session
+
+SESSIONS_CHANNEL = 'sessions'
+
+# Events kept per channel; a stream that falls further behind just skips ahead
+MAX_BACKLOG = 50
+
+
+def live_setting(name, default):
+    return getattr(settings, f"LIVE_{name}", default)
+
+
+def session_channel(session_id):
+    return f"session:{session_id}"
+
+
+def progress_channel(session_id, attendee_id):
+    return f"progress:{session_id}:{attendee_id}"
+
+
+def _counter_key(channel):
+    return f"live:{channel}"
+
+
+def _event_key(channel, number):
+    return f"live:{channel}:{number}"
+
+
+def publish(channel, event, data=None):
+    """Send ``event`` to every stream listening on ``channel``"""
+    ttl = live_setting('EVENT_TTL', 300)
+    try:
+        key = _counter_key(channel)
+        cache.add(key, 0, None)
+        number = cache.incr(key)
+        cache.set(_event_key(channel, number), (event, data or {}), ttl)
+    except Exception as e:
+        print(f"Live update error: {e}")
+
+
+def current_cursors(channels):
+    """{channel: number of its latest event}"""
+    try:
+        counters = cache.get_many([_counter_key(channel) for channel in channels])
+    except Exception as e:
+        print(f"Live update error: {e}")
+        counters = {}
+    return {channel: counters.get(_counter_key(channel)) or 0 for channel in channels}
+
+
+def cursor(channel):
+    """Number of the latest event on ``channel``"""
+    return current_cursors([channel])[channel]
+
+
+def read_many(cursors):
+    """
+    Events newer than ``cursors`` ({channel: last number seen}) on each channel.
+    Returns ({channel: latest number}, {channel: [(event, data), ...]}) using
+    two cache round trips however many channels are read.
+    """
+    latest = current_cursors(list(cursors))
+    wanted = {}
+    for channel, after in cursors.items():
+        if latest[channel] < after:
+            # The counter was evicted and started again
+            after = 0
+        numbers = range(max(after + 1, latest[channel] - MAX_BACKLOG + 1), latest[channel] + 1)
+        if numbers:
+            wanted[channel] = [_event_key(channel, number) for number in numbers]
+    found = {}
+    if wanted:
+        try:
+            found = cache.get_many([key for keys in wanted.values() for key in keys])
+        except Exception as e:
+            print(f"Live update error: {e}")
+    events = {channel: [found[key] for key in keys if key in found] for channel, keys in wanted.items()}
+    return latest, events
+
+
+def read_events(channel, after):
+    """(latest number, [(event, data), ...]) for events newer than ``after``"""
+    latest, events = read_many({channel: after})
+    return latest[channel], events.get(channel, [])
+
+
+def session_state(session, now=None):
+    """What a waiting page needs to know about ``session`` right now"""
+    now = now or timezone.now()
+    if now < session.start_time:
+        status = 'waiting'
+    elif now <= session.end_time:
+        status = 'active'
+    else:
+        status = 'expired'
+    return {
+        'session_id': session.id,
+        'status': status,
+        'starts_in': max(int((session.start_time - now).total_seconds()), 0),
+        'ends_in': max(int((session.end_time - now).total_seconds()), 0),
+        'start_time': session.start_time.isoformat(),
+        'end_time': session.end_time.isoformat(),
+        'server_time': now.isoformat(),
+    }
+
+
+def progress_stats(session_id, attendee_id):
+    """Same numbers as QuizProgress.get_progress_stats(), without loading the progress row"""
+    total = Question.objects.filter(class_session_id=session_id).count()
+    answered = Response.objects.filter(
+        attendee_id=attendee_id, class_session_id=session_id
+    ).values('question_id').distinct().count()
+    return {
+        'total': total,
+        'answered': answered,
+        'pending': max(total - answered, 0),
+        'percentage': round((answered / total * 100) if total > 0 else 0, 1),
+        'is_fully_completed': total > 0 and answered >= total,
+    }
+
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _changed(old, new):
+    return any(old[key] != new[key] for key in ('status', 'start_time', 'end_time'))
+
+
+class SessionWatcher:
+    """
+    What one session page has been told so far. start() and handle() may query
+    the database; tick() never does. Each returns the SSE text to send.
+    """
+
+    def __init__(self, session_id, attendee_id=None):
+        self.session_id = session_id
+        self.attendee_id = attendee_id
+        self.channels = [session_channel(session_id)]
+        if attendee_id:
+            self.channels.append(progress_channel(session_id, attendee_id))
+        self.session = None
+        self.state = None
+        self.closed = False
+
+    def gone(self):
+        self.closed = True
+        return [format_event('gone', {'session_id': self.session_id})]
+
+    def start(self):
+        session = get_session(self.session_id)
+        if session is None:
+            return self.gone()
+        self.session = session
+        self.state = session_state(session)
+        chunks = [format_event('state', self.state)]
+        if self.attendee_id:
+            chunks.append(format_event('progress', progress_stats(self.session_id, self.attendee_id)))
+        return chunks
+
+    def handle(self, events):
+        chunks = []
+        reload_session = refresh_progress = False
+        for event, data in events:
+            if event == 'gone':
+                return chunks + self.gone()
+            if event == 'session':
+                reload_session = True
+            elif event == 'questions':
+                refresh_progress = True
+                chunks.append(format_event('questions', data))
+            elif event == 'progress':
+                refresh_progress = True
+        if reload_session:
+            # Straight from the database: other workers' local session caches may lag an edit
+            session = ClassSession.objects.filter(id=self.session_id).first()
+            if session is None:
+                return chunks + self.gone()
+            self.session = session
+            state = session_state(session)
+            if _changed(self.state, state):
+                self.state = state
+                chunks.append(format_event('state', state))
+        if refresh_progress and self.attendee_id:
+            chunks.append(format_event('progress', progress_stats(self.session_id, self.attendee_id)))
+        return chunks
+
+    def tick(self):
+        # Starting and ending are just the clock passing, so nothing is published for them
+        state = session_state(self.session)
+        if state['status'] != self.state['status']:
+            self.state = state
+            return [format_event('state', state)]
+        return []
+
+
+class SessionListWatcher:
+    """The homepage: one event whenever the schedule changes"""
+
+    channels = [SESSIONS_CHANNEL]
+    closed = False
+
+    def start(self):
+        return [format_event('ready', {'server_time': timezone.now().isoformat()})]
+
+    def handle(self, events):
+        return [format_event('sessions', {'changes': len(events)})]
+
+    def tick(self):
+        return []
+
+
+def _retry():
+    return f"retry: {int(live_setting('RETRY_MS', 2000))}\n\n"
+
+
+def _event_id(cursors, channels):
+    return '.'.join(str(cursors[channel]) for channel in channels)
+
+
+def _parse_event_id(event_id, channels):
+    """Cursors sent back by a reconnecting browser, or None"""
+    try:
+        numbers = [int(part) for part in (event_id or '').split('.')]
+    except ValueError:
+        return None
+    if len(numbers) != len(channels):
+        return None
+    return dict(zip(channels, numbers))
+
+
+def iter_stream(watcher, last_event_id=None):
+    """
+    Snapshot (WSGI): the watcher's current events plus anything published
+    since ``last_event_id``, then the response ends and the browser
+    reconnects after LIVE_SNAPSHOT_RETRY_MS. Holds the worker only briefly.
+    """
+    cursors = _parse_event_id(last_event_id, watcher.channels)
+    # Cursors are read first, so events published during start() come next time
+    if cursors is None:
+        latest, events = current_cursors(watcher.channels), []
+    else:
+        latest, new = read_many(cursors)
+        events = [event for channel in watcher.channels for event in new.get(channel, [])]
+
+    yield f"retry: {int(live_setting('SNAPSHOT_RETRY_MS', 10000))}\n\n"
+    yield from watcher.start()
+    if events and not watcher.closed:
+        yield from watcher.handle(events)
+    if not watcher.closed:
+        yield f"id: {_event_id(latest, watcher.channels)}\n\n"
+
+
+class LiveHub:
+    """
+    Polls the cache for every channel watched by the async streams of one
+    event loop, and hands new events to those streams. However many clients
+    an ASGI worker holds, that is two cache reads per LIVE_POLL_INTERVAL.
+    """
+
+    def __init__(self):
+        self.queues = {}  # channel -> set of asyncio.Queue
+        self.cursors = {}
+        self.task = None
+
+    async def subscribe(self, channels):
+        queue = asyncio.Queue()
+        new = [channel for channel in channels if channel not in self.cursors]
+        if new:
+            # Start from the current event so nothing published after start() is missed
+            for channel, number in (await sync_to_async(current_cursors)(new)).items():
+                self.cursors.setdefault(channel, number)
+        for channel in channels:
+            self.queues.setdefault(channel, set()).add(queue)
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self.run())
+        return queue
+
+    def unsubscribe(self, channels, queue):
+        for channel in channels:
+            queues = self.queues.get(channel)
+            if queues is None:
+                continue
+            queues.discard(queue)
+            if not queues:
+                del self.queues[channel]
+                self.cursors.pop(channel, None)
+
+    async def run(self):
+        while self.queues:
+            await asyncio.sleep(live_setting('POLL_INTERVAL', 1.0))
+            cursors = {channel: self.cursors[channel] for channel in self.queues}
+            try:
+                latest, events = await sync_to_async(read_many)(cursors)
+            except Exception as e:
+                print(f"Live update error: {e}")
+                continue
+            for channel, number in latest.items():
+                if channel in self.queues:
+                    self.cursors[channel] = number
+            for channel, items in events.items():
+                for queue in self.queues.get(channel, ()):
+                    queue.put_nowait(items)
+
+
+_hubs = weakref.WeakKeyDictionary()
+
+
+def get_hub():
+    """The LiveHub of the running event loop"""
+    loop = asyncio.get_running_loop()
+    if loop not in _hubs:
+        _hubs[loop] = LiveHub()
+    return _hubs[loop]
+
+
+async def aiter_stream(watcher):
+    """Async stream (ASGI): waits on the loop's hub instead of holding a thread"""
+    poll = live_setting('POLL_INTERVAL', 1.0)
+    heartbeat = live_setting('HEARTBEAT_INTERVAL', 15)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + live_setting('STREAM_TIMEOUT', 30)
+    hub = get_hub()
+    queue = await hub.subscribe(watcher.channels)
+    try:
+        yield _retry()
+        for chunk in await sync_to_async(watcher.start)():
+            yield chunk
+
+        last_sent = loop.time()
+        while not watcher.closed and loop.time() < deadline:
+            events = []
+            try:
+                events.extend(await asyncio.wait_for(queue.get(), timeout=poll))
+                while not queue.empty():
+                    events.extend(queue.get_nowait())
+            except asyncio.TimeoutError:
+                pass
+            chunks = await sync_to_async(watcher.handle)(events) if events else []
+            if not watcher.closed:
+                chunks += watcher.tick()
+            for chunk in chunks:
+                yield chunk
+                last_sent = loop.time()
+            if loop.time() - last_sent >= heartbeat:
+                yield ": ping\n\n"
+                last_sent = loop.time()
+    finally:
+        hub.unsubscribe(watcher.channels, queue)
+
+
+def session_stream(session_id, attendee_id=None):
+    """Snapshot SSE text for one session, plus the attendee's progress when given"""
+    return iter_stream(SessionWatcher(session_id, attendee_id))
+
+
+def stream_response(request, watcher):
+    """StreamingHttpResponse serving ``watcher`` the way the server runs the request"""
+    if isinstance(request, ASGIRequest):
+        stream = aiter_stream(watcher)
+    else:
+        stream = iter_stream(watcher, request.META.get('HTTP_LAST_EVENT_ID'))
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx and similar proxies from buffering the events
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@receiver(post_save, sender=ClassSession)
+def _session_saved(sender, instance, created, **kwargs):
+    if not created:
+        publish(session_channel(instance.pk), 'session', {'session_id': instance.pk})
+    publish(SESSIONS_CHANNEL, 'session', {'session_id': instance.pk})
+
+
+@receiver(post_delete, sender=ClassSession)
+def _session_deleted(sender, instance, **kwargs):
+    publish(session_channel(instance.pk), 'gone', {'session_id': instance.pk})
+    publish(SESSIONS_CHANNEL, 'session', {'session_id': instance.pk})
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def _questions_changed(sender, instance, **kwargs):
+    action = 'removed' if 'created' not in kwargs else ('added' if kwargs['created'] else 'edited')
+    publish(session_channel(instance.class_session_id), 'questions',
+            {'question_id': instance.pk, 'action': action})
+
+
+@receiver(post_save, sender=QuizProgress)
+def _progress_saved(sender, instance, **kwargs):
+    publish(progress_channel(instance.class_session_id, instance.attendee_id), 'progress')
@@ -0,0 +1,104 @@
+"""
+Archive finished sessions and old page hits to a columnar file, inspect an
+archive, or load one back (survey/archive.py).
+
+Examples:
+    python manage.py archive_sessions create archives/2025.svya --older-than 180 --delete
+    python manage.py archive_sessions create archives/s12.svya --session 12 --no-hits
+    python manage.py archive_sessions info archives/2025.svya
+    python manage.py archive_sessions load archives/2025.svya
+"""
+import os
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from survey.archive import ArchiveReader, delete_archived_hits, load_archive, write_archive
+from survey.deletion import create_deletion_job, run_job
+from survey.homepage import invalidate_homepage
+from survey.models import ClassSession, DeletionJob
+
+
+class Command(BaseCommand):
+    help = 'Write finished sessions and old page hits to a compressed columnar archive, or load one back'
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['create', 'info', 'load'])
+        parser.add_argument('path', help='Archive file')
+        parser.add_argument('--older-than', type=int, default=180,
+                            help='create: sessions that ended, and hits recorded, this many days ago (default: 180)')
+        parser.add_argument('--session', type=int, action='append',
+                            help='create: archive this finished session instead (repeatable)')
+        parser.add_argument('--no-hits', action='store_true', help='create: leave page hits out')
+        parser.add_argument('--uncompressed', action='store_true',
+                            help='create: store blocks uncompressed, so numeric columns can be read in place')
+        parser.add_argument('--delete', action='store_true',
+                            help='create: delete what was archived once the file is written')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows per query or transaction')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] <= 0:
+            raise CommandError('--chunk-size must be positive')
+        if options['action'] != 'create' and not os.path.exists(options['path']):
+            raise CommandError(f"No archive at {options['path']}")
+        getattr(self, options['action'])(options)
+
+    def create(self, options):
+        now = timezone.now()
+        cutoff = now - timedelta(days=options['older_than'])
+        if options['session']:
+            sessions = ClassSession.objects.filter(id__in=options['session'])
+            unfinished = sessions.filter(end_time__gte=now).values_list('id', flat=True)
+            if unfinished:
+                raise CommandError(f"Session(s) {', '.join(map(str, unfinished))} haven't ended yet")
+        else:
+            sessions = ClassSession.objects.filter(end_time__lt=cutoff)
+        session_ids = list(sessions.values_list('id', flat=True))
+        hits_before = None if options['no_hits'] else cutoff
+        if not session_ids and hits_before is None:
+            self.stdout.write(self.style.WARNING('⚠️  Nothing to archive'))
+            return
+
+        self.stdout.write(f"📦 Archiving {len(session_ids)} session(s) to {options['path']}")
+        write_archive(
+            options['path'], session_ids, hits_before=hits_before, compress=not options['uncompressed'],
+            chunk_size=options['chunk_size'],
+            progress=lambda label, rows: self.stdout.write(f"   {label}: {rows} rows"),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Wrote {os.path.getsize(options['path']):,} bytes"
+        ))
+
+        if options['delete']:
+            if session_ids:
+                job = create_deletion_job(
+                    DeletionJob.KIND_SESSIONS, session_ids,
+                    description=f"Archived to {os.path.basename(options['path'])}", created_by='archive_sessions',
+                )
+                job = run_job(job.id, chunk_size=options['chunk_size'])
+                self.stdout.write(f"🗑️  Deleted {job.deleted_rows} session rows ({job.get_status_display()})")
+            if hits_before is not None:
+                deleted = delete_archived_hits(options['path'], chunk_size=options['chunk_size'])
+                self.stdout.write(f"🗑️  Deleted {deleted} page hits")
+
+    def info(self, options):
+        with ArchiveReader(options['path']) as reader:
+            self.stdout.write(f"📦 Archive {reader.source}, written {reader.footer['created_at']}")
+            for label, table in reader.tables.items():
+                stored, raw = reader.sizes(label)
+                self.stdout.write(f"   {label}: {table['rows']} rows, {stored:,} bytes ({raw:,} uncompressed)")
+
+    def load(self, options):
+        self.stdout.write(f"📥 Loading {options['path']}")
+        results = load_archive(options['path'], chunk_size=options['chunk_size'])
+        for label, counts in results.items():
+            self.stdout.write(
+                f"   {label}: ✅ {counts['created']} created, 🔗 {counts['merged']} merged, "
+                f"⏭️  {counts['resumed']} already loaded, ⚠️  {counts['skipped']} skipped"
+            )
+        # Loaded rows don't go through the save signals
+        call_command('rebuild_search_index', stdout=self.stdout)
+        invalidate_homepage()
+        self.stdout.write(self.style.SUCCESS('✅ Archive loaded'))
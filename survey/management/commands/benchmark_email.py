@@ -0,0 +1,107 @@
+"""
+Management command to benchmark email delivery (survey/email_benchmark.py).
+
+Starts the local SMTP sink on a free port and sends the same batch of
+session-code emails through each delivery path, reporting messages per
+second. The outbox path runs against a throwaway test database, like
+run_benchmarks, so nothing touches real data or Gmail.
+
+Examples:
+    python manage.py benchmark_email
+    python manage.py benchmark_email --messages 500 --concurrency 8 --latency 0.02 --connect-latency 0.2
+    python manage.py benchmark_email --fail-rate 0.05 --only pooled --output email-bench.json
+"""
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from survey.benchmarks import environment_info
+from survey.email_benchmark import PATHS, build_messages, run_email_benchmarks
+from survey.models import ClassSession
+from survey.smtp_sink import SMTPSink
+
+
+class Command(BaseCommand):
+    help = 'Measure email throughput per message, pooled and through the outbox, against a local SMTP sink'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=200, help='Emails sent through each path')
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Sending threads (and pool size) for the per_message and pooled paths')
+        parser.add_argument('--batch-size', type=int, default=50, help='Outbox worker batch size')
+        parser.add_argument('--only', action='append', choices=PATHS, help='Only run this path (repeatable)')
+        parser.add_argument('--latency', type=float, default=0.005,
+                            help='Sink delay before every SMTP reply, in seconds (one round trip)')
+        parser.add_argument('--connect-latency', type=float, default=0.05,
+                            help='Extra sink delay per new connection (TCP/TLS setup)')
+        parser.add_argument('--fail-rate', type=float, default=0.0, help='Fraction of messages refused with 451')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for injected failures')
+        parser.add_argument('--output', help='Write the results JSON to this file')
+        parser.add_argument('--keepdb', action='store_true', help='Reuse the test database between runs')
+
+    def handle(self, *args, **options):
+        if options['messages'] <= 0 or options['concurrency'] <= 0 or options['batch_size'] <= 0:
+            raise CommandError('--messages, --concurrency and --batch-size must be positive')
+
+        paths = options['only'] or list(PATHS)
+        now = timezone.now()
+        session = ClassSession(title='Benchmark Session', teacher='Benchmark Teacher',
+                               session_code='BENCH001', start_time=now, end_time=now)
+        messages = build_messages(session, options['messages'])
+        sink_options = {
+            'latency': options['latency'],
+            'connect_latency': options['connect_latency'],
+            'fail_rate': options['fail_rate'],
+            'seed': options['seed'],
+        }
+
+        self.stdout.write(
+            f"📮 Sending {len(messages)} email(s) per path to the SMTP sink "
+            f"(latency {options['latency'] * 1000:.0f} ms, connect {options['connect_latency'] * 1000:.0f} ms, "
+            f"fail rate {options['fail_rate']:.0%})\n"
+        )
+
+        old_name = None
+        if 'outbox' in paths:
+            setup_test_environment()
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            with SMTPSink(port=0, **sink_options) as sink:
+                results = run_email_benchmarks(
+                    sink, messages, paths=paths, concurrency=options['concurrency'],
+                    batch_size=options['batch_size'], progress=self.report_progress,
+                )
+        finally:
+            if old_name is not None:
+                connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+                teardown_test_environment()
+
+        if 'per_message' in results and 'pooled' in results and results['per_message']['messages_per_sec']:
+            speedup = (results['pooled']['messages_per_sec'] or 0) / results['per_message']['messages_per_sec']
+            self.stdout.write(f"\n📈 Pooled is {speedup:.1f}x the per-message path")
+
+        if options['output']:
+            report = {
+                'created_at': timezone.now().isoformat(),
+                'environment': environment_info(),
+                'options': {key: options[key] for key in ('messages', 'concurrency', 'batch_size')},
+                'sink': sink_options,
+                'paths': results,
+            }
+            path = Path(options['output'])
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(report, indent=2) + '\n', encoding='utf-8')
+            self.stdout.write(self.style.SUCCESS(f"💾 Results written to {path}"))
+
+    def report_progress(self, path, stats):
+        line = (
+            f"   {path:<12} {stats['messages_per_sec'] or 0:>8.1f} msg/s   {stats['seconds']:>7.2f} s   "
+            f"sent {stats['sent']}, errors {stats['errors']}, connections {stats['connections']}"
+        )
+        if 'enqueue_per_sec' in stats:
+            line += f"   (enqueue {stats['enqueue_per_sec'] or 0:.0f} msg/s)"
+        self.stdout.write(line)
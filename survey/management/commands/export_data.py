@@ -0,0 +1,37 @@
+"""
+Export the database as JSON-lines files for import_data (survey/transfer.py).
+
+Typically run against the old SQLite database, then import_data is run with
+DATABASE_URL pointing at PostgreSQL.
+
+Examples:
+    python manage.py export_data migration_data
+    python manage.py export_data migration_data --models survey.ClassSession survey.Question
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from survey.transfer import DEFAULT_CHUNK_SIZE, MODELS, export_data
+
+
+class Command(BaseCommand):
+    help = 'Stream every table to one JSON-lines file per model, for import_data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Directory to write the files to')
+        parser.add_argument('--models', nargs='+', choices=MODELS, help='Only export these models')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Rows fetched per query')
+        parser.add_argument('--database', default='default', help='Database alias to export from')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] <= 0:
+            raise CommandError('--chunk-size must be positive')
+
+        self.stdout.write(f"📤 Exporting to {options['directory']}/")
+        manifest = export_data(
+            options['directory'], using=options['database'], labels=options['models'],
+            chunk_size=options['chunk_size'],
+            progress=lambda label, rows: self.stdout.write(f"   ✅ {label}: {rows} rows"),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Export {manifest['source']} written. Next: python manage.py import_data {options['directory']}"
+        ))
@@ -0,0 +1,389 @@
+"""
+Management command to generate production-scale synthetic data for load and
+query-budget testing.
+
+Everything is generated from a seeded random.Random, so the same options and
+--seed produce the same rows. Rows are streamed into the database with chunked
+bulk_create and never held in memory all at once.
+
+--clear deletes the synthetic sessions (titles starting "Synthetic "), the
+synthetic attendees (@synthetic.example) with their responses, quiz progress,
+attendance and reviews, and the synthetic page hits. Deleting the sessions
+also removes everything that cascades from them, including questions and any
+real attendee's answers and attendance in those sessions.
+
+Examples:
+    python manage.py generate_synthetic_data --sessions 50 --attendees 1000 --hits 20000
+    python manage.py generate_synthetic_data --sessions 3000 --attendees 200000 --hits 2000000 --seed 7
+    python manage.py generate_synthetic_data --clear
+"""
+import random
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from survey.models import (
+    Attendee, ClassSession, Question, Response, QuizProgress,
+    SessionAttendance, Review, HitCounter
+)
+from survey.session_codes import allocate_session_codes
+
+SYNTHETIC_TITLE_PREFIX = 'Synthetic '
+SYNTHETIC_EMAIL_DOMAIN = 'synthetic.example'
+SYNTHETIC_SESSION_KEY_PREFIX = 'synthetic'
+
+# Attendees between progress lines while generating participation
+PROGRESS_EVERY = 1000
+
+FIRST_NAMES = [
+    'Aarav', 'Vivaan', 'Aditya', 'Vihaan', 'Arjun', 'Sai', 'Reyansh', 'Ayaan', 'Krishna', 'Ishaan',
+    'Ananya', 'Diya', 'Aadhya', 'Saanvi', 'Pari', 'Anika', 'Navya', 'Myra', 'Sara', 'Ira',
+    'John', 'Maria', 'David', 'Fatima', 'Rahul', 'Priya', 'Ahmed', 'Meera', 'Joseph', 'Lakshmi',
+]
+LAST_NAMES = [
+    'Sharma', 'Nair', 'Menon', 'Patel', 'Reddy', 'Iyer', 'Khan', 'Das', 'Pillai', 'Varghese',
+    'Kumar', 'Singh', 'Gupta', 'Thomas', 'George', 'Rao', 'Joshi', 'Mehta', 'Bose', 'Kurian',
+]
+TOPICS = [
+    'Python Basics', 'Django Models', 'REST APIs', 'SQL Fundamentals', 'Data Structures',
+    'Web Security', 'Git Workflow', 'Cloud Deployment', 'JavaScript Essentials', 'React Hooks',
+    'Machine Learning Intro', 'Statistics', 'Linux Command Line', 'Networking', 'Testing',
+]
+TEACHERS = [
+    'Dr. Anil Kumar', 'Prof. Susan Mathew', 'Ms. Reena Joseph', 'Mr. Vikram Rao',
+    'Dr. Fathima Beevi', 'Mr. Arun Menon', 'Ms. Divya Nair', 'Prof. Rajesh Iyer',
+]
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36',
+    'Mozilla/5.0 (Linux; Android 13; SM-A525F) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0 Mobile Safari/537.36',
+    'Mozilla/5.0 (iPhone; CPU iPhone OS 17_1 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Mobile/15E148 Safari/604.1',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 14_1) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Safari/605.1.15',
+    'Mozilla/5.0 (X11; Linux x86_64; rv:121.0) Gecko/20100101 Firefox/121.0',
+]
+# (path template, weight) - roughly the traffic mix seen in production
+HIT_PATHS = [
+    ('/', 30), ('/join/', 8), ('/session/{session_id}/request-code/', 8), ('/new/register/', 4),
+    ('/new/login/', 3), ('/session-home/', 14), ('/quiz/', 16), ('/student-dashboard/', 5),
+    ('/admin-dashboard/', 2), ('/api/sessions/', 6), ('/api/sessions/verify_code/', 2),
+    ('/thank-you/', 2),
+]
+FEEDBACK = [
+    'Great session, very clear explanations.', 'The quiz was a bit too long.',
+    'Loved the practical examples!', 'Could use more time for questions.',
+    'Audio was unclear at times.', 'Excellent teacher, learned a lot.',
+]
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Temporarily disable auto_now/auto_now_add so generated timestamps are kept"""
+    saved = []
+    for model in models:
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                saved.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = 'Generate reproducible, production-scale synthetic sessions, attendees, responses and hits'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sessions', type=int, default=100, help='Number of class sessions')
+        parser.add_argument('--questions-per-session', type=int, default=10, help='Average questions per session')
+        parser.add_argument('--attendees', type=int, default=2000, help='Number of attendees')
+        parser.add_argument('--sessions-per-attendee', type=float, default=3.0,
+                            help='Mean sessions attended per attendee (geometric distribution)')
+        parser.add_argument('--answer-rate', type=float, default=0.85,
+                            help='Probability an attendee answers a given question of an attended session')
+        parser.add_argument('--correct-rate', type=float, default=0.65,
+                            help='Probability a multiple choice answer is correct')
+        parser.add_argument('--review-rate', type=float, default=0.2, help='Probability an attendance leaves feedback')
+        parser.add_argument('--hits', type=int, default=50000, help='Number of HitCounter rows')
+        parser.add_argument('--hit-days', type=int, default=90, help='Spread hits over this many past days')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed (same seed = same data)')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per bulk_create batch')
+        parser.add_argument('--now', help='Anchor timestamp (ISO 8601) instead of today at midnight, for reproducible times')
+        parser.add_argument('--clear', action='store_true',
+                            help='Delete the synthetic sessions, attendees and hits, and everything that '
+                                 'cascades from them, then exit')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            self.clear()
+            return
+
+        if options['chunk_size'] <= 0:
+            raise CommandError('--chunk-size must be positive')
+
+        self.rng = random.Random(options['seed'])
+        self.chunk_size = options['chunk_size']
+        self.options = options
+        if options['now']:
+            anchor = datetime.fromisoformat(options['now'])
+            self.now = anchor if timezone.is_aware(anchor) else timezone.make_aware(anchor)
+        else:
+            self.now = timezone.localtime(timezone.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+
+        self.stdout.write(self.style.SUCCESS(f"Generating synthetic data (seed={options['seed']})"))
+
+        with explicit_timestamps(Attendee, SessionAttendance, QuizProgress, Review, HitCounter):
+            sessions = self.create_sessions(options['sessions'])
+            questions = self.create_questions(sessions, options['questions_per_session'])
+            attendee_ids = self.create_attendees(options['attendees'], sessions)
+            self.create_participation(attendee_ids, sessions, questions)
+            self.create_hits(options['hits'], sessions)
+
+        self.stdout.write(self.style.SUCCESS('\n✅ Done!'))
+
+    # ----- helpers -----
+
+    def bulk_insert(self, model, objects, label):
+        """Insert objects in chunks; returns the created objects' primary keys"""
+        pks = []
+        total = 0
+        for chunk in chunked(objects, self.chunk_size):
+            with transaction.atomic():
+                created = model.objects.bulk_create(chunk, batch_size=self.chunk_size)
+            pks.extend(obj.pk for obj in created)
+            total += len(chunk)
+            self.stdout.write(f"   {label}: {total}", ending='\r')
+        self.stdout.write(self.style.SUCCESS(f"✓ {label}: {total}"))
+        return pks
+
+    def weighted_sessions(self, sessions):
+        """Zipf-like popularity: a few sessions are very popular, most are small"""
+        return [1.0 / (rank + 1) ** 0.8 for rank in range(len(sessions))]
+
+    # ----- generators -----
+
+    def create_sessions(self, count):
+        # One counter reservation for every code instead of loading all existing codes
+        codes = allocate_session_codes(count)
+        specs = []
+        for i, code in enumerate(codes):
+            # Mostly past sessions, some running today, some upcoming
+            day_offset = int(self.rng.triangular(-365, 30, 0))
+            start = self.now + timedelta(days=day_offset, hours=self.rng.randint(8, 18),
+                                         minutes=self.rng.choice([0, 15, 30, 45]))
+            duration = timedelta(minutes=self.rng.choice([30, 45, 60, 90, 120, 180]))
+            specs.append(ClassSession(
+                title=f"{SYNTHETIC_TITLE_PREFIX}{self.rng.choice(TOPICS)} #{i + 1}",
+                teacher=self.rng.choice(TEACHERS),
+                start_time=start,
+                end_time=start + duration,
+                session_code=code,
+            ))
+        pks = self.bulk_insert(ClassSession, specs, 'Sessions')
+        return [
+            {'id': pk, 'start_time': spec.start_time, 'end_time': spec.end_time}
+            for pk, spec in zip(pks, specs)
+        ]
+
+    def create_questions(self, sessions, per_session):
+        """Returns {session_id: [(question_id, question_type, correct_option), ...]}"""
+        specs = []
+        for session in sessions:
+            for n in range(max(1, int(self.rng.gauss(per_session, per_session / 4)))):
+                if self.rng.random() < 0.2:
+                    specs.append(Question(class_session_id=session['id'], question_type='text_response',
+                                          text=f"Explain concept {n + 1} in your own words."))
+                else:
+                    specs.append(Question(
+                        class_session_id=session['id'], question_type='multiple_choice',
+                        text=f"Question {n + 1}: which option is correct?",
+                        option1='Option A', option2='Option B', option3='Option C', option4='Option D',
+                        correct_option=self.rng.randint(1, 4),
+                    ))
+        pks = self.bulk_insert(Question, specs, 'Questions')
+        questions = {}
+        for pk, spec in zip(pks, specs):
+            questions.setdefault(spec.class_session_id, []).append((pk, spec.question_type, spec.correct_option))
+        return questions
+
+    def create_attendees(self, count, sessions):
+        password_hash = make_password('synthetic123')
+        first_session_start = min(s['start_time'] for s in sessions) if sessions else self.now
+
+        def generate():
+            for i in range(count):
+                created = first_session_start + timedelta(
+                    seconds=self.rng.randint(0, max(1, int((self.now - first_session_start).total_seconds())))
+                )
+                yield Attendee(
+                    name=f"{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}",
+                    phone=f"{self.rng.randint(6, 9)}{self.rng.randint(0, 999999999):09d}",
+                    email=f"student{i + 1}@{SYNTHETIC_EMAIL_DOMAIN}",
+                    password=password_hash,
+                    plain_password='synthetic123',
+                    created_at=created,
+                    updated_at=created,
+                )
+
+        return self.bulk_insert(Attendee, generate(), 'Attendees')
+
+    def create_participation(self, attendee_ids, sessions, questions):
+        """SessionAttendance, QuizProgress, Response and Review rows for each attendee"""
+        if not sessions:
+            return
+        weights = self.weighted_sessions(sessions)
+        mean_sessions = max(1.0, self.options['sessions_per_attendee'])
+        answer_rate = self.options['answer_rate']
+        correct_rate = self.options['correct_rate']
+        review_rate = self.options['review_rate']
+
+        attendances, progress, responses, reviews = [], [], [], []
+        last_session = {}
+        counts = {'Attendances': 0, 'Quiz progress': 0, 'Responses': 0, 'Reviews': 0}
+
+        def flush(force=False):
+            for label, model, rows in (
+                ('Attendances', SessionAttendance, attendances),
+                ('Quiz progress', QuizProgress, progress),
+                ('Responses', Response, responses),
+                ('Reviews', Review, reviews),
+            ):
+                if rows and (force or len(rows) >= self.chunk_size):
+                    with transaction.atomic():
+                        model.objects.bulk_create(rows, batch_size=self.chunk_size)
+                    counts[label] += len(rows)
+                    rows.clear()
+
+        for done, attendee_id in enumerate(attendee_ids, 1):
+            # Geometric number of sessions attended, at least one
+            k = 1
+            while self.rng.random() > 1.0 / mean_sessions and k < len(sessions):
+                k += 1
+            chosen = set()
+            while len(chosen) < k:
+                chosen.add(self.rng.choices(range(len(sessions)), weights=weights)[0])
+
+            for index in sorted(chosen, key=lambda i: sessions[i]['start_time']):
+                session = sessions[index]
+                joined = session['start_time'] - timedelta(minutes=self.rng.randint(0, 30))
+                session_questions = questions.get(session['id'], [])
+                finished = session['end_time'] <= self.now
+                answered = [q for q in session_questions if finished and self.rng.random() < answer_rate]
+
+                attendances.append(SessionAttendance(
+                    attendee_id=attendee_id, class_session_id=session['id'],
+                    joined_at=joined, has_submitted=bool(answered),
+                ))
+                progress.append(QuizProgress(
+                    attendee_id=attendee_id, class_session_id=session['id'],
+                    last_answered_at=session['end_time'] if answered else joined,
+                    is_fully_completed=bool(session_questions) and len(answered) == len(session_questions),
+                ))
+                for question_id, question_type, correct_option in answered:
+                    if question_type == 'text_response':
+                        responses.append(Response(attendee_id=attendee_id, question_id=question_id,
+                                                  class_session_id=session['id'],
+                                                  text_response='Synthetic answer text.'))
+                    else:
+                        if self.rng.random() < correct_rate:
+                            option = correct_option
+                        else:
+                            option = self.rng.choice([o for o in (1, 2, 3, 4) if o != correct_option])
+                        responses.append(Response(attendee_id=attendee_id, question_id=question_id,
+                                                  class_session_id=session['id'], selected_option=option))
+                if answered and self.rng.random() < review_rate:
+                    reviews.append(Review(
+                        attendee_id=attendee_id, content=self.rng.choice(FEEDBACK),
+                        feedback_type=self.rng.choice(['quiz', 'quiz', 'review']),
+                        submitted_at=session['end_time'],
+                    ))
+                last_session[attendee_id] = (session['id'], bool(answered))
+
+            flush()
+            if done % PROGRESS_EVERY == 0:
+                self.stdout.write(
+                    f"   {done}/{len(attendee_ids)} attendees: "
+                    + ', '.join(f"{label}: {n}" for label, n in counts.items())
+                )
+
+        flush(force=True)
+        for label, n in counts.items():
+            self.stdout.write(self.style.SUCCESS(f"✓ {label}: {n}"))
+
+        # Point each attendee at the last session they attended
+        by_session = {}
+        for attendee_id, key in last_session.items():
+            by_session.setdefault(key, []).append(attendee_id)
+        for (session_id, submitted), ids in by_session.items():
+            for chunk in chunked(ids, self.chunk_size):
+                Attendee.objects.filter(id__in=chunk).update(class_session_id=session_id, has_submitted=submitted)
+
+    def create_hits(self, count, sessions):
+        if count <= 0:
+            return
+        ip_pool = [
+            f"{self.rng.choice([10, 49, 103, 117, 157, 182])}.{self.rng.randint(0, 255)}."
+            f"{self.rng.randint(0, 255)}.{self.rng.randint(1, 254)}"
+            for _ in range(max(10, count // 20))
+        ]
+        paths, path_weights = zip(*HIT_PATHS)
+        # Traffic follows the school day: busiest late morning and early afternoon
+        hour_weights = [1, 1, 1, 1, 1, 2, 4, 8, 14, 18, 20, 18, 14, 16, 18, 14, 10, 8, 6, 5, 4, 3, 2, 1]
+        session_ids = [s['id'] for s in sessions] or [0]
+        hit_seconds = self.options['hit_days'] * 86400
+
+        def generate():
+            for n in range(count):
+                ts = self.now - timedelta(seconds=self.rng.randint(0, hit_seconds))
+                ts = ts.replace(hour=self.rng.choices(range(24), weights=hour_weights)[0])
+                path = self.rng.choices(paths, weights=path_weights)[0]
+                yield HitCounter(
+                    ip_address=self.rng.choice(ip_pool),
+                    user_agent=self.rng.choice(USER_AGENTS),
+                    path=path.format(session_id=self.rng.choice(session_ids)),
+                    method='POST' if self.rng.random() < 0.15 else 'GET',
+                    timestamp=ts,
+                    session_key=f"{SYNTHETIC_SESSION_KEY_PREFIX}{n % 50000:032d}",
+                )
+
+        self.bulk_insert(HitCounter, generate(), 'Hits')
+
+    # ----- cleanup -----
+
+    def clear(self):
+        """
+        Delete synthetic rows, leaf tables first so most of each delete is
+        done before the cascades from attendees and sessions are collected.
+        Rows removed by a cascade are reported next to the step that caused it.
+        """
+        attendees = Attendee.objects.filter(email__endswith=f"@{SYNTHETIC_EMAIL_DOMAIN}")
+        sessions = ClassSession.objects.filter(title__startswith=SYNTHETIC_TITLE_PREFIX)
+        steps = [
+            ('Responses', Response.objects.filter(attendee__in=attendees)),
+            ('Quiz progress', QuizProgress.objects.filter(attendee__in=attendees)),
+            ('Attendances', SessionAttendance.objects.filter(attendee__in=attendees)),
+            ('Reviews', Review.objects.filter(attendee__in=attendees)),
+            ('Attendees', attendees),
+            ('Questions', Question.objects.filter(class_session__in=sessions)),
+            ('Sessions', sessions),
+            ('Hits', HitCounter.objects.filter(session_key__startswith=SYNTHETIC_SESSION_KEY_PREFIX)),
+        ]
+        for label, queryset in steps:
+            total, by_model = queryset.delete()
+            deleted = by_model.get(queryset.model._meta.label, 0)
+            cascaded = f" (+{total - deleted} cascaded)" if total > deleted else ''
+            self.stdout.write(self.style.SUCCESS(f"✓ Deleted {label}: {deleted}{cascaded}"))
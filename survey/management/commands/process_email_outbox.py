@@ -0,0 +1,96 @@
+"""
+Worker that delivers queued email from the EmailOutbox table (survey/outbox.py).
+
+Runs until stopped, polling for due messages and sending them in batches over
+the pooled SMTP transport. Several workers can run side by side on PostgreSQL.
+Between batches it also queues the next chunk of any active session-code
+broadcast (survey/broadcast.py) and carries on with any admin deletion job
+(survey/deletion.py) for up to a second.
+
+Examples:
+    python manage.py process_email_outbox
+    python manage.py process_email_outbox --once
+    python manage.py process_email_outbox --batch-size 100 --poll-interval 1
+    python manage.py process_email_outbox --requeue-dead
+"""
+import signal
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from survey.broadcast import advance_broadcasts
+from survey.deletion import advance_deletion_jobs
+from survey.models import EmailOutbox
+from survey.outbox import claim_batch, deliver_batch, get_transport, requeue_dead
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued email from the outbox, with retries and a dead-letter state'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50, help='Messages claimed per batch')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Seconds to sleep when the outbox is empty')
+        parser.add_argument('--once', action='store_true', help='Drain everything that is due, then exit')
+        parser.add_argument('--requeue-dead', action='store_true',
+                            help='Move dead-letter messages back to pending, then exit')
+        parser.add_argument('--broadcast-chunk-size', type=int, default=500,
+                            help='Broadcast recipients queued per loop')
+        parser.add_argument('--deletion-chunk-size', type=int, default=1000,
+                            help='Rows removed per deletion job chunk')
+
+    def handle(self, *args, **options):
+        if options['requeue_dead']:
+            count = requeue_dead()
+            self.stdout.write(self.style.SUCCESS(f"✅ Requeued {count} dead-letter message(s)"))
+            return
+
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size must be positive')
+
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        connection, default_from = get_transport()
+        totals = {'sent': 0, 'retry': 0, 'dead': 0}
+        self.stdout.write(f"📬 Email outbox worker started ({connection.__class__.__name__})")
+
+        while not self.stopping:
+            close_old_connections()
+            for broadcast in advance_broadcasts(chunk_size=options['broadcast_chunk_size']):
+                if broadcast is not None:
+                    self.stdout.write(
+                        f"   📣 broadcast {broadcast.id}: {broadcast.progress_percent}% queued ({broadcast.status})"
+                    )
+            for job in advance_deletion_jobs(chunk_size=options['deletion_chunk_size']):
+                self.stdout.write(f"   🗑️ deletion {job.id}: {job.progress_percent}% ({job.status})")
+            messages = claim_batch(options['batch_size'])
+            if not messages:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+
+            connection.open()
+            try:
+                counts = deliver_batch(messages, connection=connection, default_from=default_from)
+            finally:
+                connection.close()
+            for key, value in counts.items():
+                totals[key] += value
+            self.stdout.write(
+                f"   batch of {len(messages)}: ✅ {counts['sent']} sent, "
+                f"🔁 {counts['retry']} to retry, 💀 {counts['dead']} dead"
+            )
+
+        pending = EmailOutbox.objects.filter(status=EmailOutbox.STATUS_PENDING).count()
+        self.stdout.write(self.style.SUCCESS(
+            f"📭 Stopped. Sent {totals['sent']}, retrying {totals['retry']}, dead {totals['dead']}; "
+            f"{pending} pending"
+        ))
+
+    def stop(self, signum, frame):
+        # Finish the current batch, then exit
+        self.stopping = True
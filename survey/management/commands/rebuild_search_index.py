@@ -0,0 +1,55 @@
+"""
+Management command to (re)build the search index used by the admin dashboard and API search
+"""
+from django.core.management.base import BaseCommand
+
+from survey.models import Attendee, ClassSession, Review, SearchIndex
+from survey.search import join_text, index_documents
+
+
+# kind -> (model, fields selected for the document)
+SOURCES = {
+    'session': (ClassSession, ('title', 'teacher', 'session_code')),
+    'attendee': (Attendee, ('name', 'email', 'phone', 'place')),
+    'review': (Review, ('content', 'attendee__name')),
+}
+
+
+class Command(BaseCommand):
+    help = 'Index every session, attendee and review for search (run after bulk imports or queryset updates)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=sorted(SOURCES), action='append',
+                            help='Only rebuild this kind (repeatable, default: all)')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Objects read and written per query (default: 1000)')
+        parser.add_argument('--prune', action='store_true',
+                            help='Also remove index rows whose object no longer exists')
+        parser.add_argument('--database', default='default', help='Database alias to index')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        database = options['database']
+        for kind in options['kind'] or sorted(SOURCES):
+            model, fields = SOURCES[kind]
+            indexed = 0
+            last_id = 0
+            # Keyset pagination keeps every batch an index range scan
+            while True:
+                rows = list(
+                    model.objects.using(database).filter(id__gt=last_id).order_by('id')
+                    .values_list('id', *fields)[:batch_size]
+                )
+                if not rows:
+                    break
+                index_documents(kind, {row[0]: join_text(*row[1:]) for row in rows}, using=database)
+                indexed += len(rows)
+                last_id = rows[-1][0]
+            self.stdout.write(self.style.SUCCESS(f'✓ Indexed {indexed} {kind} rows'))
+
+            if options['prune']:
+                stale = SearchIndex.objects.using(database).filter(kind=kind).exclude(
+                    object_id__in=model.objects.using(database).values('id')
+                )
+                deleted, _ = stale.delete()
+                self.stdout.write(self.style.WARNING(f'⊗ Removed {deleted} stale {kind} rows'))
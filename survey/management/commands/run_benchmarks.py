@@ -0,0 +1,183 @@
+"""
+Management command to run the hot-path benchmarks (survey/benchmarks.py).
+
+The benchmarks run against a throwaway test database (like manage.py test)
+seeded with generate_synthetic_data, so they work the same on SQLite and on
+PostgreSQL (set DATABASE_URL; the database user needs CREATEDB).
+
+Results are written as JSON. Baselines live in benchmarks/<vendor>.json; pass
+--save-baseline to record one and --compare to check the current code against
+it. The command exits with an error when any benchmark regressed. A change to
+a benchmarked path re-records the baseline in the same commit, so --compare
+at any commit checks against the code it replaced.
+
+Examples:
+    python manage.py run_benchmarks --save-baseline
+    python manage.py run_benchmarks --compare
+    python manage.py run_benchmarks --compare --threshold 0.1 --metric median --only view.
+    DATABASE_URL=postgres://... python manage.py run_benchmarks --compare
+"""
+import json
+from io import StringIO
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from survey.benchmarks import compare, environment_info, prepare_fixtures, run_benchmarks
+
+
+def default_baseline_path():
+    return Path(settings.BASE_DIR) / 'benchmarks' / f"{connection.vendor}.json"
+
+
+class Command(BaseCommand):
+    help = 'Run the hot-path benchmarks and compare them against a stored baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=30, help='Timed iterations per benchmark')
+        parser.add_argument('--warmup', type=int, default=5, help='Untimed iterations per benchmark')
+        parser.add_argument('--only', action='append', help='Only run benchmarks whose name starts with this (repeatable)')
+        parser.add_argument('--output', help='Write the results JSON to this file')
+        parser.add_argument('--save-baseline', action='store_true',
+                            help='Store the results as the baseline (benchmarks/<vendor>.json, or --baseline)')
+        parser.add_argument('--compare', action='store_true', help='Compare the results with the baseline')
+        parser.add_argument('--baseline', help='Baseline file (default: benchmarks/<vendor>.json)')
+        parser.add_argument('--threshold', type=float, default=0.25,
+                            help='Allowed slowdown before flagging a regression (0.25 = 25%%)')
+        parser.add_argument('--metric', choices=['min', 'median', 'p95'], default='min',
+                            help='Statistic compared against the baseline (default: min, the least noisy)')
+        parser.add_argument('--sessions', type=int, default=100, help='Synthetic sessions to load')
+        parser.add_argument('--attendees', type=int, default=2000, help='Synthetic attendees to load')
+        parser.add_argument('--hits', type=int, default=20000, help='Synthetic HitCounter rows to load')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for the synthetic data')
+        parser.add_argument('--confirm-runs', type=int, default=2,
+                            help='Times to re-run apparent regressions before reporting them')
+        parser.add_argument('--keepdb', action='store_true', help='Reuse the test database between runs')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 2:
+            raise CommandError('--repeat must be at least 2')
+
+        dataset = {
+            'sessions': options['sessions'],
+            'attendees': options['attendees'],
+            'hits': options['hits'],
+            'seed': options['seed'],
+        }
+        metric = f"{options['metric']}_ms"
+        baseline_path = Path(options['baseline']) if options['baseline'] else default_baseline_path()
+        baseline = None
+        if options['compare']:
+            if not baseline_path.exists():
+                raise CommandError(f"No baseline at {baseline_path}; run with --save-baseline first")
+            baseline = json.loads(baseline_path.read_text(encoding='utf-8'))
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            self.stdout.write(f"🗄️  Loading synthetic data into {connection.vendor} test database...")
+            call_command('generate_synthetic_data', clear=True, stdout=StringIO())
+            call_command('generate_synthetic_data', stdout=StringIO(), **dataset)
+            fixtures = prepare_fixtures()
+
+            self.stdout.write(f"⏱️  Running benchmarks ({options['repeat']} iterations each)\n")
+            results = run_benchmarks(
+                fixtures,
+                names=options['only'],
+                repeat=options['repeat'],
+                warmup=options['warmup'],
+                progress=self.report_progress,
+            )
+            if baseline:
+                self.confirm_regressions(fixtures, results, baseline, options, metric)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        if not results:
+            raise CommandError('No benchmarks matched --only')
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'environment': environment_info(),
+            'dataset': dataset,
+            'benchmarks': results,
+        }
+        self.print_middleware_overhead(results)
+
+        if options['output']:
+            self.write_json(Path(options['output']), report)
+        if options['save_baseline']:
+            self.write_json(baseline_path, report)
+        if baseline:
+            self.compare_with_baseline(report, baseline, baseline_path, options['threshold'], metric)
+
+    def confirm_regressions(self, fixtures, results, baseline, options, metric):
+        """
+        Re-run benchmarks that look slower than the baseline and keep the
+        faster run, so a burst of load on the machine isn't reported as a
+        regression. Query-count regressions are never re-run.
+        """
+        for _ in range(options['confirm_runs']):
+            rows = compare(results, baseline, threshold=options['threshold'], metric=metric)
+            suspects = [row['name'] for row in rows if row['status'] == 'regression' and not row['note']]
+            if not suspects:
+                return
+            self.stdout.write(f"\n🔁 Re-running {len(suspects)} possible regression(s) to rule out noise")
+            rerun = run_benchmarks(
+                fixtures,
+                names=suspects,
+                repeat=options['repeat'],
+                warmup=options['warmup'],
+                progress=self.report_progress,
+            )
+            for name, stats in rerun.items():
+                if name in suspects and stats[metric] < results[name][metric]:
+                    results[name] = stats
+
+    def report_progress(self, name, stats):
+        self.stdout.write(
+            f"   {name:<26} median {stats['median_ms']:>9.3f} ms   "
+            f"p95 {stats['p95_ms']:>9.3f} ms   queries {stats['queries']}"
+        )
+
+    def print_middleware_overhead(self, results):
+        if 'middleware.hitcount' in results and 'middleware.passthrough' in results:
+            overhead = results['middleware.hitcount']['median_ms'] - results['middleware.passthrough']['median_ms']
+            self.stdout.write(f"\n📈 HitCountMiddleware overhead: {overhead:.3f} ms per request")
+
+    def write_json(self, path, report):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(report, indent=2) + '\n', encoding='utf-8')
+        self.stdout.write(self.style.SUCCESS(f"💾 Results written to {path}"))
+
+    def compare_with_baseline(self, report, baseline, baseline_path, threshold, metric):
+        self.stdout.write(f"\n📊 Comparison with {baseline_path} ({metric}, threshold {threshold:.0%})")
+        if baseline.get('environment', {}).get('vendor') != report['environment']['vendor']:
+            self.stdout.write(self.style.WARNING('⚠️  Baseline was recorded on a different database backend'))
+        if baseline.get('dataset') != report['dataset']:
+            self.stdout.write(self.style.WARNING('⚠️  Baseline was recorded with a different dataset'))
+
+        rows = compare(report['benchmarks'], baseline, threshold=threshold, metric=metric)
+        self.stdout.write(f"   {'benchmark':<26} {'baseline':>12} {'current':>12} {'change':>9}  status")
+        for row in rows:
+            baseline_ms = f"{row['baseline_ms']:.3f} ms" if row['baseline_ms'] is not None else '-'
+            current_ms = f"{row['current_ms']:.3f} ms" if row['current_ms'] is not None else '-'
+            change = f"{row['change']:+.1%}" if row['change'] is not None else '-'
+            line = f"   {row['name']:<26} {baseline_ms:>12} {current_ms:>12} {change:>9}  {row['status']} {row['note']}"
+            if row['status'] == 'regression':
+                self.stdout.write(self.style.ERROR(line))
+            elif row['status'] == 'improved':
+                self.stdout.write(self.style.SUCCESS(line))
+            else:
+                self.stdout.write(line)
+
+        regressions = [row['name'] for row in rows if row['status'] == 'regression']
+        if regressions:
+            raise CommandError(f"{len(regressions)} benchmark(s) regressed: {', '.join(regressions)}")
+        self.stdout.write(self.style.SUCCESS('\n✅ No regressions'))
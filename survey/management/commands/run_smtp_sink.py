@@ -0,0 +1,89 @@
+"""
+Run the local SMTP sink (survey/smtp_sink.py) until stopped.
+
+Point the app at it with SMTP_HOST=127.0.0.1 SMTP_PORT=1025 SMTP_USE_TLS=false
+and every email lands here instead of Gmail.
+
+Examples:
+    python manage.py run_smtp_sink
+    python manage.py run_smtp_sink --port 2525 --latency 0.05 --connect-latency 0.3
+    python manage.py run_smtp_sink --fail-rate 0.1 --reject-rate 0.02 --save-dir sent_emails/sink
+"""
+import time
+from email import message_from_bytes
+from email.header import decode_header, make_header
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from survey.smtp_sink import SMTPSink
+
+
+class Command(BaseCommand):
+    help = 'Run a local SMTP server that accepts and records email, with optional latency and failures'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1', help='Address to listen on')
+        parser.add_argument('--port', type=int, default=1025, help='Port to listen on')
+        parser.add_argument('--latency', type=float, default=0.0, help='Seconds of delay before every reply')
+        parser.add_argument('--connect-latency', type=float, default=0.0,
+                            help='Extra seconds before the greeting (simulates TCP/TLS setup)')
+        parser.add_argument('--fail-rate', type=float, default=0.0,
+                            help='Fraction of messages refused with a temporary 451')
+        parser.add_argument('--reject-rate', type=float, default=0.0,
+                            help='Fraction of messages refused permanently with 550')
+        parser.add_argument('--drop-rate', type=float, default=0.0,
+                            help='Fraction of messages answered by dropping the connection')
+        parser.add_argument('--seed', type=int, help='Random seed for the injected failures')
+        parser.add_argument('--save-dir', help='Also write every accepted message to this folder as .eml')
+        parser.add_argument('--quiet', action='store_true', help="Don't print each message")
+
+    def handle(self, *args, **options):
+        rates = [options['fail_rate'], options['reject_rate'], options['drop_rate']]
+        if any(rate < 0 for rate in rates) or sum(rates) > 1:
+            raise CommandError('Failure rates must be non-negative and add up to at most 1')
+
+        save_dir = Path(options['save_dir']) if options['save_dir'] else None
+        if save_dir:
+            save_dir.mkdir(parents=True, exist_ok=True)
+
+        def on_message(message):
+            if save_dir:
+                name = f"{message['received_at']:.6f}.eml"
+                (save_dir / name).write_bytes(message['data'])
+            if not options['quiet']:
+                subject = message_from_bytes(message['data']).get('Subject', '')
+                subject = str(make_header(decode_header(subject)))
+                self.stdout.write(f"📨 {message['from']} → {', '.join(message['to'])}: {subject}")
+
+        sink = SMTPSink(
+            host=options['host'],
+            port=options['port'],
+            latency=options['latency'],
+            connect_latency=options['connect_latency'],
+            fail_rate=options['fail_rate'],
+            reject_rate=options['reject_rate'],
+            drop_rate=options['drop_rate'],
+            seed=options['seed'],
+            on_message=on_message,
+        )
+        try:
+            sink.start()
+        except OSError as e:
+            raise CommandError(f"Could not listen on {options['host']}:{options['port']}: {e}")
+
+        self.stdout.write(self.style.SUCCESS(f"📮 SMTP sink listening on {sink.host}:{sink.port} (Ctrl+C to stop)"))
+        self.stdout.write(f"   SMTP_HOST={sink.host} SMTP_PORT={sink.port} SMTP_USE_TLS=false")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            sink.stop()
+            stats = sink.stats()
+            self.stdout.write(self.style.SUCCESS(
+                f"\n📭 Stopped. Received {stats['received']} message(s) over {stats['connections']} connection(s); "
+                f"injected {stats['failed']} temporary failure(s), {stats['rejected']} rejection(s), "
+                f"{stats['dropped']} dropped connection(s)"
+            ))
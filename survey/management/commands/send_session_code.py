@@ -1,25 +1,40 @@
 from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
 from survey.smtp_email import generate_otp, send_session_code_smtp
 import os
 
 
 class Command(BaseCommand):
-    help = 'Generate a 6-digit OTP and send it via Gmail SMTP to the specified email address'
+    help = (
+        'Generate a 6-digit OTP and send it via Gmail SMTP to the specified email address, '
+        'or broadcast a session code to all registered attendees (--broadcast)'
+    )
 
     def add_arguments(self, parser):
-        parser.add_argument('--email', '-e', required=True, help='Recipient email address')
+        parser.add_argument('--email', '-e', required=False, help='Recipient email address')
         parser.add_argument('--sender', '-s', required=False, help='Sender email (overrides SENDER_EMAIL env var)')
         parser.add_argument('--smtp-user', required=False, help='SMTP username (overrides SMTP_USER env var)')
         parser.add_argument('--smtp-password', required=False, help='SMTP password (overrides SMTP_PASSWORD env var)')
 
+        # Bulk broadcast (queued in the email outbox, delivered by process_email_outbox)
+        parser.add_argument('--broadcast', metavar='SESSION_CODE',
+                            help='Announce this session code to everyone who attended an earlier session')
+        parser.add_argument('--resume', type=int, metavar='BROADCAST_ID',
+                            help='Resume an interrupted broadcast')
+        parser.add_argument('--rate', type=int, default=60, help='Broadcast delivery rate, emails per minute')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Recipients queued per chunk')
+
     def handle(self, *args, **options):
+        if options.get('broadcast') or options.get('resume'):
+            return self.handle_broadcast(options)
+
         recipient = options.get('email')
         sender = options.get('sender') or os.environ.get('SENDER_EMAIL')
         smtp_user = options.get('smtp_user') or os.environ.get('SMTP_USER')
         smtp_password = options.get('smtp_password') or os.environ.get('SMTP_PASSWORD')
 
         if not recipient:
-            raise CommandError('Please provide --email')
+            raise CommandError('Please provide --email (or --broadcast SESSION_CODE)')
 
         otp = generate_otp(6)
         self.stdout.write(f'Generated OTP: {otp}')
@@ -39,3 +54,55 @@ class Command(BaseCommand):
                 self.stdout.write(self.style.ERROR('Failed to send OTP. Check SMTP settings.'))
         except Exception as exc:
             raise CommandError(f'Error sending OTP: {exc}')
+
+    def handle_broadcast(self, options):
+        from survey.broadcast import create_broadcast, run_broadcast
+        from survey.models import Broadcast, ClassSession
+
+        if options['rate'] <= 0 or options['chunk_size'] <= 0:
+            raise CommandError('--rate and --chunk-size must be positive')
+
+        if options.get('resume'):
+            try:
+                broadcast = Broadcast.objects.select_related('class_session').get(id=options['resume'])
+            except Broadcast.DoesNotExist:
+                raise CommandError(f"Broadcast {options['resume']} does not exist")
+            if broadcast.status not in (Broadcast.STATUS_PENDING, Broadcast.STATUS_RUNNING):
+                raise CommandError(f"Broadcast {broadcast.id} is already {broadcast.status}")
+            self.stdout.write(
+                f"🔁 Resuming broadcast {broadcast.id} for '{broadcast.class_session.title}' "
+                f"({broadcast.queued_count + broadcast.skipped_count}/{broadcast.total_recipients} done)"
+            )
+        else:
+            try:
+                session = ClassSession.objects.get(session_code=options['broadcast'].strip().upper())
+            except ClassSession.DoesNotExist:
+                raise CommandError(f"No session with code {options['broadcast']}")
+            broadcast = create_broadcast(session, rate_per_minute=options['rate'], created_by='manage.py')
+            self.stdout.write(
+                f"📣 Broadcast {broadcast.id}: announcing {session.session_code} to "
+                f"{broadcast.total_recipients} recipient(s) at {broadcast.rate_per_minute}/min"
+            )
+
+        def progress(b):
+            self.stdout.write(
+                f"   {b.progress_percent:>3}%  queued {b.queued_count}, skipped {b.skipped_count} "
+                f"of {b.total_recipients}"
+            )
+
+        broadcast = run_broadcast(broadcast.id, chunk_size=options['chunk_size'], progress=progress)
+        if broadcast.status != Broadcast.STATUS_COMPLETED:
+            self.stdout.write(self.style.WARNING(
+                f"⚠️  Broadcast {broadcast.id} is {broadcast.status}; "
+                f"resume it with --resume {broadcast.id}"
+            ))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Broadcast {broadcast.id} queued {broadcast.queued_count} email(s), "
+            f"skipped {broadcast.skipped_count} already queued or sent"
+        ))
+        if broadcast.queued_count and broadcast.next_send_at:
+            self.stdout.write(
+                f"📬 process_email_outbox delivers them until about "
+                f"{timezone.localtime(broadcast.next_send_at):%H:%M}"
+            )
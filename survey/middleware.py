@@ -1,49 +1,257 @@
 """
-Middleware for tracking page hits and visitor statistics
+Middleware for tracking page hits and visitor statistics, and for
+on-demand request profiling
 """
+import atexit
+import random
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+
 from .models import HitCounter
 
 
 def get_client_ip(request):
-    """Get the client's IP address from the request"""
+    """
+    Get the client's IP address from the request. X-Forwarded-For is only
+    trusted as far as TRUSTED_PROXY_COUNT proxies added to it: entries further
+    left were sent by the client and could be anything.
+    """
+    proxies = getattr(settings, 'TRUSTED_PROXY_COUNT', 0)
     x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0]
-    else:
-        ip = request.META.get('REMOTE_ADDR')
+    if not proxies or not x_forwarded_for:
+        return request.META.get('REMOTE_ADDR')
+    addresses = [address.strip() for address in x_forwarded_for.split(',') if address.strip()]
+    if not addresses:
+        return request.META.get('REMOTE_ADDR')
+    ip = addresses[-min(proxies, len(addresses))]
+    if ip.count(':') == 1:
+        # IPv4 with a port, as some proxies (Azure's) send it
+        ip = ip.split(':')[0]
     return ip
 
 
+class HitBuffer:
+    """
+    Hits waiting to be written. Instead of one INSERT per request, rows are
+    saved with one bulk INSERT once HIT_BUFFER_SIZE have piled up or the oldest
+    is HIT_BUFFER_SECONDS old. Each row keeps the time of its request.
+
+    Server processes (wsgi.py, asgi.py) call start_background_flush(), so the
+    age limit holds on a quiet worker too: while hits are waiting, a thread
+    writes them once the oldest is due, and a killed worker loses at most
+    HIT_BUFFER_SECONDS of hits. Only server processes write what is left when
+    they exit; elsewhere (tests, management commands) leftover hits are
+    dropped rather than written to whatever database is configured by then.
+    """
+
+    def __init__(self, write=None):
+        self._hits = []
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._write = write
+        self._background = False
+        self._flusher = None
+
+    def start_background_flush(self):
+        if not self._background:
+            self._background = True
+            atexit.register(self.flush)
+
+    def add(self, hit):
+        """Queue ``hit``; returns the hits that are due to be written now"""
+        size = getattr(settings, 'HIT_BUFFER_SIZE', 50)
+        max_age = getattr(settings, 'HIT_BUFFER_SECONDS', 10)
+        with self._lock:
+            if not self._hits:
+                self._oldest = time.monotonic()
+            self._hits.append(hit)
+            if len(self._hits) < size and time.monotonic() - self._oldest < max_age:
+                # Also true after a fork, where the parent's thread doesn't exist
+                if self._background and (self._flusher is None or not self._flusher.is_alive()):
+                    self._flusher = threading.Thread(
+                        target=self._flush_when_due, name='hit-buffer-flush', daemon=True,
+                    )
+                    self._flusher.start()
+                return []
+            hits, self._hits = self._hits, []
+        return hits
+
+    def flush(self):
+        (self._write or write_hits)(self.clear())
+
+    def clear(self):
+        """Take the waiting hits out of the buffer without writing them"""
+        with self._lock:
+            hits, self._hits = self._hits, []
+        return hits
+
+    def _flush_when_due(self):
+        # Runs while hits are waiting; the next add() starts it again
+        max_age = getattr(settings, 'HIT_BUFFER_SECONDS', 10)
+        while True:
+            with self._lock:
+                if not self._hits:
+                    self._flusher = None
+                    return
+                wait = self._oldest + max_age - time.monotonic()
+                if wait <= 0:
+                    hits, self._hits = self._hits, []
+            if wait > 0:
+                time.sleep(wait)
+                continue
+            (self._write or write_hits)(hits)
+            # Don't keep a database connection open for this thread between flushes
+            connections.close_all()
+
+
+def write_hits(hits):
+    if not hits:
+        return
+    try:
+        HitCounter.objects.bulk_create(hits)
+    except Exception as e:
+        # Don't break the request if tracking fails
+        print(f"Hit counter error: {e}")
+
+
+hit_buffer = HitBuffer()
+
+
 class HitCountMiddleware:
     """
     Middleware to track all page visits
     Records IP address, user agent, path, and timestamp
+
+    Works in both sync and async stacks, so async views stay async under ASGI.
     """
-    
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
-    
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
         # Process request before view
         response = self.get_response(request)
-        
-        # Track the hit after response (async-safe)
-        try:
-            # Skip static files and media
-            if not request.path.startswith(('/static/', '/media/', '/admin/jsi18n/')):
-                # Skip API endpoints if desired (optional)
-                # if not request.path.startswith('/api/'):
-                
-                HitCounter.objects.create(
-                    ip_address=get_client_ip(request),
-                    user_agent=request.META.get('HTTP_USER_AGENT', '')[:500],
-                    path=request.path,
-                    method=request.method,
-                    session_key=request.session.session_key if hasattr(request.session, 'session_key') else None,
-                    user=request.user if request.user.is_authenticated else None
-                )
-        except Exception as e:
-            # Don't break the request if tracking fails
-            print(f"Hit counter error: {e}")
-        
+
+        # Track the hit after response
+        if self.should_track(request):
+            user = request.user if request.user.is_authenticated else None
+            write_hits(hit_buffer.add(self.hit(request, user)))
+
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if self.should_track(request):
+            user = await request.auser()
+            due = hit_buffer.add(self.hit(request, user if user.is_authenticated else None))
+            if due:
+                await sync_to_async(write_hits)(due)
         return response
+
+    def should_track(self, request):
+        # Skip static files and media
+        # Skip API endpoints if desired (optional)
+        # if not request.path.startswith('/api/'):
+        return not request.path.startswith(('/static/', '/media/', '/admin/jsi18n/'))
+
+    def hit(self, request, user):
+        return HitCounter(
+            ip_address=get_client_ip(request),
+            user_agent=request.META.get('HTTP_USER_AGENT', '')[:500],
+            path=request.path,
+            method=request.method,
+            session_key=request.session.session_key if hasattr(request.session, 'session_key') else None,
+            user=user,
+            timestamp=timezone.now(),
+        )
+
+
+class RequestProfilingMiddleware:
+    """
+    Opt-in request profiler.
+
+    A request is profiled when either:
+    - a logged-in admin adds ``?_profile=1`` or the ``X-Profile-Request: 1`` header, or
+    - it hits one of ``REQUEST_PROFILING_VIEWS`` and is picked by random sampling
+      at ``REQUEST_PROFILING_SAMPLE_RATE`` (0.0 - 1.0, disabled by default)
+
+    Profiles are listed at /manage/profiles/. Must be placed after the session
+    and authentication middleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if self.should_profile(request):
+            from .profiling import profile_request
+            return profile_request(request, self.get_response)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if self.is_requested(request):
+            # Checking for an admin may load the session and user from the database
+            profile = await sync_to_async(self.is_admin)(request)
+        else:
+            profile = self.is_sampled(request)
+        if profile:
+            # Sampled on the event-loop thread, where the async view runs
+            from .profiling import aprofile_request
+            return await aprofile_request(request, self.get_response)
+        return await self.get_response(request)
+
+    def is_admin(self, request):
+        if request.session.get('is_admin'):
+            return True
+        user = getattr(request, 'user', None)
+        return bool(user and user.is_staff)
+
+    def is_requested(self, request):
+        return (
+            request.GET.get('_profile') == '1'
+            or request.META.get('HTTP_X_PROFILE_REQUEST') == '1'
+        )
+
+    def should_profile(self, request):
+        if self.is_requested(request):
+            return self.is_admin(request)
+        return self.is_sampled(request)
+
+    def is_sampled(self, request):
+        sample_rate = getattr(settings, 'REQUEST_PROFILING_SAMPLE_RATE', 0)
+        if sample_rate <= 0 or random.random() >= sample_rate:
+            return False
+        return self.is_profiled_view(request.path_info)
+
+    def is_profiled_view(self, path):
+        try:
+            view_name = resolve(path).view_name
+        except Resolver404:
+            return False
+        for pattern in getattr(settings, 'REQUEST_PROFILING_VIEWS', []):
+            if pattern.endswith('*'):
+                if view_name.startswith(pattern[:-1]):
+                    return True
+            elif view_name == pattern:
+                return True
+        return False
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-19 13:45
+
+from django.db import migrations, models
+
+
+def create_counter(apps, schema_editor):
+    SessionCodeSequence = apps.get_model('survey', 'SessionCodeSequence')
+    SessionCodeSequence.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0017_broadcast'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessionCodeSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('next_value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_counter, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-19 13:54
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0018_session_code_sequence'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='hitcounter',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -0,0 +1,108 @@
+# Generated by Django 5.2.6 on 2026-10-19 13:56
+
+from django.db import migrations, models, transaction
+
+# Rows of these tables drop their search entry when deleted, including
+# cascaded deletes, without a query from Django
+INDEXED_TABLES = [
+    ('survey_classsession', 'session'),
+    ('survey_attendee', 'attendee'),
+    ('survey_review', 'review'),
+]
+
+SQLITE_FTS = [
+    "CREATE VIRTUAL TABLE survey_searchindex_fts USING fts5("
+    "content, content='survey_searchindex', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER survey_searchindex_fts_insert AFTER INSERT ON survey_searchindex BEGIN "
+    "INSERT INTO survey_searchindex_fts(rowid, content) VALUES (new.id, new.content); END",
+    "CREATE TRIGGER survey_searchindex_fts_delete AFTER DELETE ON survey_searchindex BEGIN "
+    "INSERT INTO survey_searchindex_fts(survey_searchindex_fts, rowid, content) "
+    "VALUES ('delete', old.id, old.content); END",
+    "CREATE TRIGGER survey_searchindex_fts_update AFTER UPDATE ON survey_searchindex BEGIN "
+    "INSERT INTO survey_searchindex_fts(survey_searchindex_fts, rowid, content) "
+    "VALUES ('delete', old.id, old.content); "
+    "INSERT INTO survey_searchindex_fts(rowid, content) VALUES (new.id, new.content); END",
+]
+
+
+def create_search_objects(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                "ALTER TABLE survey_searchindex ADD COLUMN search_vector tsvector "
+                "GENERATED ALWAYS AS (to_tsvector('simple', content)) STORED"
+            )
+            cursor.execute("CREATE INDEX survey_searchindex_vector ON survey_searchindex USING gin (search_vector)")
+            try:
+                with transaction.atomic(using=connection.alias):
+                    cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+                    cursor.execute(
+                        "CREATE INDEX survey_searchindex_trigram ON survey_searchindex "
+                        "USING gin (content gin_trgm_ops)"
+                    )
+            except Exception as e:
+                # Search still works, substring matches just aren't indexed
+                print(f"⚠️  pg_trgm is not available, skipping the trigram index: {e}")
+            cursor.execute(
+                "CREATE OR REPLACE FUNCTION survey_searchindex_forget() RETURNS trigger AS $$ "
+                "BEGIN DELETE FROM survey_searchindex WHERE kind = TG_ARGV[0] AND object_id = OLD.id; "
+                "RETURN OLD; END $$ LANGUAGE plpgsql"
+            )
+            for table, kind in INDEXED_TABLES:
+                cursor.execute(
+                    f"CREATE TRIGGER {table}_search_forget AFTER DELETE ON {table} "
+                    f"FOR EACH ROW EXECUTE FUNCTION survey_searchindex_forget('{kind}')"
+                )
+        elif connection.vendor == 'sqlite':
+            try:
+                with transaction.atomic(using=connection.alias):
+                    for statement in SQLITE_FTS:
+                        cursor.execute(statement)
+            except Exception as e:
+                # survey.search falls back to LIKE queries without the FTS table
+                print(f"⚠️  SQLite was built without FTS5 trigram support, skipping the full-text table: {e}")
+            for table, kind in INDEXED_TABLES:
+                cursor.execute(
+                    f"CREATE TRIGGER {table}_search_forget AFTER DELETE ON {table} BEGIN "
+                    f"DELETE FROM survey_searchindex WHERE kind = '{kind}' AND object_id = old.id; END"
+                )
+
+
+def drop_search_objects(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for table, kind in INDEXED_TABLES:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {table}_search_forget ON {table}")
+            cursor.execute("DROP FUNCTION IF EXISTS survey_searchindex_forget()")
+        elif connection.vendor == 'sqlite':
+            for table, kind in INDEXED_TABLES:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {table}_search_forget")
+            for name in ('insert', 'delete', 'update'):
+                cursor.execute(f"DROP TRIGGER IF EXISTS survey_searchindex_fts_{name}")
+            cursor.execute("DROP TABLE IF EXISTS survey_searchindex_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0019_hit_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('content', models.TextField()),
+            ],
+            options={
+                'verbose_name_plural': 'Search Index',
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_search_index_object')],
+            },
+        ),
+        migrations.RunPython(create_search_objects, drop_search_objects),
+    ]
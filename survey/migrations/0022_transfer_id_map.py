@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0021_deletion_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransferIdMap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=32)),
+                ('model', models.CharField(max_length=50)),
+                ('old_id', models.BigIntegerField()),
+                ('new_id', models.BigIntegerField()),
+            ],
+            options={
+                'verbose_name_plural': 'Transfer ID Map',
+                'constraints': [models.UniqueConstraint(fields=('source', 'model', 'old_id'), name='unique_transfer_old_id')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_response_sessions(apps, schema_editor):
+    Question = apps.get_model('survey', 'Question')
+    Response = apps.get_model('survey', 'Response')
+    Response.objects.filter(class_session__isnull=True).update(
+        class_session_id=models.Subquery(
+            Question.objects.filter(id=models.OuterRef('question_id')).values('class_session_id')[:1]
+        )
+    )
+
+
+def remove_duplicate_responses(apps, schema_editor):
+    # The quiz views save one answer per question; keep the first of any repeats
+    Response = apps.get_model('survey', 'Response')
+    duplicates = (
+        Response.objects.values('attendee_id', 'question_id')
+        .annotate(first_id=models.Min('id'), answers=models.Count('id'))
+        .filter(answers__gt=1)
+    )
+    for duplicate in duplicates:
+        Response.objects.filter(
+            attendee_id=duplicate['attendee_id'], question_id=duplicate['question_id'],
+        ).exclude(id=duplicate['first_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0022_transfer_id_map'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='response',
+            name='class_session',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='survey.classsession'),
+        ),
+        migrations.RunPython(fill_response_sessions, migrations.RunPython.noop),
+        migrations.RunPython(remove_duplicate_responses, migrations.RunPython.noop),
+    ]
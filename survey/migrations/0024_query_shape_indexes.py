@@ -0,0 +1,43 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:19
+# Separate from 0023: PostgreSQL can't alter survey_response in the transaction
+# that just updated its rows
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0023_response_class_session'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='classsession',
+            index=models.Index(fields=['start_time', 'end_time'], name='session_start_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='classsession',
+            index=models.Index(fields=['end_time'], name='session_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='response',
+            index=models.Index(fields=['attendee', 'class_session'], name='response_attendee_session_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='response',
+            index=models.Index(fields=['class_session', 'attendee'], name='response_session_attendee_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['attendee', 'feedback_type', '-submitted_at'], name='review_attendee_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sessionattendance',
+            index=models.Index(fields=['attendee', '-joined_at'], name='attendance_attendee_joined_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='response',
+            constraint=models.UniqueConstraint(fields=('attendee', 'question'), name='response_one_per_question'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-19 14:30
+
+import survey.models
+from django.db import migrations, models
+
+
+def randomize_counter(apps, schema_editor):
+    # Codes so far were derived from SECRET_KEY starting at 0: switch the
+    # existing counter to a random key and starting point. A new code that
+    # happens to match an old one is retried on save.
+    SessionCodeSequence = apps.get_model('survey', 'SessionCodeSequence')
+    for sequence in SessionCodeSequence.objects.all():
+        sequence.key = survey.models.new_session_code_key()
+        sequence.next_value = survey.models.new_session_code_start()
+        sequence.save(update_fields=['key', 'next_value'])
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0024_query_shape_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sessioncodesequence',
+            name='key',
+            field=models.CharField(default=survey.models.new_session_code_key, editable=False, max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='sessioncodesequence',
+            name='next_value',
+            field=models.BigIntegerField(default=survey.models.new_session_code_start),
+        ),
+        migrations.RunPython(randomize_counter, migrations.RunPython.noop),
+    ]
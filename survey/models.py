@@ -1,7 +1,8 @@
+import secrets
+
 from django.db import models
 from django.core.validators import RegexValidator
-import random
-import string
+from django.utils import timezone
 
 class Admin(models.Model):
     username = models.CharField(max_length=100, unique=True)
@@ -19,22 +20,54 @@ class ClassSession(models.Model):
     end_time = models.DateTimeField()
     session_code = models.CharField(max_length=10, unique=True, blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # Active and upcoming sessions (start_time <= now <= end_time, start_time > now)
+            models.Index(fields=['start_time', 'end_time'], name='session_start_end_idx'),
+            # Finished sessions (end_time < now)
+            models.Index(fields=['end_time'], name='session_end_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so the session-code cache can drop the old code after an edit
+        if 'session_code' in field_names:
+            instance._loaded_session_code = values[field_names.index('session_code')]
+        return instance
+
     def save(self, *args, **kwargs):
         # Auto-generate session code if not provided
-        if not self.session_code:
-            self.session_code = self.generate_session_code()
-        super().save(*args, **kwargs)
+        if self.session_code:
+            return super().save(*args, **kwargs)
+        from .session_codes import save_with_new_code
+        save_with_new_code(self, lambda: super(ClassSession, self).save(*args, **kwargs))
 
     def generate_session_code(self):
         """Generate a unique 8-character session code"""
-        while True:
-            code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
-            if not ClassSession.objects.filter(session_code=code).exists():
-                return code
+        from .session_codes import allocate_session_codes
+        return allocate_session_codes(1)[0]
 
     def __str__(self):
         return f"{self.title} — {self.teacher}"
 
+def new_session_code_key():
+    return secrets.token_hex(32)
+
+
+def new_session_code_start():
+    # Anywhere in the 36^8 code space, so the first codes aren't permute(0), permute(1)...
+    return secrets.randbelow(36 ** 8)
+
+
+class SessionCodeSequence(models.Model):
+    """Counter and secret key that session codes are derived from (see survey/session_codes.py)"""
+    next_value = models.BigIntegerField(default=new_session_code_start)
+    key = models.CharField(max_length=64, default=new_session_code_key, editable=False)
+
+    def __str__(self):
+        return f"Next session code #{self.next_value}"
+
 class Attendee(models.Model):
     name = models.CharField(max_length=100)
     phone = models.CharField(
@@ -86,9 +119,24 @@ class Question(models.Model):
         return f"{self.text} [{self.class_session.title}] - {self.get_question_type_display()}"
 
 
+class ResponseQuerySet(models.QuerySet):
+    def fill_class_session(self):
+        """Set class_session from the question where it is missing (bulk inserts skip save())"""
+        return self.filter(class_session__isnull=True).update(
+            class_session_id=models.Subquery(
+                Question.objects.filter(id=models.OuterRef('question_id')).values('class_session_id')[:1]
+            )
+        )
+
+
 class Response(models.Model):
     attendee = models.ForeignKey(Attendee, on_delete=models.CASCADE)
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
+    # Copy of question.class_session, so per-session queries don't join through Question
+    # (indexed by response_session_attendee_idx below)
+    class_session = models.ForeignKey(
+        ClassSession, on_delete=models.CASCADE, null=True, blank=True, editable=False, db_index=False,
+    )
     
     # For multiple choice questions
     selected_option = models.IntegerField(blank=True, null=True)
@@ -96,6 +144,26 @@ class Response(models.Model):
     # For text response questions
     text_response = models.TextField(blank=True, null=True)
 
+    objects = ResponseQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['attendee', 'question'], name='response_one_per_question'),
+        ]
+        indexes = [
+            # A student's answers in one session (quiz progress, live stats)
+            models.Index(fields=['attendee', 'class_session'], name='response_attendee_session_idx'),
+            # Per-session statistics and exports
+            models.Index(fields=['class_session', 'attendee'], name='response_session_attendee_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.class_session_id is None or (
+            Response.question.is_cached(self) and self.class_session_id != self.question.class_session_id
+        ):
+            self.class_session_id = self.question.class_session_id
+        super().save(*args, **kwargs)
+
     @property
     def is_correct(self):
         # Only applicable for multiple choice questions
@@ -121,8 +189,8 @@ class QuizProgress(models.Model):
     def get_answered_question_ids(self):
         """Get list of question IDs this student has answered for this session"""
         return list(Response.objects.filter(
-            attendee=self.attendee,
-            question__class_session=self.class_session
+            attendee_id=self.attendee_id,
+            class_session_id=self.class_session_id
         ).values_list('question_id', flat=True))
     
     def get_unanswered_questions(self):
@@ -152,6 +220,39 @@ class QuizProgress(models.Model):
         self.save()
         return self.is_fully_completed
 
+    # Async versions for the async views (same queries, via the async ORM)
+
+    async def aget_answered_question_ids(self):
+        return [question_id async for question_id in Response.objects.filter(
+            attendee_id=self.attendee_id,
+            class_session_id=self.class_session_id
+        ).values_list('question_id', flat=True)]
+
+    async def aget_unanswered_questions(self):
+        """List of unanswered questions (a list, since async views can't hand querysets to templates)"""
+        answered_ids = await self.aget_answered_question_ids()
+        return [question async for question in Question.objects.filter(
+            class_session_id=self.class_session_id
+        ).exclude(id__in=answered_ids).order_by('id')]
+
+    async def aget_progress_stats(self):
+        total_questions = await Question.objects.filter(class_session_id=self.class_session_id).acount()
+        answered_questions = len(await self.aget_answered_question_ids())
+        pending_questions = total_questions - answered_questions
+
+        return {
+            'total': total_questions,
+            'answered': answered_questions,
+            'pending': pending_questions,
+            'percentage': round((answered_questions / total_questions * 100) if total_questions > 0 else 0, 1)
+        }
+
+    async def aupdate_completion_status(self):
+        stats = await self.aget_progress_stats()
+        self.is_fully_completed = (stats['pending'] == 0 and stats['total'] > 0)
+        await self.asave()
+        return self.is_fully_completed
+
 
 class SessionAttendance(models.Model):
     """Track all sessions attended by each user"""
@@ -164,6 +265,10 @@ class SessionAttendance(models.Model):
         unique_together = ('attendee', 'class_session')
         ordering = ['-joined_at']
         verbose_name_plural = 'Session Attendances'
+        indexes = [
+            # An attendee's history, newest first
+            models.Index(fields=['attendee', '-joined_at'], name='attendance_attendee_joined_idx'),
+        ]
     
     def __str__(self):
         return f"{self.attendee.name} → {self.class_session.title}"
@@ -180,6 +285,12 @@ class Review(models.Model):
     submitted_at = models.DateTimeField(auto_now_add=True)
     feedback_type = models.CharField(max_length=10, choices=FEEDBACK_TYPES, default='review')
 
+    class Meta:
+        indexes = [
+            # An attendee's quiz feedback or reviews, newest first
+            models.Index(fields=['attendee', 'feedback_type', '-submitted_at'], name='review_attendee_type_idx'),
+        ]
+
     def __str__(self):
         return f"{self.attendee.name} - {self.submitted_at.strftime('%Y-%m-%d')}"
 
@@ -190,7 +301,8 @@ class HitCounter(models.Model):
     user_agent = models.TextField(blank=True)
     path = models.CharField(max_length=500)
     method = models.CharField(max_length=10, default='GET')
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the hit happens, not when the buffered row is written (survey/middleware.py)
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     session_key = models.CharField(max_length=40, blank=True, null=True)
     user = models.ForeignKey('auth.User', on_delete=models.SET_NULL, null=True, blank=True)
     
@@ -229,4 +341,198 @@ class HitCounter(models.Model):
         from django.db.models import Count
         return cls.objects.values('path').annotate(
             hit_count=Count('id')
-        ).order_by('-hit_count')[:limit]
\ No newline at end of file
+        ).order_by('-hit_count')[:limit]
+
+class Broadcast(models.Model):
+    """
+    Announcement of a session's code to everyone who attended earlier sessions.
+    Recipients are queued into the outbox in chunks (see survey/broadcast.py);
+    last_recipient_id, the id of the last attendee gone through, is the resume
+    cursor.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_CANCELLED = 'cancelled'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_CANCELLED, 'Cancelled'),
+    ]
+
+    class_session = models.ForeignKey(ClassSession, on_delete=models.CASCADE, related_name='broadcasts')
+    created_by = models.CharField(max_length=100, blank=True, default='')
+    rate_per_minute = models.PositiveIntegerField(default=60)  # Delivery throttle
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    total_recipients = models.PositiveIntegerField(default=0)
+    queued_count = models.PositiveIntegerField(default=0)
+    skipped_count = models.PositiveIntegerField(default=0)  # Already queued/sent to that address
+    last_recipient_id = models.PositiveIntegerField(default=0)
+    next_send_at = models.DateTimeField(null=True, blank=True)  # Delivery slot for the next queued message
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Broadcast of {self.class_session.title} ({self.status})"
+
+    @property
+    def progress_percent(self):
+        if not self.total_recipients:
+            return 100 if self.status == self.STATUS_COMPLETED else 0
+        done = self.queued_count + self.skipped_count
+        return min(100, round(done * 100 / self.total_recipients))
+
+
+class EmailOutbox(models.Model):
+    """
+    Outgoing email queued by the web requests and delivered by the
+    process_email_outbox worker (see survey/outbox.py).
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_DEAD = 'dead'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENDING, 'Sending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_DEAD, 'Dead Letter'),
+    ]
+
+    kind = models.CharField(max_length=30, default='generic')  # session_code, welcome, ...
+    to_email = models.EmailField()
+    from_email = models.CharField(max_length=255, blank=True, default='')  # Blank = transport default
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True, default='')
+    class_session = models.ForeignKey(ClassSession, on_delete=models.SET_NULL, null=True, blank=True)
+    broadcast = models.ForeignKey(Broadcast, on_delete=models.SET_NULL, null=True, blank=True, related_name='messages')
+
+    # Identical messages to the same recipient share a key and are only queued once
+    dedupe_key = models.CharField(max_length=255, blank=True, null=True)
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)  # When a worker claimed it
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Email Outbox'
+        verbose_name_plural = 'Email Outbox'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+            models.Index(fields=['dedupe_key', 'created_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dedupe_key'],
+                condition=models.Q(status__in=['pending', 'sending']),
+                name='unique_active_outbox_dedupe_key',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} → {self.to_email} ({self.status})"
+
+
+class SearchIndex(models.Model):
+    """
+    Searchable text of sessions, attendees and reviews (see survey/search.py).
+    PostgreSQL adds a tsvector column and trigram index to this table; SQLite
+    mirrors it into an FTS5 table.
+    """
+    kind = models.CharField(max_length=20)  # 'session', 'attendee' or 'review'
+    object_id = models.BigIntegerField()
+    content = models.TextField()
+
+    class Meta:
+        verbose_name_plural = 'Search Index'
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='unique_search_index_object'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.object_id}"
+
+
+class DeletionJob(models.Model):
+    """
+    Background deletion of sessions or attendees with everything that depends
+    on them. The process_email_outbox worker removes the rows in bounded
+    chunks (see survey/deletion.py); step and step_label track where it is.
+    """
+    KIND_SESSIONS = 'sessions'
+    KIND_ATTENDEES = 'attendees'
+    KIND_CHOICES = [
+        (KIND_SESSIONS, 'Sessions'),
+        (KIND_ATTENDEES, 'Attendees'),
+    ]
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    target_ids = models.JSONField(default=list)
+    description = models.CharField(max_length=255, blank=True, default='')  # e.g. the session title
+    created_by = models.CharField(max_length=100, blank=True, default='')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    step = models.PositiveIntegerField(default=0)  # Index into the kind's deletion steps
+    step_label = models.CharField(max_length=50, blank=True, default='')
+    total_rows = models.PositiveIntegerField(default=0)  # Counted when the job starts
+    deleted_rows = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Deletion of {self.description or self.kind} ({self.status})"
+
+    @property
+    def progress_percent(self):
+        # total_rows can over-count rows reached by two steps
+        if self.status == self.STATUS_COMPLETED:
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(100, round(self.deleted_rows * 100 / self.total_rows))
+
+
+class TransferIdMap(models.Model):
+    """
+    Old id -> new id of every row brought in by the import_data command
+    (survey/transfer.py). A chunk's rows and their map entries commit
+    together, so the map is also the resume checkpoint.
+    """
+    source = models.CharField(max_length=32)  # Export id from the manifest
+    model = models.CharField(max_length=50)  # e.g. 'survey.Attendee'
+    old_id = models.BigIntegerField()
+    new_id = models.BigIntegerField()
+
+    class Meta:
+        verbose_name_plural = 'Transfer ID Map'
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'model', 'old_id'], name='unique_transfer_old_id'),
+        ]
+
+    def __str__(self):
+        return f"{self.model} {self.old_id} → {self.new_id}"
@@ -0,0 +1,238 @@
+"""
+Email outbox
+
+Web requests never talk to the SMTP server. They call one of the enqueue_*
+helpers, which store the message in the EmailOutbox table and return at once;
+the ``process_email_outbox`` worker delivers queued mail in batches over the
+pooled SMTP transport.
+
+- Failed sends are retried with exponential backoff (plus jitter) up to
+  EMAIL_OUTBOX_MAX_ATTEMPTS times, then the message moves to the dead-letter
+  state for an admin to inspect or requeue.
+- Messages carry a dedupe key (kind + session + recipient). While one is
+  queued, or was sent within EMAIL_OUTBOX_DEDUPE_WINDOW seconds, enqueueing
+  the same key again returns the existing message instead of a duplicate.
+"""
+import os
+import random
+import smtplib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import EmailOutbox
+
+
+def outbox_setting(name, default):
+    return getattr(settings, f"EMAIL_OUTBOX_{name}", default)
+
+
+def make_dedupe_key(kind, email, class_session=None):
+    session_part = class_session.id if class_session is not None else '-'
+    return f"{kind}:{session_part}:{email.strip().lower()}"
+
+
+def find_duplicate(dedupe_key):
+    """Queued or recently sent message with this key, if any"""
+    window = timezone.now() - timedelta(seconds=outbox_setting('DEDUPE_WINDOW', 300))
+    return EmailOutbox.objects.filter(
+        Q(status__in=[EmailOutbox.STATUS_PENDING, EmailOutbox.STATUS_SENDING])
+        | Q(status=EmailOutbox.STATUS_SENT, sent_at__gte=window),
+        dedupe_key=dedupe_key,
+    ).order_by('-created_at').first()
+
+
+def enqueue_email(to_email, subject, body, html_body='', kind='generic', class_session=None, dedupe=True):
+    """
+    Queue one email. Returns (message, created); created is False when an
+    identical message is already queued or was just sent.
+    """
+    dedupe_key = make_dedupe_key(kind, to_email, class_session) if dedupe else None
+    if dedupe_key:
+        existing = find_duplicate(dedupe_key)
+        if existing:
+            return existing, False
+    try:
+        with transaction.atomic():
+            message = EmailOutbox.objects.create(
+                kind=kind,
+                to_email=to_email.strip(),
+                subject=subject,
+                body=body,
+                html_body=html_body,
+                class_session=class_session,
+                dedupe_key=dedupe_key,
+            )
+    except IntegrityError:
+        # Another request queued the same message in the meantime
+        existing = find_duplicate(dedupe_key) if dedupe_key else None
+        if existing is None:
+            raise
+        return existing, False
+    return message, True
+
+
+def enqueue_bulk(messages):
+    """
+    Queue many emails at once (dicts of EmailOutbox fields, at least to_email,
+    subject, body and kind). Addresses that already have the same mail queued
+    or just sent are skipped. Returns (queued, skipped) counts.
+    """
+    keyed = {}
+    for fields in messages:
+        key = make_dedupe_key(fields['kind'], fields['to_email'], fields.get('class_session'))
+        keyed.setdefault(key, fields)
+
+    window = timezone.now() - timedelta(seconds=outbox_setting('DEDUPE_WINDOW', 300))
+    existing = set(EmailOutbox.objects.filter(
+        Q(status__in=[EmailOutbox.STATUS_PENDING, EmailOutbox.STATUS_SENDING])
+        | Q(status=EmailOutbox.STATUS_SENT, sent_at__gte=window),
+        dedupe_key__in=list(keyed),
+    ).values_list('dedupe_key', flat=True))
+
+    new_messages = [
+        EmailOutbox(dedupe_key=key, **dict(fields, to_email=fields['to_email'].strip()))
+        for key, fields in keyed.items() if key not in existing
+    ]
+    # ignore_conflicts covers a concurrent enqueue of the same key
+    EmailOutbox.objects.bulk_create(new_messages, ignore_conflicts=True)
+    return len(new_messages), len(messages) - len(new_messages)
+
+
+def enqueue_session_code_email(email, name, session):
+    """Queue the session code email for ``session``"""
+    from .email_utils import build_session_code_email
+    subject, plain_message, html_message = build_session_code_email(name, session)
+    return enqueue_email(email, subject, plain_message, html_message, kind='session_code', class_session=session)
+
+
+def enqueue_welcome_email(email, name):
+    """Queue the welcome email for a newly registered participant"""
+    from .email_utils import build_welcome_email
+    subject, plain_message, html_message = build_welcome_email(name)
+    return enqueue_email(email, subject, plain_message, html_message, kind='welcome')
+
+
+# ----- Delivery (used by the process_email_outbox worker) -----
+
+def get_transport():
+    """
+    Return (connection, default_from_email) for delivery.
+
+    Uses EMAIL_BACKEND (the pooled SMTP backend when SMTP_HOST is set). When only
+    the Gmail variables used by smtp_email are set (SENDER_EMAIL, SMTP_USER,
+    SMTP_PASSWORD), mail goes through a pooled Gmail connection instead.
+    """
+    sender = os.environ.get('SENDER_EMAIL')
+    smtp_user = os.environ.get('SMTP_USER')
+    smtp_password = os.environ.get('SMTP_PASSWORD')
+    if not getattr(settings, 'SMTP_HOST', None) and sender and smtp_user and smtp_password:
+        from .smtp_pool import PooledEmailBackend
+        connection = PooledEmailBackend(
+            host='smtp.gmail.com', port=587, username=smtp_user, password=smtp_password,
+            use_tls=True, use_ssl=False,
+        )
+        return connection, sender
+    return get_connection(), settings.DEFAULT_FROM_EMAIL
+
+
+def backoff_delay(attempts):
+    """Seconds to wait before retry number ``attempts`` (1-based), with +/-20% jitter"""
+    base = outbox_setting('BACKOFF_BASE', 30)
+    cap = outbox_setting('BACKOFF_MAX', 3600)
+    delay = min(cap, base * 2 ** (attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def is_permanent_failure(exc):
+    """Errors that retrying will not fix: the server rejected the recipient or message"""
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return True
+    if isinstance(exc, (smtplib.SMTPDataError, smtplib.SMTPSenderRefused)):
+        return 500 <= exc.smtp_code < 600
+    return False
+
+
+def claim_batch(batch_size):
+    """
+    Mark up to ``batch_size`` due messages as sending and return them.
+    Messages stuck in sending (worker died mid-batch) are picked up again
+    after EMAIL_OUTBOX_LOCK_TIMEOUT seconds, so delivery is at-least-once.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=outbox_setting('LOCK_TIMEOUT', 300))
+    with transaction.atomic():
+        # skip_locked lets several workers claim disjoint batches on PostgreSQL;
+        # SQLite ignores it and serializes the claim instead
+        due = EmailOutbox.objects.select_for_update(skip_locked=True).filter(
+            Q(status=EmailOutbox.STATUS_PENDING, next_attempt_at__lte=now)
+            | Q(status=EmailOutbox.STATUS_SENDING, locked_at__lt=stale)
+        )
+        ids = list(due.order_by('next_attempt_at', 'id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return []
+        EmailOutbox.objects.filter(id__in=ids).update(status=EmailOutbox.STATUS_SENDING, locked_at=now)
+    return list(EmailOutbox.objects.filter(id__in=ids).order_by('next_attempt_at', 'id'))
+
+
+def deliver_batch(messages, connection=None, default_from=None):
+    """Send claimed messages and record the outcome; returns a counts dict"""
+    if connection is None:
+        connection, default_from = get_transport()
+    counts = {'sent': 0, 'retry': 0, 'dead': 0}
+    max_attempts = outbox_setting('MAX_ATTEMPTS', 6)
+
+    for message in messages:
+        email = EmailMultiAlternatives(
+            subject=message.subject,
+            body=message.body,
+            from_email=message.from_email or default_from,
+            to=[message.to_email],
+            connection=connection,
+        )
+        if message.html_body:
+            email.attach_alternative(message.html_body, 'text/html')
+
+        message.attempts += 1
+        message.locked_at = None
+        try:
+            email.send(fail_silently=False)
+        except Exception as e:
+            message.last_error = f"{type(e).__name__}: {e}"[:2000]
+            if is_permanent_failure(e) or message.attempts >= max_attempts:
+                message.status = EmailOutbox.STATUS_DEAD
+                counts['dead'] += 1
+            else:
+                message.status = EmailOutbox.STATUS_PENDING
+                message.next_attempt_at = timezone.now() + timedelta(seconds=backoff_delay(message.attempts))
+                counts['retry'] += 1
+        else:
+            message.status = EmailOutbox.STATUS_SENT
+            message.sent_at = timezone.now()
+            message.last_error = ''
+            counts['sent'] += 1
+        message.save(update_fields=['status', 'attempts', 'locked_at', 'last_error', 'next_attempt_at', 'sent_at'])
+    return counts
+
+
+def requeue_dead(queryset=None):
+    """
+    Move dead-letter messages back to pending with a fresh attempt budget.
+    Messages whose recipient already has the same mail queued are left dead.
+    Returns the number requeued.
+    """
+    queryset = queryset if queryset is not None else EmailOutbox.objects.all()
+    requeued = 0
+    for message_id in queryset.filter(status=EmailOutbox.STATUS_DEAD).values_list('id', flat=True):
+        try:
+            with transaction.atomic():
+                requeued += EmailOutbox.objects.filter(id=message_id).update(
+                    status=EmailOutbox.STATUS_PENDING, attempts=0, next_attempt_at=timezone.now(), last_error='',
+                )
+        except IntegrityError:
+            continue
+    return requeued
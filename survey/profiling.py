@@ -0,0 +1,239 @@
+"""
+On-demand request profiling
+
+Runs a single request under a lightweight stack sampler and records every SQL
+query it executes. Each profile is written to ``REQUEST_PROFILING_DIR`` as two
+files sharing the same id:
+
+- ``<id>.folded`` - collapsed stacks ("frame;frame;frame count"), readable by
+  flamegraph.pl, speedscope and similar flame-graph tools
+- ``<id>.json``   - request metadata plus the SQL trace
+
+Async requests are sampled on the event-loop thread, where async views run.
+Sync code they hand to a thread with sync_to_async (ORM calls, sync views
+under ASGI) doesn't show up in the stacks, though its queries are traced; and
+other requests running on the same loop at the time may show up.
+"""
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+PROFILE_ID_RE = re.compile(r'^[0-9]{8}T[0-9]{12}-[0-9a-f]{8}$')
+
+
+def get_profile_dir():
+    """Directory where profiles are stored (created on demand)"""
+    profile_dir = Path(getattr(settings, 'REQUEST_PROFILING_DIR', Path(settings.BASE_DIR) / 'profiles'))
+    profile_dir.mkdir(parents=True, exist_ok=True)
+    return profile_dir
+
+
+class StackSampler:
+    """
+    Periodically samples the Python stack of one thread and aggregates the
+    samples into collapsed stacks.
+    """
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+        self._base_dir = str(settings.BASE_DIR)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _frame_label(self, code):
+        filename = code.co_filename
+        if filename.startswith(self._base_dir):
+            filename = os.path.relpath(filename, self._base_dir)
+        else:
+            # Keep library frames short: ".../site-packages/django/db/x.py" -> "django/db/x.py"
+            marker = 'site-packages' + os.sep
+            if marker in filename:
+                filename = filename.split(marker, 1)[1]
+        return f"{code.co_name} ({filename})".replace(';', ',')
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._frame_label(frame.f_code))
+                frame = frame.f_back
+            self.samples[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        """Return samples in the collapsed-stack text format"""
+        return '\n'.join(f"{stack} {count}" for stack, count in self.samples.most_common())
+
+
+class SQLTracer:
+    """Records every query executed on any configured database connection"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'alias': context['connection'].alias,
+                'sql': sql,
+                'params': repr(params)[:500],
+                'many': many,
+                'duration_ms': round((time.perf_counter() - start) * 1000, 3),
+            })
+
+
+def _trace_queries(tracer):
+    """Install ``tracer`` on this thread's connections; close the returned stack to remove it"""
+    stack = ExitStack()
+    for conn in connections.all():
+        stack.enter_context(conn.execute_wrapper(tracer))
+    return stack
+
+
+def profile_request(request, get_response):
+    """
+    Run ``get_response(request)`` under the sampler and SQL tracer, then store
+    the profile. Returns the response.
+    """
+    interval = getattr(settings, 'REQUEST_PROFILING_INTERVAL', 0.005)
+    sampler = StackSampler(threading.get_ident(), interval=interval)
+    tracer = SQLTracer()
+
+    started_at = timezone.now()
+    start = time.perf_counter()
+    with _trace_queries(tracer):
+        sampler.start()
+        try:
+            response = get_response(request)
+        finally:
+            sampler.stop()
+    duration_ms = (time.perf_counter() - start) * 1000
+
+    _record_profile(request, response, sampler, tracer, started_at, duration_ms)
+    return response
+
+
+async def aprofile_request(request, get_response):
+    """profile_request() for async middleware: samples the event-loop thread"""
+    interval = getattr(settings, 'REQUEST_PROFILING_INTERVAL', 0.005)
+    sampler = StackSampler(threading.get_ident(), interval=interval)
+    tracer = SQLTracer()
+
+    started_at = timezone.now()
+    start = time.perf_counter()
+    # Queries run in the request's sync_to_async thread, on that thread's connections
+    queries = await sync_to_async(_trace_queries)(tracer)
+    sampler.start()
+    try:
+        response = await get_response(request)
+    finally:
+        sampler.stop()
+        await sync_to_async(queries.close)()
+    duration_ms = (time.perf_counter() - start) * 1000
+
+    await sync_to_async(_record_profile)(request, response, sampler, tracer, started_at, duration_ms)
+    return response
+
+
+def _record_profile(request, response, sampler, tracer, started_at, duration_ms):
+    resolver_match = getattr(request, 'resolver_match', None)
+    try:
+        save_profile(
+            sampler=sampler,
+            tracer=tracer,
+            meta={
+                'path': request.path,
+                'method': request.method,
+                'view_name': resolver_match.view_name if resolver_match else '',
+                'status_code': response.status_code,
+                'started_at': started_at.isoformat(),
+                'duration_ms': round(duration_ms, 3),
+            },
+        )
+    except OSError as e:
+        # Never break the request if the profile can't be written
+        print(f"Request profiling error: {e}")
+
+
+def save_profile(sampler, tracer, meta):
+    """Write the collapsed stacks and SQL trace to the profile directory"""
+    profile_dir = get_profile_dir()
+    profile_id = f"{timezone.now():%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}"
+
+    meta = dict(meta)
+    meta.update({
+        'id': profile_id,
+        'sample_count': sum(sampler.samples.values()),
+        'query_count': len(tracer.queries),
+        'sql_time_ms': round(sum(q['duration_ms'] for q in tracer.queries), 3),
+        'queries': tracer.queries,
+    })
+
+    (profile_dir / f"{profile_id}.folded").write_text(sampler.collapsed(), encoding='utf-8')
+    (profile_dir / f"{profile_id}.json").write_text(json.dumps(meta, indent=2), encoding='utf-8')
+
+    prune_profiles(getattr(settings, 'REQUEST_PROFILING_KEEP', 200))
+    return profile_id
+
+
+def prune_profiles(keep):
+    """Delete all but the ``keep`` most recent profiles"""
+    profile_dir = get_profile_dir()
+    meta_files = sorted(profile_dir.glob('*.json'), reverse=True)
+    for meta_file in meta_files[keep:]:
+        for path in (meta_file, meta_file.with_suffix('.folded')):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles(view_name=None, limit=50):
+    """Return metadata (without the SQL trace) for the most recent profiles"""
+    profiles = []
+    for meta_file in sorted(get_profile_dir().glob('*.json'), reverse=True):
+        try:
+            meta = json.loads(meta_file.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            continue
+        if view_name and not meta.get('view_name', '').startswith(view_name):
+            continue
+        meta.pop('queries', None)
+        profiles.append(meta)
+        if len(profiles) >= limit:
+            break
+    return profiles
+
+
+def get_profile_path(profile_id, kind):
+    """Resolve a profile file, or None if the id is malformed or missing"""
+    if not PROFILE_ID_RE.match(profile_id) or kind not in ('folded', 'json'):
+        return None
+    path = get_profile_dir() / f"{profile_id}.{kind}"
+    return path if path.exists() else None
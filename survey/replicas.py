@@ -0,0 +1,168 @@
+"""
+Read replicas for dashboards, analytics, exports and API lists
+
+Set DATABASE_REPLICA_URLS to one or more read replicas of the DATABASE_URL
+database (settings.py adds them as ``replica1``, ``replica2``...). Reads are
+sent to a random replica only when all of these hold:
+
+- the request is a GET or HEAD for one of REPLICA_READ_VIEWS (URL names,
+  ``*`` wildcards allowed), e.g. the admin dashboard, exports and REST lists
+- the visitor hasn't written anything in the last REPLICA_STICKY_SECONDS:
+  any write sets a short-lived cookie, so a student or admin always reads
+  their own answers, edits and deletes back from the primary (buffered page
+  hits don't count)
+- the request itself hasn't written yet and isn't inside a transaction
+
+Everything else, the student write path included, uses ``default``. Writes
+always go to ``default``, and sessions and the database cache are always
+read from it. Without replicas the router changes nothing.
+
+Streaming responses are read after the middleware has returned, so wrap
+their iterators with routed_iterator() to keep the request's routing.
+Management commands can read from a replica inside ``with use_replica():``.
+"""
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from fnmatch import fnmatchcase
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+# Routing of the current request: {'replica': bool, 'wrote': bool}, or None
+_routing = ContextVar('survey_db_routing', default=None)
+
+# Always read from the primary: their rows are written on nearly every request
+PRIMARY_ONLY_APPS = {'sessions', 'django_cache'}
+
+# Writing these doesn't make the visitor sticky: a request flushes the hits
+# buffered from every visitor, none of which it reads back
+NON_STICKY_MODELS = {'survey.hitcounter'}
+
+STICKY_COOKIE = 'db_primary_until'
+
+
+def replica_aliases():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+class ReplicaRouter:
+    """Database router for DATABASE_ROUTERS; see the module docstring"""
+
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        replicas = replica_aliases()
+        if not state or not state['replica'] or state['wrote'] or not replicas:
+            return None
+        if model._meta.app_label in PRIMARY_ONLY_APPS or connections['default'].in_atomic_block:
+            return None
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if (
+            state is not None
+            and model._meta.app_label not in PRIMARY_ONLY_APPS
+            and model._meta.label_lower not in NON_STICKY_MODELS
+        ):
+            state['wrote'] = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive the schema from the primary
+        return False if db in replica_aliases() else None
+
+
+def is_replica_view(view_name):
+    return any(fnmatchcase(view_name, pattern) for pattern in getattr(settings, 'REPLICA_READ_VIEWS', []))
+
+
+@contextmanager
+def use_replica():
+    """Route reads inside the block to a replica (for commands and scripts)"""
+    token = _routing.set({'replica': True, 'wrote': False})
+    try:
+        yield
+    finally:
+        _routing.reset(token)
+
+
+def routed_iterator(iterator):
+    """Iterate with the routing of the request that created the iterator"""
+    state = _routing.get()
+    while True:
+        token = _routing.set(state)
+        try:
+            item = next(iterator, StopIteration)
+        finally:
+            _routing.reset(token)
+        if item is StopIteration:
+            return
+        yield item
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Tracks the routing of each request (see the module docstring). Must come
+    after the session and authentication middleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = {'replica': False, 'wrote': False}
+        token = _routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return self.finish(state, response)
+
+    async def __acall__(self, request):
+        state = {'replica': False, 'wrote': False}
+        token = _routing.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return self.finish(state, response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _routing.get()
+        if (
+            state is not None
+            and replica_aliases()
+            and request.method in ('GET', 'HEAD')
+            and not self.is_sticky(request)
+            and is_replica_view(request.resolver_match.view_name)
+        ):
+            state['replica'] = True
+        return None
+
+    def is_sticky(self, request):
+        try:
+            return float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def finish(self, state, response):
+        if state['wrote']:
+            seconds = getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+            response.set_cookie(
+                STICKY_COOKIE, f'{time.time() + seconds:.0f}', max_age=seconds, httponly=True, samesite='Lax',
+            )
+        return response
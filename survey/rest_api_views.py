@@ -7,6 +7,7 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from django.contrib.auth.models import User
+from django.db.models import Count
 from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
@@ -23,6 +24,8 @@ from .serializers import (
     QuizProgressSerializer, SessionAttendanceSerializer,
     HitCounterSerializer, AdminSerializer, AdminRegistrationSerializer
 )
+from .search import IndexedSearchFilter
+from .session_codes import lookup_session_code
 
 
 class UserRegistrationView(generics.CreateAPIView):
@@ -68,7 +71,7 @@ class AttendeeViewSet(viewsets.ModelViewSet):
     """
     queryset = Attendee.objects.all().select_related('class_session')
     serializer_class = AttendeeSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, IndexedSearchFilter, filters.OrderingFilter]
     filterset_fields = ['class_session', 'has_submitted']
     search_fields = ['name', 'email', 'place']
     ordering_fields = ['created_at', 'name']
@@ -121,9 +124,9 @@ class QuizSessionViewSet(viewsets.ModelViewSet):
     PUT/PATCH /api/sessions/{id}/ - Update session (Admin only)
     DELETE /api/sessions/{id}/ - Delete session (Admin only)
     """
-    queryset = ClassSession.objects.all().prefetch_related('attendee_set', 'question_set')
+    queryset = ClassSession.objects.annotate(attendee_count=Count('attendee'))
     serializer_class = QuizSessionSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, IndexedSearchFilter, filters.OrderingFilter]
     filterset_fields = ['teacher']
     search_fields = ['title', 'teacher', 'session_code']
     ordering_fields = ['start_time', 'end_time', 'created_at']
@@ -138,6 +141,13 @@ class QuizSessionViewSet(viewsets.ModelViewSet):
             return [AllowAny()]
         return [IsAdminUser()]
     
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'retrieve':
+            # The detail serializer nests every question and attendee
+            queryset = queryset.prefetch_related('attendee_set', 'question_set')
+        return queryset
+    
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return QuizSessionDetailSerializer
@@ -189,7 +199,9 @@ class QuizSessionViewSet(viewsets.ModelViewSet):
             )
         
         try:
-            session = ClassSession.objects.get(session_code=session_code)
+            session = lookup_session_code(session_code)
+            if session is None:
+                raise ClassSession.DoesNotExist
             now = timezone.now()
             
             if now < session.start_time:
@@ -303,9 +315,9 @@ class ReviewViewSet(viewsets.ModelViewSet):
     """
     API endpoint for Reviews/Feedback
     """
-    queryset = Review.objects.all().select_related('attendee')
+    queryset = Review.objects.all().select_related('attendee__class_session')
     serializer_class = ReviewSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, IndexedSearchFilter, filters.OrderingFilter]
     filterset_fields = ['attendee']
     search_fields = ['content']
     ordering_fields = ['submitted_at']
@@ -0,0 +1,215 @@
+"""
+Full-text search over sessions, attendees and reviews
+
+Every indexed object has one SearchIndex row holding its searchable text
+(SEARCH_FIELDS). Saves keep the row up to date through the signals below, and
+database triggers added by migration 0020 drop it when the object is deleted,
+cascades included. Queryset .update() calls bypass the signals, so run
+`python manage.py rebuild_search_index` after bulk edits or imports.
+
+The index is queried natively on each backend:
+- PostgreSQL: a generated tsvector column ranked with ts_rank, plus ILIKE
+  substring matching backed by a pg_trgm GIN index
+- SQLite: an FTS5 trigram table ranked with bm25
+- anything else: plain icontains lookups
+
+search() returns matching object ids, best first; search_queryset() narrows
+a queryset to them. The admin dashboard and the API SearchFilter both use it.
+"""
+import re
+
+from django.conf import settings
+from django.db import OperationalError, connection
+from django.db.models import Case, IntegerField, Value, When
+from django.db.models.signals import post_init, post_save
+from django.dispatch import receiver
+from rest_framework import filters
+
+from .models import Attendee, ClassSession, Review, SearchIndex
+
+# Fields whose text is indexed, per kind
+SEARCH_FIELDS = {
+    'session': ('title', 'teacher', 'session_code'),
+    'attendee': ('name', 'email', 'phone', 'place'),
+    'review': ('content', 'attendee_id'),  # plus the attendee's name
+}
+
+KIND_BY_MODEL = {
+    ClassSession: 'session',
+    Attendee: 'attendee',
+    Review: 'review',
+}
+
+# FTS5 trigram phrases need at least three characters
+MIN_TRIGRAM_LENGTH = 3
+
+
+def join_text(*values):
+    return ' '.join(str(value) for value in values if value)
+
+
+def session_document(session):
+    return join_text(session.title, session.teacher, session.session_code)
+
+
+def attendee_document(attendee):
+    return join_text(attendee.name, attendee.email, attendee.phone, attendee.place)
+
+
+def review_document(review, attendee_name=None):
+    if attendee_name is None:
+        attendee_name = review.attendee.name
+    return join_text(review.content, attendee_name)
+
+
+def index_documents(kind, documents, using='default'):
+    """Insert or replace the index rows for {object_id: text} (one query)"""
+    if not documents:
+        return
+    SearchIndex.objects.using(using).bulk_create(
+        [SearchIndex(kind=kind, object_id=object_id, content=content) for object_id, content in documents.items()],
+        update_conflicts=True,
+        unique_fields=['kind', 'object_id'],
+        update_fields=['content'],
+    )
+
+
+def reindex_attendee_reviews(attendee_id, attendee_name):
+    reviews = Review.objects.filter(attendee_id=attendee_id).values_list('id', 'content')
+    index_documents('review', {
+        review_id: join_text(content, attendee_name) for review_id, content in reviews
+    })
+
+
+# Saves only touch the index when an indexed field changed since the object
+# was loaded. The snapshot reads __dict__ so deferred fields aren't fetched.
+
+def _snapshot(instance, kind):
+    values = tuple(instance.__dict__.get(field) for field in SEARCH_FIELDS[kind])
+    return values if all(field in instance.__dict__ for field in SEARCH_FIELDS[kind]) else None
+
+
+@receiver(post_init, sender=ClassSession)
+@receiver(post_init, sender=Attendee)
+@receiver(post_init, sender=Review)
+def _remember_indexed_fields(sender, instance, **kwargs):
+    instance._search_snapshot = _snapshot(instance, KIND_BY_MODEL[sender])
+
+
+@receiver(post_save, sender=ClassSession)
+@receiver(post_save, sender=Attendee)
+@receiver(post_save, sender=Review)
+def _update_index(sender, instance, created, **kwargs):
+    kind = KIND_BY_MODEL[sender]
+    previous = None if created else getattr(instance, '_search_snapshot', None)
+    current = _snapshot(instance, kind)
+    if previous is not None and previous == current:
+        return
+
+    if kind == 'session':
+        document = session_document(instance)
+    elif kind == 'attendee':
+        document = attendee_document(instance)
+        name_changed = previous is None or previous[0] != instance.name
+        if not created and name_changed:
+            reindex_attendee_reviews(instance.pk, instance.name)
+    else:
+        document = review_document(instance)
+    index_documents(kind, {instance.pk: document})
+    instance._search_snapshot = current
+
+
+def _like_pattern(term):
+    return '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def _search_postgresql(kind, terms, limit):
+    words = re.findall(r'\w+', ' '.join(terms))
+    tsquery = ' & '.join(f"{word}:*" for word in words)
+    like = ' AND '.join("content ILIKE %s" for _ in terms)
+    patterns = [_like_pattern(term) for term in terms]
+    with connection.cursor() as cursor:
+        if tsquery:
+            cursor.execute(
+                "SELECT object_id FROM survey_searchindex, to_tsquery('simple', %s) query "
+                f"WHERE kind = %s AND (search_vector @@ query OR ({like})) "
+                "ORDER BY ts_rank(search_vector, query) DESC, object_id DESC LIMIT %s",
+                [tsquery, kind, *patterns, limit],
+            )
+        else:
+            cursor.execute(
+                f"SELECT object_id FROM survey_searchindex WHERE kind = %s AND {like} "
+                "ORDER BY object_id DESC LIMIT %s",
+                [kind, *patterns, limit],
+            )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _search_sqlite(kind, terms, limit):
+    phrases = [term for term in terms if len(term) >= MIN_TRIGRAM_LENGTH]
+    short_terms = [term for term in terms if len(term) < MIN_TRIGRAM_LENGTH]
+    like = ''.join(" AND i.content LIKE %s ESCAPE '\\'" for _ in short_terms)
+    patterns = [_like_pattern(term) for term in short_terms]
+    with connection.cursor() as cursor:
+        if phrases:
+            match = ' '.join('"' + phrase.replace('"', '""') + '"' for phrase in phrases)
+            try:
+                cursor.execute(
+                    "SELECT i.object_id FROM survey_searchindex_fts f "
+                    "JOIN survey_searchindex i ON i.id = f.rowid "
+                    f"WHERE survey_searchindex_fts MATCH %s AND i.kind = %s{like} "
+                    "ORDER BY bm25(survey_searchindex_fts), i.object_id DESC LIMIT %s",
+                    [match, kind, *patterns, limit],
+                )
+                return [row[0] for row in cursor.fetchall()]
+            except OperationalError as e:
+                # No FTS5 table (see migration 0020), match every term with LIKE instead
+                print(f"Full-text search unavailable, using LIKE: {e}")
+                like = ''.join(" AND i.content LIKE %s ESCAPE '\\'" for _ in terms)
+                patterns = [_like_pattern(term) for term in terms]
+        cursor.execute(
+            f"SELECT i.object_id FROM survey_searchindex i WHERE i.kind = %s{like} "
+            "ORDER BY i.object_id DESC LIMIT %s",
+            [kind, *patterns, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search(kind, query, limit=None):
+    """Ids of the `kind` objects whose text contains every term of `query`, best match first"""
+    terms = query.split()
+    if not terms:
+        return []
+    limit = limit or getattr(settings, 'SEARCH_MAX_RESULTS', 500)
+    if connection.vendor == 'postgresql':
+        return _search_postgresql(kind, terms, limit)
+    if connection.vendor == 'sqlite':
+        return _search_sqlite(kind, terms, limit)
+
+    matches = SearchIndex.objects.filter(kind=kind)
+    for term in terms:
+        matches = matches.filter(content__icontains=term)
+    return list(matches.order_by('-object_id').values_list('object_id', flat=True)[:limit])
+
+
+def search_queryset(queryset, query, limit=None):
+    """`queryset` narrowed to the indexed search matches, ordered by rank (search_rank)"""
+    ids = search(KIND_BY_MODEL[queryset.model], query, limit)
+    if not ids:
+        return queryset.none()
+    return queryset.filter(pk__in=ids).annotate(
+        search_rank=Case(*[When(pk=pk, then=Value(rank)) for rank, pk in enumerate(ids)], output_field=IntegerField())
+    ).order_by('search_rank')
+
+
+class IndexedSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter that answers ?search= from the search index for indexed
+    models. The view's ordering (default or ?ordering=) still applies on top.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_terms = self.get_search_terms(request)
+        if not search_terms or queryset.model not in KIND_BY_MODEL:
+            return super().filter_queryset(request, queryset, view)
+        return search_queryset(queryset, ' '.join(search_terms))
@@ -7,6 +7,7 @@ from .models import (
     Attendee, ClassSession, Question, Response, Review,
     QuizProgress, SessionAttendance, HitCounter, Admin
 )
+from .session_codes import lookup_session_code
 
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for User model"""
@@ -42,14 +43,46 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         return user
 
 
+def attended_sessions_by_attendee(attendee_ids):
+    """
+    Map attendee id -> list of sessions (id, title, session_code) the attendee
+    has responses for, using a single query for all attendees.
+    """
+    attended = {attendee_id: [] for attendee_id in attendee_ids}
+    rows = Response.objects.filter(attendee_id__in=attendee_ids).values_list(
+        'attendee_id',
+        'class_session_id',
+        'class_session__title',
+        'class_session__session_code',
+    ).distinct().order_by('attendee_id', 'class_session_id')
+    for attendee_id, session_id, title, session_code in rows:
+        attended[attendee_id].append({'id': session_id, 'title': title, 'session_code': session_code})
+    return attended
+
+
+class AttendeeListSerializer(serializers.ListSerializer):
+    """Looks up attended sessions for the whole page at once"""
+
+    def to_representation(self, data):
+        attendees = list(data.all() if hasattr(data, 'all') else data)
+        self.child.attended_sessions_map = attended_sessions_by_attendee([a.id for a in attendees])
+        try:
+            return super().to_representation(attendees)
+        finally:
+            self.child.attended_sessions_map = None
+
+
 class AttendeeSerializer(serializers.ModelSerializer):
     """Serializer for Attendee model"""
     session_title = serializers.CharField(source='class_session.title', read_only=True, allow_null=True)
     session_code = serializers.CharField(source='class_session.session_code', read_only=True, allow_null=True)
     attended_sessions = serializers.SerializerMethodField()
     
+    attended_sessions_map = None
+    
     class Meta:
         model = Attendee
+        list_serializer_class = AttendeeListSerializer
         fields = [
             'id', 'name', 'phone', 'email', 'age', 'place',
             'class_session', 'session_title', 'session_code',
@@ -65,18 +98,9 @@ class AttendeeSerializer(serializers.ModelSerializer):
     
     def get_attended_sessions(self, obj):
         """Get all sessions the student has attended (has responses for)"""
-        from .models import Response as QuizResponse
-        
-        # Get unique session IDs from responses
-        session_ids = QuizResponse.objects.filter(
-            attendee=obj
-        ).values_list(
-            'question__class_session_id', flat=True
-        ).distinct()
-        
-        # Get session details
-        sessions = ClassSession.objects.filter(id__in=session_ids).values('id', 'title', 'session_code')
-        return list(sessions)
+        if self.attended_sessions_map is not None and obj.id in self.attended_sessions_map:
+            return self.attended_sessions_map[obj.id]
+        return attended_sessions_by_attendee([obj.id])[obj.id]
 
 
 class AttendeeRegistrationSerializer(serializers.ModelSerializer):
@@ -95,27 +119,21 @@ class AttendeeRegistrationSerializer(serializers.ModelSerializer):
     def validate_session_code(self, value):
         """Validate that session code exists and is active"""
         from django.utils import timezone
-        try:
-            session = ClassSession.objects.get(session_code=value)
-            now = timezone.now()
-            if now < session.start_time:
-                raise serializers.ValidationError("This session has not started yet.")
-            if now > session.end_time:
-                raise serializers.ValidationError("This session has already ended.")
-            return value
-        except ClassSession.DoesNotExist:
+        session = lookup_session_code(value)
+        if session is None:
             raise serializers.ValidationError("Invalid session code.")
+        now = timezone.now()
+        if now < session.start_time:
+            raise serializers.ValidationError("This session has not started yet.")
+        if now > session.end_time:
+            raise serializers.ValidationError("This session has already ended.")
+        return value
     
     def validate_email(self, value):
         """Check if email already registered for this session"""
-        session_code = self.initial_data.get('session_code')
-        if session_code:
-            try:
-                session = ClassSession.objects.get(session_code=session_code)
-                if Attendee.objects.filter(email=value, class_session=session).exists():
-                    raise serializers.ValidationError("This email is already registered for this session.")
-            except ClassSession.DoesNotExist:
-                pass
+        session = lookup_session_code(self.initial_data.get('session_code'))
+        if session is not None and Attendee.objects.filter(email=value, class_session=session).exists():
+            raise serializers.ValidationError("This email is already registered for this session.")
         return value
     
     def create(self, validated_data):
@@ -124,7 +142,9 @@ class AttendeeRegistrationSerializer(serializers.ModelSerializer):
         session_code = validated_data.pop('session_code')
         password = validated_data.pop('password', None)
         
-        session = ClassSession.objects.get(session_code=session_code)
+        session = lookup_session_code(session_code)
+        if session is None:
+            raise serializers.ValidationError({'session_code': "Invalid session code."})
         
         # Create attendee
         attendee = Attendee.objects.create(
@@ -158,6 +178,9 @@ class QuizSessionSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'session_code']
     
     def get_attendee_count(self, obj):
+        # Use the annotation from QuizSessionViewSet when present
+        if hasattr(obj, 'attendee_count'):
+            return obj.attendee_count
         return obj.attendee_set.count()
     
     def get_is_active(self, obj):
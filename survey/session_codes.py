@@ -0,0 +1,339 @@
+"""
+Cached session lookups
+
+Every join checks a session code, so during a join storm the same few codes
+are looked up thousands of times. lookup_session_code() and get_session()
+answer from two cache layers before touching the database:
+
+1. a small in-process LRU, kept only SESSION_CACHE_LOCAL_TTL seconds so other
+   workers pick up edits quickly;
+2. the shared Django cache (SESSION_CACHE_TTL seconds).
+
+Unknown codes are cached too, for SESSION_CACHE_NEGATIVE_TTL seconds, so
+guessing or mistyped codes don't hit the database either.
+
+Both layers are invalidated when a session is saved or deleted (signals
+below). Lookups return real ClassSession instances built with from_db(), so
+they can be used as foreign keys and passed to serializers as usual.
+
+New codes come from allocate_session_codes(): numbers drawn from a database
+counter (SessionCodeSequence) are put through a keyed permutation of the
+36^8 possible codes, so codes never repeat and can't be guessed from one
+another without the key. Reserving n codes is one UPDATE, however large n is.
+
+The key is random and stored with the counter, which starts at a random
+offset, so knowing the settings (SECRET_KEY is committed) doesn't reveal any
+codes. SESSION_CODE_KEY overrides the stored key, e.g. to share one across
+databases.
+"""
+import hashlib
+import hmac
+import string
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import ClassSession, SessionCodeSequence
+
+# Cached in place of a session for codes that don't exist
+MISSING = 'missing'
+
+FIELDS = ['id', 'title', 'teacher', 'start_time', 'end_time', 'session_code']
+
+
+def cache_setting(name, default):
+    return getattr(settings, f"SESSION_CACHE_{name}", default)
+
+
+class LocalLRU:
+    """Thread-safe LRU with a per-entry time to live"""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_local = LocalLRU(maxsize=cache_setting('LOCAL_SIZE', 1024))
+
+
+def _code_key(code):
+    return f"session:code:{code}"
+
+
+def _id_key(session_id):
+    return f"session:id:{session_id}"
+
+
+def _to_row(session):
+    return tuple(getattr(session, field) for field in FIELDS)
+
+
+def _from_row(row):
+    return ClassSession.from_db('default', FIELDS, row)
+
+
+def _lookup(key, query):
+    """Cached row (or MISSING) for ``key``, loading it with ``query`` on a miss"""
+    row = _local.get(key)
+    if row is None:
+        try:
+            row = cache.get(key)
+        except Exception as e:
+            print(f"Session cache error: {e}")
+            row = None
+        if row is None:
+            session = query()
+            row = _to_row(session) if session is not None else MISSING
+            ttl = cache_setting('TTL', 300) if session is not None else cache_setting('NEGATIVE_TTL', 30)
+            try:
+                cache.set(key, row, ttl)
+            except Exception as e:
+                print(f"Session cache error: {e}")
+        local_ttl = cache_setting('LOCAL_TTL', 5)
+        if row == MISSING:
+            local_ttl = min(local_ttl, cache_setting('NEGATIVE_TTL', 30))
+        _local.set(key, row, local_ttl)
+    return None if row == MISSING else _from_row(row)
+
+
+async def _alookup(key, query):
+    """_lookup() for async views: same layers, without blocking the event loop"""
+    row = _local.get(key)
+    if row is None:
+        try:
+            row = await cache.aget(key)
+        except Exception as e:
+            print(f"Session cache error: {e}")
+            row = None
+        if row is None:
+            session = await query()
+            row = _to_row(session) if session is not None else MISSING
+            ttl = cache_setting('TTL', 300) if session is not None else cache_setting('NEGATIVE_TTL', 30)
+            try:
+                await cache.aset(key, row, ttl)
+            except Exception as e:
+                print(f"Session cache error: {e}")
+        local_ttl = cache_setting('LOCAL_TTL', 5)
+        if row == MISSING:
+            local_ttl = min(local_ttl, cache_setting('NEGATIVE_TTL', 30))
+        _local.set(key, row, local_ttl)
+    return None if row == MISSING else _from_row(row)
+
+
+def lookup_session_code(code):
+    """The ClassSession with this code, or None"""
+    code = (code or '').strip()
+    if not code:
+        return None
+    return _lookup(_code_key(code), lambda: ClassSession.objects.filter(session_code=code).first())
+
+
+def get_session(session_id):
+    """The ClassSession with this id, or None"""
+    try:
+        session_id = int(session_id)
+    except (TypeError, ValueError):
+        return None
+    return _lookup(_id_key(session_id), lambda: ClassSession.objects.filter(id=session_id).first())
+
+
+async def alookup_session_code(code):
+    """lookup_session_code() for async views"""
+    code = (code or '').strip()
+    if not code:
+        return None
+    return await _alookup(_code_key(code), lambda: ClassSession.objects.filter(session_code=code).afirst())
+
+
+async def aget_session(session_id):
+    """get_session() for async views"""
+    try:
+        session_id = int(session_id)
+    except (TypeError, ValueError):
+        return None
+    return await _alookup(_id_key(session_id), lambda: ClassSession.objects.filter(id=session_id).afirst())
+
+
+def invalidate_session(session):
+    """Drop cached entries for ``session``, including those under its previous code"""
+    keys = [_id_key(session.pk)]
+    for code in {session.session_code, getattr(session, '_loaded_session_code', None)}:
+        if code:
+            keys.append(_code_key(code))
+    try:
+        cached = cache.get(keys[0])
+        if cached and cached != MISSING:
+            keys.append(_code_key(cached[FIELDS.index('session_code')]))
+        cache.delete_many(keys)
+    except Exception as e:
+        print(f"Session cache error: {e}")
+    _local.delete(*keys)
+
+
+def clear_session_cache():
+    """Forget this process's cached sessions (the shared cache expires on its own)"""
+    _local.clear()
+
+
+@receiver(post_save, sender=ClassSession)
+@receiver(post_delete, sender=ClassSession)
+def _invalidate_on_change(sender, instance, **kwargs):
+    invalidate_session(instance)
+    # A lookup inside the same transaction may have cached the uncommitted row
+    transaction.on_commit(lambda: invalidate_session(instance))
+
+
+# ----- Code allocation -----
+
+CODE_ALPHABET = string.ascii_uppercase + string.digits
+CODE_LENGTH = 8
+# Codes are a pair of 4-character halves; the permutation works on the halves
+HALF_SPACE = len(CODE_ALPHABET) ** (CODE_LENGTH // 2)
+FEISTEL_ROUNDS = 4
+
+# Attempts before giving up when new codes collide with existing (pre-allocator) ones
+MAX_ALLOCATION_ATTEMPTS = 5
+
+
+def _permutation_key(secret):
+    return hashlib.sha256(f"session-code:{secret}".encode('utf-8')).digest()
+
+
+def _round(key, number, value):
+    digest = hmac.new(key, f"{number}:{value}".encode('ascii'), hashlib.sha256).digest()
+    return int.from_bytes(digest[:8], 'big') % HALF_SPACE
+
+
+def permute(number, key):
+    """
+    Map ``number`` (0 <= number < 36^8) to another number in the same range.
+    A balanced Feistel network, so different numbers never map to the same one.
+    """
+    left, right = divmod(number, HALF_SPACE)
+    for n in range(FEISTEL_ROUNDS):
+        left, right = right, (left + _round(key, n, right)) % HALF_SPACE
+    return left * HALF_SPACE + right
+
+
+def encode_code(number):
+    chars = []
+    for _ in range(CODE_LENGTH):
+        number, digit = divmod(number, len(CODE_ALPHABET))
+        chars.append(CODE_ALPHABET[digit])
+    return ''.join(reversed(chars))
+
+
+def _reserve(count):
+    """Reserve ``count`` counter values; returns the first and the stored key"""
+    with transaction.atomic():
+        updated = SessionCodeSequence.objects.filter(pk=1).update(next_value=F('next_value') + count)
+        if not updated:
+            # Created with a random key and starting point (model defaults)
+            SessionCodeSequence.objects.get_or_create(pk=1)
+            SessionCodeSequence.objects.filter(pk=1).update(next_value=F('next_value') + count)
+        # The UPDATE holds the row lock, so this sees our own increment
+        end, key = SessionCodeSequence.objects.filter(pk=1).values_list('next_value', 'key').get()
+    return end - count, key
+
+
+def allocate_session_codes(count):
+    """``count`` new, distinct session codes"""
+    if count <= 0:
+        return []
+    start, stored_key = _reserve(count)
+    key = _permutation_key(getattr(settings, 'SESSION_CODE_KEY', '') or stored_key)
+    space = HALF_SPACE * HALF_SPACE
+    return [encode_code(permute((start + n) % space, key)) for n in range(count)]
+
+
+def _forget_codes(codes):
+    """Drop negative cache entries for codes that now exist (bulk_create sends no signals)"""
+    keys = [_code_key(code) for code in codes]
+    try:
+        cache.delete_many(keys)
+    except Exception as e:
+        print(f"Session cache error: {e}")
+    _local.delete(*keys)
+
+
+def save_with_new_code(session, save):
+    """
+    Give ``session`` a fresh code and call ``save()``. If the code is already
+    taken (by a session created before the allocator), retry with another one.
+    """
+    for attempt in range(MAX_ALLOCATION_ATTEMPTS):
+        session.session_code = allocate_session_codes(1)[0]
+        try:
+            with transaction.atomic():
+                save()
+            return
+        except IntegrityError:
+            if attempt == MAX_ALLOCATION_ATTEMPTS - 1 or not _code_taken(session.session_code):
+                session.session_code = None
+                raise
+
+
+def _code_taken(code):
+    return ClassSession.objects.filter(session_code=code).exists()
+
+
+def bulk_create_sessions(sessions, batch_size=None):
+    """
+    Insert many sessions at once, giving those without a code a fresh one.
+    One counter UPDATE for all the codes; returns the created sessions.
+    """
+    sessions = list(sessions)
+    needs_code = [session for session in sessions if not session.session_code]
+    for attempt in range(MAX_ALLOCATION_ATTEMPTS):
+        for session, code in zip(needs_code, allocate_session_codes(len(needs_code))):
+            session.session_code = code
+        try:
+            with transaction.atomic():
+                created = ClassSession.objects.bulk_create(sessions, batch_size=batch_size)
+            break
+        except IntegrityError:
+            taken = set(ClassSession.objects.filter(
+                session_code__in=[session.session_code for session in needs_code]
+            ).values_list('session_code', flat=True))
+            if attempt == MAX_ALLOCATION_ATTEMPTS - 1 or not taken:
+                raise
+            # Only the sessions whose code clashed need a new one
+            needs_code = [session for session in needs_code if session.session_code in taken]
+    _forget_codes([session.session_code for session in sessions])
+    return created
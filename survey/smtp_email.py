@@ -1,9 +1,10 @@
 import os
 import random
-import smtplib
 from email.message import EmailMessage
 from typing import Optional
 
+from .smtp_pool import get_pool
+
 
 def generate_otp(length: int = 6) -> str:
     """Generate a numeric OTP of `length` digits as a zero-padded string.
@@ -32,6 +33,7 @@ def send_session_code_smtp(
     smtp_host: str = "smtp.gmail.com",
     smtp_port: int = 587,
     use_tls: bool = True,
+    timeout: int = 20,
 ) -> bool:
     """Send the `otp` to `recipient_email` using Gmail's SMTP server.
 
@@ -40,7 +42,9 @@ def send_session_code_smtp(
       - SMTP_PASSWORD
       - SENDER_EMAIL (fallback for From header)
 
-    It uses `email.message.EmailMessage` to build the message and `smtplib.SMTP` to send it.
+    It uses `email.message.EmailMessage` to build the message and sends it through
+    the shared connection pool (`survey.smtp_pool`), so repeated sends reuse one
+    logged-in connection instead of doing STARTTLS and login every time.
 
     Returns True on success, False on failure.
     """
@@ -67,17 +71,16 @@ def send_session_code_smtp(
     msg.add_alternative(html_body, subtype="html")
 
     try:
-        if use_tls:
-            server = smtplib.SMTP(smtp_host, smtp_port, timeout=20)
-            server.ehlo()
-            server.starttls()
-            server.ehlo()
-        else:
-            server = smtplib.SMTP_SSL(smtp_host, smtp_port, timeout=20)
-
-        server.login(smtp_user, smtp_password)
-        server.send_message(msg)
-        server.quit()
+        pool = get_pool(
+            smtp_host,
+            smtp_port,
+            username=smtp_user,
+            password=smtp_password,
+            use_tls=use_tls,
+            use_ssl=not use_tls,
+            timeout=timeout,
+        )
+        pool.send_message(msg)
         return True
     except Exception as exc:
         # Keep errors local — caller can log them as needed
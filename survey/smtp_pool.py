@@ -0,0 +1,279 @@
+"""
+Pooled SMTP transport
+
+Opening an SMTP connection costs a TCP connect, STARTTLS, two EHLOs and a
+login - several round trips to Gmail before a single byte of mail is sent.
+This module keeps authenticated connections open and hands them out to
+whichever thread needs to send, so bursts of mail pay the handshake once.
+
+- ``get_pool(...)`` returns the process-wide pool for an SMTP server/account.
+  Pools are thread-safe; each gunicorn worker process gets its own (pools are
+  never shared across a fork).
+- ``PooledEmailBackend`` is a Django email backend on top of the pool, used by
+  ``send_mail`` when SMTP_HOST is configured.
+
+Stale connections (closed by the server after being idle) are detected with a
+NOOP before reuse, and a send that fails because the connection dropped is
+retried once on a fresh connection.
+"""
+import os
+import smtplib
+import ssl
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.mail.message import sanitize_address
+
+# Errors meaning "this connection is dead", as opposed to the server refusing
+# the message or a recipient
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError)
+
+
+class _PooledConnection:
+    def __init__(self, smtp):
+        self.smtp = smtp
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class SMTPConnectionPool:
+    """
+    A bounded pool of logged-in SMTP connections to one server/account.
+
+    At most ``max_connections`` are open at once; callers wait for a free one
+    when all are busy. Idle connections are kept for ``max_idle`` seconds and
+    checked with NOOP when they have been idle longer than ``check_after``.
+    """
+
+    def __init__(self, host, port=587, username=None, password=None, use_tls=True, use_ssl=False,
+                 timeout=20, max_connections=4, max_idle=240, check_after=30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_idle = max_idle
+        self.check_after = check_after
+
+        self._idle = []
+        self._open = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._stats = {'opened': 0, 'reused': 0, 'discarded': 0, 'sent': 0, 'retries': 0}
+
+    # ----- connection lifecycle -----
+
+    def _connect(self):
+        if self.use_ssl:
+            smtp = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout,
+                                    context=ssl.create_default_context())
+        else:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.use_tls:
+                smtp.ehlo()
+                smtp.starttls(context=ssl.create_default_context())
+        smtp.ehlo()
+        if self.username and self.password:
+            smtp.login(self.username, self.password)
+        with self._condition:
+            self._stats['opened'] += 1
+        return _PooledConnection(smtp)
+
+    def _is_alive(self, conn):
+        try:
+            return conn.smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def _close(self, conn):
+        try:
+            conn.smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            try:
+                conn.smtp.close()
+            except OSError:
+                pass
+
+    def _acquire(self):
+        """Take an idle connection, or reserve a slot for a new one (returns None)"""
+        stale = []
+        try:
+            with self._condition:
+                while True:
+                    if self._closed:
+                        raise RuntimeError('SMTP connection pool is closed')
+                    now = time.monotonic()
+                    while self._idle:
+                        conn = self._idle.pop()
+                        if now - conn.last_used <= self.max_idle:
+                            self._stats['reused'] += 1
+                            return conn
+                        # Idle too long to trust; the server has probably dropped it
+                        self._open -= 1
+                        self._stats['discarded'] += 1
+                        stale.append(conn)
+                    if self._open < self.max_connections:
+                        self._open += 1
+                        return None
+                    self._condition.wait()
+        finally:
+            for conn in stale:
+                self._close(conn)
+
+    def _release(self, conn, healthy):
+        with self._condition:
+            if healthy and not self._closed:
+                conn.last_used = time.monotonic()
+                self._idle.append(conn)
+            else:
+                self._open -= 1
+                if conn is not None:
+                    self._stats['discarded'] += 1
+            self._condition.notify()
+        if conn is not None and (not healthy or self._closed):
+            self._close(conn)
+
+    @contextmanager
+    def connection(self, fresh=False):
+        """
+        Check out a live, logged-in ``smtplib.SMTP`` for the duration of the
+        block. ``fresh=True`` skips the idle connections and opens a new one.
+        """
+        conn = self._acquire()
+        healthy = False
+        try:
+            if conn is not None and (fresh or time.monotonic() - conn.last_used > self.check_after
+                                     and not self._is_alive(conn)):
+                self._close(conn)
+                with self._condition:
+                    self._stats['discarded'] += 1
+                conn = None
+            if conn is None:
+                conn = self._connect()
+            yield conn.smtp
+            healthy = True
+        except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused):
+            # The server refused this message; the connection itself is fine
+            healthy = conn is not None
+            raise
+        finally:
+            self._release(conn, healthy)
+
+    # ----- sending -----
+
+    def _send_with_retry(self, send):
+        """Call ``send(smtp)``, retrying once on a fresh connection if the pooled one is dead"""
+        for attempt in range(2):
+            try:
+                with self.connection(fresh=bool(attempt)) as smtp:
+                    result = send(smtp)
+                with self._condition:
+                    self._stats['sent'] += 1
+                return result
+            except CONNECTION_ERRORS:
+                if attempt:
+                    raise
+                with self._condition:
+                    self._stats['retries'] += 1
+
+    def send(self, from_addr, to_addrs, message_bytes):
+        """Send one raw message; returns smtplib's refused-recipients dict"""
+        return self._send_with_retry(lambda smtp: smtp.sendmail(from_addr, to_addrs, message_bytes))
+
+    def send_message(self, msg, from_addr=None, to_addrs=None):
+        """Send an ``email.message.EmailMessage`` (addresses default to its headers)"""
+        return self._send_with_retry(lambda smtp: smtp.send_message(msg, from_addr, to_addrs))
+
+    def stats(self):
+        with self._condition:
+            return dict(self._stats, open=self._open, idle=len(self._idle))
+
+    def close(self):
+        """Close all idle connections; busy ones are closed when released"""
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+            self._condition.notify_all()
+        for conn in idle:
+            self._close(conn)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+_pools_pid = os.getpid()
+
+
+def get_pool(host, port=587, username=None, password=None, use_tls=True, use_ssl=False, timeout=20,
+             max_connections=None, max_idle=None):
+    """Return the shared pool for this server/account, creating it on first use"""
+    global _pools_pid
+    key = (host, port, username, password, use_tls, use_ssl)
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            # Forked (e.g. a gunicorn worker): sockets from the parent must not be reused
+            _pools.clear()
+            _pools_pid = os.getpid()
+        pool = _pools.get(key)
+        if pool is None:
+            pool = SMTPConnectionPool(
+                host, port, username=username, password=password, use_tls=use_tls, use_ssl=use_ssl,
+                timeout=timeout,
+                max_connections=max_connections or getattr(settings, 'SMTP_POOL_MAX_CONNECTIONS', 4),
+                max_idle=max_idle or getattr(settings, 'SMTP_POOL_MAX_IDLE', 240),
+            )
+            _pools[key] = pool
+        return pool
+
+
+def close_all_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+class PooledEmailBackend(BaseEmailBackend):
+    """
+    Django email backend that sends through the shared SMTP pool.
+
+    Reads the usual EMAIL_HOST / EMAIL_PORT / EMAIL_HOST_USER /
+    EMAIL_HOST_PASSWORD / EMAIL_USE_TLS / EMAIL_USE_SSL / EMAIL_TIMEOUT settings.
+    open() and close() are no-ops: connections stay in the pool between calls.
+    """
+
+    def __init__(self, host=None, port=None, username=None, password=None, use_tls=None, use_ssl=None,
+                 timeout=None, fail_silently=False, **kwargs):
+        super().__init__(fail_silently=fail_silently)
+        self.pool = get_pool(
+            host or settings.EMAIL_HOST,
+            port or settings.EMAIL_PORT,
+            username=settings.EMAIL_HOST_USER if username is None else username,
+            password=settings.EMAIL_HOST_PASSWORD if password is None else password,
+            use_tls=settings.EMAIL_USE_TLS if use_tls is None else use_tls,
+            use_ssl=settings.EMAIL_USE_SSL if use_ssl is None else use_ssl,
+            timeout=timeout or getattr(settings, 'EMAIL_TIMEOUT', None) or 20,
+        )
+
+    def send_messages(self, email_messages):
+        sent = 0
+        for message in email_messages:
+            if not message.recipients():
+                continue
+            encoding = message.encoding or settings.DEFAULT_CHARSET
+            from_email = sanitize_address(message.from_email, encoding)
+            recipients = [sanitize_address(addr, encoding) for addr in message.recipients()]
+            try:
+                self.pool.send(from_email, recipients, message.message().as_bytes(linesep='\r\n'))
+                sent += 1
+            except (smtplib.SMTPException, OSError):
+                if not self.fail_silently:
+                    raise
+        return sent
@@ -0,0 +1,236 @@
+"""
+Local SMTP stand-in
+
+A tiny threaded SMTP server that accepts every message and keeps it in memory.
+Point Django at it (SMTP_HOST=127.0.0.1, SMTP_PORT=<port>, SMTP_USE_TLS=false)
+to exercise the email paths without talking to Gmail.
+
+To behave more like a real provider it can inject:
+
+- latency: a delay before every reply (one network round trip), plus an extra
+  connect_latency before the greeting (TCP + TLS setup on a real server);
+- failures: a fraction of messages refused with a temporary 451
+  (fail_rate), refused permanently with 550 (reject_rate), or cut off by
+  dropping the connection mid-transaction (drop_rate).
+
+Start it with ``manage.py run_smtp_sink``, from code with ``SMTPSink``, or in
+tests with ``SMTPSinkTestMixin``.
+"""
+import random
+import socketserver
+import threading
+import time
+
+from django.test import override_settings
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """Speaks just enough SMTP for smtplib and Django's SMTP backend"""
+
+    def reply(self, line):
+        if self.server.sink.latency:
+            time.sleep(self.server.sink.latency)
+        self.wfile.write(f"{line}\r\n".encode('ascii'))
+
+    def handle(self):
+        sink = self.server.sink
+        sink.count('connections')
+        if sink.connect_latency:
+            time.sleep(sink.connect_latency)
+        self.reply('220 localhost SMTP sink ready')
+        mail_from = None
+        rcpt_to = []
+
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').strip()
+            verb = command[:4].upper()
+
+            if verb in ('EHLO', 'HELO'):
+                self.reply('250-localhost\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME')
+            elif verb == 'AUTH':
+                self.reply('235 Authentication successful')
+            elif verb == 'MAIL':
+                mail_from = command.split(':', 1)[1].strip()
+                rcpt_to = []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                rcpt_to.append(command.split(':', 1)[1].strip())
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                while True:
+                    data_line = self.rfile.readline()
+                    if not data_line or data_line in (b'.\r\n', b'.\n'):
+                        break
+                    data.append(data_line)
+
+                outcome = sink.pick_outcome()
+                if outcome == 'drop':
+                    sink.count('dropped')
+                    return
+                if outcome == 'fail':
+                    sink.count('failed')
+                    self.reply('451 Temporary failure, please try again later')
+                elif outcome == 'reject':
+                    sink.count('rejected')
+                    self.reply('550 Message rejected')
+                else:
+                    sink.record(mail_from, rcpt_to, b''.join(data))
+                    self.reply('250 OK: queued')
+            elif verb == 'RSET':
+                mail_from, rcpt_to = None, []
+                self.reply('250 OK')
+            elif verb == 'NOOP':
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class _ThreadingSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SMTPSink:
+    """
+    Start/stop wrapper around the sink server.
+
+    Usage:
+        with SMTPSink(port=0, latency=0.02, fail_rate=0.1) as sink:
+            ...  # sink.port is the bound port
+            print(len(sink.messages), sink.stats())
+    """
+
+    def __init__(self, host='127.0.0.1', port=1025, latency=0.0, connect_latency=0.0,
+                 fail_rate=0.0, reject_rate=0.0, drop_rate=0.0, seed=None, on_message=None):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.fail_rate = fail_rate
+        self.reject_rate = reject_rate
+        self.drop_rate = drop_rate
+        self.on_message = on_message
+        self.messages = []
+        self._counters = {'connections': 0, 'failed': 0, 'rejected': 0, 'dropped': 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def record(self, mail_from, rcpt_to, data):
+        message = {
+            'from': mail_from,
+            'to': list(rcpt_to),
+            'data': data,
+            'received_at': time.time(),
+        }
+        with self._lock:
+            self.messages.append(message)
+        if self.on_message:
+            self.on_message(message)
+
+    def count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def pick_outcome(self):
+        """'ok', or which failure to inject for the message just received"""
+        with self._lock:
+            roll = self._random.random()
+        for outcome, rate in (('drop', self.drop_rate), ('fail', self.fail_rate), ('reject', self.reject_rate)):
+            if roll < rate:
+                return outcome
+            roll -= rate
+        return 'ok'
+
+    @property
+    def message_count(self):
+        with self._lock:
+            return len(self.messages)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, received=len(self.messages))
+
+    def reset(self):
+        with self._lock:
+            self.messages = []
+            self._counters = dict.fromkeys(self._counters, 0)
+
+    def wait_for(self, count, timeout=5.0):
+        """Block until ``count`` messages arrived; returns whether they did"""
+        deadline = time.monotonic() + timeout
+        while self.message_count < count:
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def email_settings(self):
+        """Django settings that send mail through this sink via the pooled backend"""
+        return {
+            'EMAIL_BACKEND': 'survey.smtp_pool.PooledEmailBackend',
+            'EMAIL_HOST': self.host,
+            'EMAIL_PORT': self.port,
+            'EMAIL_HOST_USER': '',
+            'EMAIL_HOST_PASSWORD': '',
+            'EMAIL_USE_TLS': False,
+            'EMAIL_USE_SSL': False,
+            'EMAIL_TIMEOUT': 5,
+        }
+
+    def start(self):
+        self._server = _ThreadingSMTPServer((self.host, self.port), SMTPSinkHandler)
+        self._server.sink = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='smtp-sink', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+class SMTPSinkTestMixin:
+    """
+    TestCase mixin: starts a sink on a free port for the test class and routes
+    Django's email through it. Tests use ``self.smtp_sink``; it is reset before
+    each test. Set ``smtp_sink_options`` to inject latency or failures.
+    """
+    smtp_sink_options = {}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.smtp_sink = SMTPSink(port=0, **cls.smtp_sink_options).start()
+        cls._smtp_sink_settings = override_settings(**cls.smtp_sink.email_settings())
+        cls._smtp_sink_settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls._smtp_sink_settings.disable()
+        from .smtp_pool import close_all_pools
+        close_all_pools()
+        cls.smtp_sink.stop()
+
+    def setUp(self):
+        super().setUp()
+        self.smtp_sink.reset()
@@ -0,0 +1,177 @@
+"""
+Sliding-window rate limits for session-code email requests
+
+request_session_code and /api/sessions/send_code/ can be hit by anyone, as
+often as they like. Two limits sit in front of the email outbox:
+
+- per (email, session), the main guard: a repeat request within
+  SESSION_CODE_EMAIL_WINDOW seconds is answered with "already sent" and
+  nothing is queued;
+- per (client IP, session): more than SESSION_CODE_IP_LIMIT new addresses
+  within SESSION_CODE_IP_WINDOW seconds are refused. A whole classroom can
+  share one NAT address, so this limit is generous and only stops one client
+  from mailing codes to a long list of addresses. The IP comes from
+  get_client_ip(), which trusts X-Forwarded-For only as far as
+  TRUSTED_PROXY_COUNT.
+
+Counts live in the default cache, so every gunicorn worker sees the same
+numbers when CACHES points at a shared backend (Redis or the database
+cache). The window slides: the previous fixed window's count is weighted by
+how much of it still overlaps, which needs two cache keys per limit instead
+of a timestamp log. A limit of one hit per window is tracked exactly, with a
+single key holding the time of the hit.
+
+If the cache is unreachable the limits fail open (the request goes through)
+rather than blocking everyone from joining a session.
+"""
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+STATS_KEY = 'throttle:stats:{name}:{outcome}'
+OUTCOMES = ('allowed', 'already_sent', 'rate_limited')
+
+
+class SlidingWindowLimiter:
+    """At most ``limit`` hits per ``window`` seconds for each key"""
+
+    def __init__(self, name, limit, window):
+        self.name = name
+        self.limit = limit
+        self.window = window
+
+    def _bucket_key(self, key, bucket):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return f"throttle:{self.name}:{digest}:{bucket}"
+
+    def _counts(self, key, now):
+        bucket = int(now // self.window)
+        current_key = self._bucket_key(key, bucket)
+        previous_key = self._bucket_key(key, bucket - 1)
+        counts = cache.get_many([current_key, previous_key])
+        elapsed = (now % self.window) / self.window
+        return current_key, counts.get(current_key, 0), counts.get(previous_key, 0), elapsed
+
+    def usage(self, key, now=None):
+        """Weighted number of hits in the last ``window`` seconds"""
+        _, current, previous, elapsed = self._counts(key, now or time.time())
+        return current + previous * (1 - elapsed)
+
+    def hit(self, key, now=None):
+        """
+        Record a hit if it is within the limit. Returns (allowed, retry_after),
+        retry_after being the seconds until the next hit would be allowed.
+        """
+        now = now or time.time()
+        if self.limit == 1:
+            return self._hit_once(key, now)
+        current_key, current, previous, elapsed = self._counts(key, now)
+        if current + previous * (1 - elapsed) + 1 > self.limit:
+            return False, self._retry_after(current, previous, elapsed)
+
+        # Buckets must outlive the following window, where they count as "previous"
+        if not cache.add(current_key, 1, timeout=self.window * 2):
+            try:
+                cache.incr(current_key)
+            except ValueError:
+                # Expired between add() and incr()
+                cache.set(current_key, 1, timeout=self.window * 2)
+        return True, 0
+
+    def _hit_once(self, key, now):
+        # One hit per window is exact and atomic: the first add() wins and the
+        # key expires exactly ``window`` seconds later
+        once_key = self._bucket_key(key, 'once')
+        if cache.add(once_key, now, timeout=self.window):
+            return True, 0
+        first = cache.get(once_key, now)
+        return False, max(1, math.ceil(self.window - (now - first)))
+
+    def _retry_after(self, current, previous, elapsed):
+        if current + 1 > self.limit:
+            # This bucket must become the previous one and fade until a hit fits
+            fade = max(0.0, 1 - (self.limit - 1) / current)
+            return math.ceil(self.window * (1 - elapsed + fade))
+        # The previous bucket must fade until a hit fits
+        fade = 1 - (self.limit - 1 - current) / previous
+        return max(1, math.ceil(self.window * (fade - elapsed)))
+
+    def reset(self, key, now=None):
+        bucket = int((now or time.time()) // self.window)
+        cache.delete_many([
+            self._bucket_key(key, bucket), self._bucket_key(key, bucket - 1), self._bucket_key(key, 'once'),
+        ])
+
+
+def session_code_email_limiter():
+    return SlidingWindowLimiter(
+        'session_code_email',
+        limit=getattr(settings, 'SESSION_CODE_EMAIL_LIMIT', 1),
+        window=getattr(settings, 'SESSION_CODE_EMAIL_WINDOW', 300),
+    )
+
+
+def session_code_ip_limiter():
+    return SlidingWindowLimiter(
+        'session_code_ip',
+        limit=getattr(settings, 'SESSION_CODE_IP_LIMIT', 100),
+        window=getattr(settings, 'SESSION_CODE_IP_WINDOW', 600),
+    )
+
+
+def _record(outcome):
+    key = STATS_KEY.format(name='session_code', outcome=outcome)
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+
+
+def check_session_code_request(email, session, ip):
+    """
+    Decide whether to queue a session-code email.
+
+    Returns (outcome, retry_after): outcome is 'allowed', 'already_sent' (the
+    same email was sent for this session within the window) or 'rate_limited'
+    (too many requests from this IP for this session).
+    """
+    try:
+        # Repeats for the same address never count against the IP
+        email_limiter = session_code_email_limiter()
+        email_key = f"{session.id}:{email.strip().lower()}"
+        allowed, retry_after = email_limiter.hit(email_key)
+        if not allowed:
+            outcome = 'already_sent'
+        else:
+            allowed, retry_after = session_code_ip_limiter().hit(f"{session.id}:{ip or 'unknown'}")
+            if allowed:
+                outcome = 'allowed'
+            else:
+                # Nothing is sent, so the address may ask again
+                email_limiter.reset(email_key)
+                outcome = 'rate_limited'
+        _record(outcome)
+    except Exception as e:
+        print(f"Throttle cache error: {e}")
+        return 'allowed', 0
+    return outcome, retry_after
+
+
+def throttle_stats():
+    """Counts of allowed / already_sent / rate_limited session-code requests"""
+    keys = {outcome: STATS_KEY.format(name='session_code', outcome=outcome) for outcome in OUTCOMES}
+    try:
+        values = cache.get_many(list(keys.values()))
+    except Exception as e:
+        print(f"Throttle cache error: {e}")
+        values = {}
+    return {outcome: values.get(key, 0) for outcome, key in keys.items()}
+
+
+def format_wait(seconds):
+    minutes = math.ceil(seconds / 60)
+    return f"{minutes} minute{'s' if minutes != 1 else ''}" if seconds >= 60 else f"{seconds} seconds"
@@ -0,0 +1,469 @@
+"""
+Streaming database transfer (e.g. SQLite -> PostgreSQL)
+
+export_data writes one JSON-lines file per model plus manifest.json into a
+directory. Rows are read with .values().iterator(), so memory stays flat
+whatever the table sizes. Each line is one row: its concrete fields by
+attribute name, foreign keys as the old ids.
+
+import_data reads the files back in MODELS order (parents before children),
+in chunks. Each chunk runs in its own transaction and:
+- skips rows already imported from this export (resume)
+- maps foreign keys to the new ids through TransferIdMap
+- maps rows whose natural key already exists in the target (NATURAL_KEYS) to
+  that row instead of inserting a duplicate
+- inserts the rest with COPY on PostgreSQL (ids taken from the table's
+  sequence up front) or bulk_create elsewhere, keeping the exported
+  timestamps
+- records old id -> new id for every row in TransferIdMap
+
+The chunk's rows and their map entries commit together, so an interrupted
+import started again carries on from the first chunk that didn't commit.
+Rows whose required parent is missing from the export are skipped and
+counted.
+
+Files are split into key-range shards that a process pool imports
+concurrently, following the foreign-key graph: a model starts once the
+models it references are complete (see import_data). check_consistency
+compares the result with the export afterwards.
+"""
+import datetime
+import io
+import json
+import os
+import uuid
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .models import Response, TransferIdMap
+
+MANIFEST = 'manifest.json'
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_SHARD_ROWS = 50000
+
+# Parents before children
+MODELS = [
+    'auth.User',
+    'survey.Admin',
+    'survey.ClassSession',
+    'survey.Attendee',
+    'survey.Question',
+    'survey.Response',
+    'survey.QuizProgress',
+    'survey.SessionAttendance',
+    'survey.Review',
+    'survey.Broadcast',
+    'survey.HitCounter',
+]
+
+# Rows matching an existing target row on this field are mapped to it
+NATURAL_KEYS = {
+    'auth.User': 'username',
+    'survey.Admin': 'username',
+    'survey.ClassSession': 'session_code',
+}
+
+
+class _Encoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder rounds times to milliseconds
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def _filename(label):
+    return f"{label}.jsonl"
+
+
+def _fields(model):
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+# ============= EXPORT =============
+
+def export_data(directory, using='default', labels=None, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """
+    Write every model in MODELS (or ``labels``) to ``directory``. Returns the
+    manifest; ``progress(label, rows)`` is called per finished model.
+    """
+    os.makedirs(directory, exist_ok=True)
+    manifest = {
+        'source': uuid.uuid4().hex,
+        'exported_at': timezone.now().isoformat(),
+        'vendor': connections[using].vendor,
+        'models': {},
+    }
+    for label in labels or MODELS:
+        model = apps.get_model(label)
+        path = os.path.join(directory, _filename(label))
+        rows = 0
+        with open(path + '.tmp', 'w', encoding='utf-8') as out:
+            queryset = model._base_manager.using(using).order_by('pk').values(*_fields(model))
+            for row in queryset.iterator(chunk_size=chunk_size):
+                out.write(json.dumps(row, cls=_Encoder, ensure_ascii=False))
+                out.write('\n')
+                rows += 1
+        os.replace(path + '.tmp', path)
+        manifest['models'][label] = {'file': _filename(label), 'rows': rows}
+        if progress:
+            progress(label, rows)
+
+    # Written last: a directory without a manifest is an unfinished export
+    with open(os.path.join(directory, MANIFEST), 'w', encoding='utf-8') as out:
+        json.dump(manifest, out, indent=2)
+    return manifest
+
+
+# ============= IMPORT =============
+
+def read_manifest(directory):
+    with open(os.path.join(directory, MANIFEST), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def read_chunks(path, chunk_size, start=0, end=None):
+    """Rows of a JSON-lines file (or its bytes from ``start`` to ``end``), ``chunk_size`` at a time"""
+    chunk = []
+    with open(path, 'rb') as f:
+        f.seek(start)
+        position = start
+        for line in f:
+            if end is not None and position >= end:
+                break
+            position += len(line)
+            if line.strip():
+                chunk.append(json.loads(line))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+@contextmanager
+def keep_timestamps(model):
+    """Stop auto_now/auto_now_add fields overwriting the exported values"""
+    fields = [field for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _id_map(source, label, old_ids, using):
+    return dict(
+        TransferIdMap.objects.using(using)
+        .filter(source=source, model=label, old_id__in=old_ids)
+        .values_list('old_id', 'new_id')
+    )
+
+
+def _copy_value(field, value, connection):
+    if value is None:
+        return ''  # Unquoted empty field is NULL in COPY's CSV format
+    value = field.get_db_prep_save(field.to_python(value), connection)
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def _copy_insert(model, rows, connection):
+    """Insert ``rows`` with COPY, ids drawn from the sequence first. Returns the new ids."""
+    meta = model._meta
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)",
+            [meta.db_table, meta.pk.column, len(rows)],
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+        fields = meta.concrete_fields
+        buffer = io.StringIO()
+        for new_id, row in zip(ids, rows):
+            values = [
+                str(new_id) if field.primary_key else _copy_value(field, row.get(field.attname), connection)
+                for field in fields
+            ]
+            buffer.write(','.join(values) + '\n')
+        columns = ', '.join(quote(field.column) for field in fields)
+        sql = f"COPY {quote(meta.db_table)} ({columns}) FROM STDIN WITH (FORMAT csv)"
+        if connection.Database.__name__ == 'psycopg2':
+            buffer.seek(0)
+            cursor.copy_expert(sql, buffer)
+        else:
+            # psycopg 3
+            with cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+    return ids
+
+
+def _insert(model, rows, using, use_copy):
+    connection = connections[using]
+    if use_copy:
+        return _copy_insert(model, rows, connection)
+    objects = [model(**{key: value for key, value in row.items() if key != model._meta.pk.attname})
+               for row in rows]
+    with keep_timestamps(model):
+        if connection.features.can_return_rows_from_bulk_insert:
+            model._base_manager.using(using).bulk_create(objects)
+        else:
+            for obj in objects:
+                obj.save(using=using, force_insert=True)
+    return [obj.pk for obj in objects]
+
+
+def import_chunk(model, label, rows, source, using='default', use_copy=False):
+    """
+    Import one chunk of exported rows in a transaction. Returns counts:
+    created, merged (natural key already present), skipped (missing
+    parent) and resumed (imported by an earlier run).
+    """
+    counts = {'created': 0, 'merged': 0, 'skipped': 0, 'resumed': 0}
+    pk = model._meta.pk.attname
+    with transaction.atomic(using=using):
+        done = _id_map(source, label, [row[pk] for row in rows], using)
+        counts['resumed'] = len(done)
+        rows = [row for row in rows if row[pk] not in done]
+
+        # Foreign keys -> new ids
+        for field in model._meta.concrete_fields:
+            if not field.is_relation or not rows:
+                continue
+            parent = field.related_model._meta.label
+            mapping = _id_map(source, parent, {row.get(field.attname) for row in rows} - {None}, using)
+            kept = []
+            for row in rows:
+                # Exports made before a column was added don't have it
+                old = row.get(field.attname)
+                if old is not None:
+                    row[field.attname] = mapping.get(old)
+                    if row[field.attname] is None and not field.null:
+                        counts['skipped'] += 1
+                        continue
+                kept.append(row)
+            rows = kept
+
+        pairs = []
+        natural_key = NATURAL_KEYS.get(label)
+        if natural_key and rows:
+            existing = dict(
+                model._base_manager.using(using)
+                .filter(**{f'{natural_key}__in': [row[natural_key] for row in rows if row[natural_key]]})
+                .values_list(natural_key, 'pk')
+            )
+            new_rows = []
+            for row in rows:
+                if row[natural_key] in existing:
+                    pairs.append((row[pk], existing[row[natural_key]]))
+                else:
+                    new_rows.append(row)
+            counts['merged'] = len(pairs)
+            rows = new_rows
+
+        if rows:
+            new_ids = _insert(model, rows, using, use_copy)
+            pairs.extend(zip((row[pk] for row in rows), new_ids))
+            counts['created'] = len(rows)
+
+        TransferIdMap.objects.using(using).bulk_create([
+            TransferIdMap(source=source, model=label, old_id=old_id, new_id=new_id) for old_id, new_id in pairs
+        ])
+    return counts
+
+
+def _counts():
+    return {'created': 0, 'merged': 0, 'skipped': 0, 'resumed': 0}
+
+
+def _default_use_copy(using):
+    return connections[using].vendor == 'postgresql'
+
+
+def import_shard(directory, label, source, start, end, using='default', chunk_size=DEFAULT_CHUNK_SIZE,
+                 use_copy=None):
+    """Import the rows of ``label``'s file between byte offsets ``start`` and ``end``; returns counts"""
+    model = apps.get_model(label)
+    if use_copy is None:
+        use_copy = _default_use_copy(using)
+    totals = _counts()
+    for rows in read_chunks(os.path.join(directory, _filename(label)), chunk_size, start, end):
+        for key, value in import_chunk(model, label, rows, source, using=using, use_copy=use_copy).items():
+            totals[key] += value
+    return totals
+
+
+# ============= PARALLEL IMPORT =============
+
+def dependencies(labels):
+    """{label: labels among ``labels`` it has foreign keys to}, read from the models"""
+    graph = {}
+    for label in labels:
+        model = apps.get_model(label)
+        graph[label] = {
+            field.related_model._meta.label for field in model._meta.concrete_fields if field.is_relation
+        } & set(labels) - {label}
+    return graph
+
+
+def plan_shards(path, shard_rows):
+    """
+    Byte ranges of ``shard_rows`` lines each. Exports are written in primary
+    key order, so every range is a contiguous key range.
+    """
+    shards = []
+    start = position = rows = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            position += len(line)
+            rows += 1
+            if rows >= shard_rows:
+                shards.append((start, position))
+                start, rows = position, 0
+    if rows:
+        shards.append((start, position))
+    return shards
+
+
+class _InlineExecutor:
+    """Runs submitted work straight away, for single-worker imports (and SQLite)"""
+
+    def submit(self, function, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(function(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+def _init_worker():
+    # Forked workers must not reuse the parent's database connections or pools
+    import django
+    django.setup()
+    connections.close_all()
+    for connection in connections.all():
+        if getattr(connection, '_connection_pools', None):
+            connection._connection_pools.clear()
+
+
+def import_data(directory, using='default', labels=None, chunk_size=DEFAULT_CHUNK_SIZE, use_copy=None,
+                workers=1, shard_rows=DEFAULT_SHARD_ROWS, progress=None):
+    """
+    Import an export_data directory into ``using``. Returns {label: counts}.
+
+    Each model's file is split into shards of ``shard_rows`` rows, and a
+    model's shards are started once every model it references is complete.
+    With ``workers`` > 1 the shards run in a process pool, each process with
+    its own connection, so independent tables (and the shards of one table)
+    load concurrently. SQLite allows one writer, so it always uses one.
+    ``progress(label, counts)`` is called after each shard with running totals.
+    """
+    manifest = read_manifest(directory)
+    source = manifest['source']
+    todo = [label for label in MODELS if label in manifest['models'] and (not labels or label in labels)]
+    graph = dependencies(todo)
+    if use_copy is None:
+        use_copy = _default_use_copy(using)
+    if connections[using].vendor == 'sqlite':
+        workers = 1
+
+    results = {label: _counts() for label in todo}
+    remaining = {}  # label -> shards still running, for every started model
+    finished = set()
+    running = {}  # future -> label
+    if workers > 1:
+        connections.close_all()
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+    else:
+        executor = _InlineExecutor()
+
+    def start_ready():
+        # Start every model whose dependencies are complete; models without rows complete at once
+        started = True
+        while started:
+            started = False
+            for label in todo:
+                if label in remaining or not graph[label] <= finished:
+                    continue
+                shards = plan_shards(os.path.join(directory, _filename(label)), shard_rows)
+                remaining[label] = len(shards)
+                started = True
+                if not shards:
+                    finished.add(label)
+                for start, end in shards:
+                    future = executor.submit(
+                        import_shard, directory, label, source, start, end,
+                        using=using, chunk_size=chunk_size, use_copy=use_copy,
+                    )
+                    running[future] = label
+
+    try:
+        start_ready()
+        while running:
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                label = running.pop(future)
+                for key, value in future.result().items():
+                    results[label][key] += value
+                if progress:
+                    progress(label, results[label])
+                remaining[label] -= 1
+                if remaining[label] == 0:
+                    finished.add(label)
+                    start_ready()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+    if 'survey.Response' in results:
+        # Older exports have no Response.class_session column
+        Response.objects.using(using).fill_class_session()
+    return results
+
+
+# ============= CONSISTENCY CHECK =============
+
+def check_consistency(directory, using='default', results=None, labels=None):
+    """
+    Compare the target with the export. Returns a list of problems (empty
+    when consistent):
+    - every exported row is in TransferIdMap, apart from the rows ``results``
+      reports as skipped
+    - no row of an imported table has a foreign key to a missing row
+    """
+    manifest = read_manifest(directory)
+    problems = []
+    for label in MODELS:
+        if label not in manifest['models'] or (labels and label not in labels):
+            continue
+        model = apps.get_model(label)
+        expected = manifest['models'][label]['rows']
+        mapped = TransferIdMap.objects.using(using).filter(source=manifest['source'], model=label).count()
+        skipped = results[label]['skipped'] if results and label in results else 0
+        if mapped + skipped != expected:
+            problems.append(f"{label}: {expected} exported, {mapped} imported, {skipped} skipped")
+
+        for field in model._meta.concrete_fields:
+            if not field.is_relation:
+                continue
+            parents = field.related_model._base_manager.using(using).values('pk')
+            dangling = (
+                model._base_manager.using(using)
+                .filter(**{f'{field.attname}__isnull': False})
+                .exclude(**{f'{field.attname}__in': parents})
+                .count()
+            )
+            if dangling:
+                problems.append(f"{label}.{field.name}: {dangling} row(s) point to missing rows")
+    return problems
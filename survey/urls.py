@@ -4,6 +4,7 @@ from . import api_views
 
 urlpatterns = [
     path('', views.home, name='home'),
+    path('events/', views.session_list_events, name='session_list_events'),
     
     # New workflow URLs
     path('session/<int:session_id>/request-code/', views.request_session_code, name='request_session_code'),
@@ -28,6 +29,7 @@ urlpatterns = [
     path('student-logout/', views.student_logout, name='student_logout'),
     path('student-dashboard/', views.student_dashboard, name='student_dashboard'),
     path('session-home/', views.session_home, name='session_home'),
+    path('session-home/events/', views.session_events, name='session_events'),
     
     # Admin routes
     path('admin-login/', views.admin_login, name='admin_login'),
@@ -55,6 +57,21 @@ urlpatterns = [
     path('manage/reviews/bulk-delete/', views.admin_bulk_delete_reviews, name='admin_bulk_delete_reviews'),
     path('manage/attendees/bulk-delete/', views.admin_bulk_delete_attendees, name='admin_bulk_delete_attendees'),
     
+    # Admin request profiles
+    path('manage/profiles/', views.admin_profiles, name='admin_profiles'),
+    path('manage/profiles/<str:profile_id>/<str:kind>/', views.admin_profile_download, name='admin_profile_download'),
+    
+    # Admin database health and connection pool metrics
+    path('manage/database/', views.admin_database_status, name='admin_database_status'),
+    
+    # Admin session-code broadcasts
+    path('manage/broadcasts/', views.admin_broadcasts, name='admin_broadcasts'),
+    path('manage/broadcasts/<int:broadcast_id>/cancel/', views.admin_broadcast_cancel, name='admin_broadcast_cancel'),
+    
+    # Admin CSV/XLSX exports
+    path('manage/export/<str:dataset>.<str:fmt>', views.admin_export, name='admin_export'),
+    path('manage/session/<int:session_id>/export/<str:dataset>.<str:fmt>', views.admin_session_export, name='admin_session_export'),
+    
     path('submit-review/', views.submit_review, name='submit_review'),
     path('now_debug/', views.now_debug, name='now_debug'),
 ]
\ No newline at end of file
@@ -9,8 +9,13 @@ from django.utils import timezone
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.auth.hashers import check_password, make_password
 from .forms import AttendeeForm, StudentLoginForm, AdminLoginForm
+from . import live
+from .homepage import homepage_sessions
+from .search import search_queryset
+from .session_codes import aget_session, get_session, lookup_session_code
+from django.conf import settings
 from django.contrib import messages
-from django.db.models import Count, Q
+from django.db.models import Count
 
 # Maximum minutes allowed per quiz attempt (cap per student attempt)
 QUIZ_MAX_MINUTES = 15
@@ -27,47 +32,19 @@ def home(request):
     # Get current time in UTC (Django stores in UTC by default)
     now = timezone.now()
     
-    # Get current sessions (started but not expired)
-    current_sessions = ClassSession.objects.filter(
-        start_time__lte=now,
-        end_time__gte=now
-    ).order_by('end_time')
-    
-    # Get future sessions (not started yet)
-    future_sessions = ClassSession.objects.filter(
-        start_time__gt=now
-    ).order_by('start_time')
-    
-    # Calculate countdown for each session
-    for session in current_sessions:
-        time_diff = session.end_time - now
-        session.countdown_days = time_diff.days
-        session.countdown_hours, remainder = divmod(time_diff.seconds, 3600)
-        session.countdown_minutes, session.countdown_seconds = divmod(remainder, 60)
-        session.countdown_total_seconds = int(time_diff.total_seconds())
-        session.status = 'current'
-        # expose current attendee count via SessionAttendance related_name 'attendances'
-        try:
-            session.attendee_count = session.attendances.count()
-        except Exception:
-            session.attendee_count = 0
-    
-    for session in future_sessions:
-        time_diff = session.start_time - now
-        session.countdown_days = time_diff.days
-        session.countdown_hours, remainder = divmod(time_diff.seconds, 3600)
-        session.countdown_minutes, session.countdown_seconds = divmod(remainder, 60)
-        session.countdown_total_seconds = int(time_diff.total_seconds())
-        session.status = 'future'
-        try:
-            session.attendee_count = session.attendances.count()
-        except Exception:
-            session.attendee_count = 0
+    # Sessions come from the homepage cache (survey/homepage.py); countdowns are
+    # worked out here from the cached start and end times
+    current_sessions, future_sessions = homepage_sessions(now)
     
     context = {
         'current_sessions': current_sessions,
         'future_sessions': future_sessions,
         'now': timezone.localtime(now),  # Send local time to template for display
+        # Live schedule updates only for students and admins, and only under ASGI
+        # where a held stream costs no worker; everyone else reloads on the countdowns
+        'live_updates': settings.SERVER_MODE == 'asgi' and (
+            request.session.get('is_admin') or 'attendee_id' in request.session
+        ),
     }
     
     return render(request, 'survey/home.html', context)
@@ -94,44 +71,28 @@ def request_session_code(request, session_id):
             request.session['user_email'] = email
             request.session['pending_session_id'] = session.id
             
-            # Send session code via SMTP if configured, otherwise fallback to email_utils
-            code_sent = False
-            try:
-                from .smtp_email import generate_otp, send_session_code_smtp
-                # Generate an OTP only for display; the app previously uses session.session_code
-                otp = session.session_code or generate_otp(6)
-                sender = None
-                smtp_user = None
-                smtp_password = None
-                # Try to send via SMTP (Gmail) using environment variables if set
-                sent_ok = send_session_code_smtp(
-                    recipient_email=email,
-                    otp=otp,
-                    subject='your session code',
-                    sender_email=sender,
-                    smtp_user=smtp_user,
-                    smtp_password=smtp_password,
+            from .middleware import get_client_ip
+            from .throttle import check_session_code_request, format_wait
+            outcome, retry_after = check_session_code_request(email, session, get_client_ip(request))
+            
+            if outcome == 'rate_limited':
+                messages.error(request, f'⏳ Too many requests. Please try again in {format_wait(retry_after)}.')
+            elif outcome == 'already_sent':
+                code_sent = True
+                messages.info(
+                    request,
+                    f'📧 Session code already sent to {email}. Please check your inbox '
+                    f'(you can request it again in {format_wait(retry_after)}).'
                 )
-                if sent_ok:
-                    code_sent = True
-                    messages.success(request, f'Session code sent to {email}!')
-                else:
-                    raise Exception('SMTP send failed')
-            except Exception:
-                # Fall back to existing email_utils (file backend or configured django backend)
+            else:
+                # Queue the session code email; the process_email_outbox worker sends it
                 try:
-                    from .email_utils import send_session_code_email
-                    send_session_code_email(
-                        email=email,
-                        name="Participant",
-                        session_code=session.session_code,
-                        session_title=session.title,
-                        teacher=session.teacher
-                    )
+                    from .outbox import enqueue_session_code_email
+                    enqueue_session_code_email(email=email, name="Participant", session=session)
                     code_sent = True
-                    messages.success(request, f'Session code saved/sent to {email}!')
+                    messages.success(request, f'Session code sent to {email}!')
                 except Exception as e:
-                    print(f"Email error fallback: {e}")
+                    print(f"Email queue error: {e}")
                     messages.error(request, 'Failed to send email. Please try again.')
     
     context = {
@@ -143,11 +104,10 @@ def request_session_code(request, session_id):
     return render(request, 'survey/request_session_code.html', context)
 
 
-def verify_session_code(request, session_id):
+async def verify_session_code(request, session_id):
     """Verify session code entered by user and proceed to registration"""
-    try:
-        session = ClassSession.objects.get(id=session_id)
-    except ClassSession.DoesNotExist:
+    session = await aget_session(session_id)
+    if session is None:
         messages.error(request, 'Session not found')
         return redirect('home')
     
@@ -157,24 +117,24 @@ def verify_session_code(request, session_id):
         
         if entered_code == session.session_code:
             # Code is correct! Check if user already exists
-            existing_user = Attendee.objects.filter(email=email).first()
+            existing_user = await Attendee.objects.filter(email=email).afirst()
             
             if existing_user:
                 # Returning user - go directly to login page
-                request.session['verified_email'] = email
-                request.session['verified_session_id'] = session.id
-                request.session['verified_session_code'] = session.session_code
-                request.session['registered_name'] = existing_user.name
-                request.session['registered_email'] = existing_user.email
-                request.session['registered_session_id'] = session.id  # Pass correct session
+                await request.session.aset('verified_email', email)
+                await request.session.aset('verified_session_id', session.id)
+                await request.session.aset('verified_session_code', session.session_code)
+                await request.session.aset('registered_name', existing_user.name)
+                await request.session.aset('registered_email', existing_user.email)
+                await request.session.aset('registered_session_id', session.id)  # Pass correct session
                 
                 messages.success(request, 'Welcome back! Please login with your password.')
                 return redirect('new_participant_login')
             else:
                 # New user - go to registration page
-                request.session['verified_email'] = email
-                request.session['verified_session_id'] = session.id
-                request.session['verified_session_code'] = session.session_code
+                await request.session.aset('verified_email', email)
+                await request.session.aset('verified_session_id', session.id)
+                await request.session.aset('verified_session_code', session.session_code)
                 
                 messages.success(request, 'Session code verified! Please complete registration.')
                 return redirect('new_participant_register')
@@ -405,7 +365,9 @@ def session_code_entry(request):
             return render(request, 'survey/session_code_entry.html')
         
         try:
-            session = ClassSession.objects.get(session_code=session_code)
+            session = lookup_session_code(session_code)
+            if session is None:
+                raise ClassSession.DoesNotExist
             
             # Check if session is valid (not expired)
             from django.utils import timezone
@@ -518,21 +480,12 @@ def participant_register(request):
             class_session=session
         )
         
-        # Send welcome email with session code
+        # Queue welcome email with session code (sent by the outbox worker)
         try:
-            from .email_utils import send_session_code_email, send_welcome_email
+            from .outbox import enqueue_session_code_email, enqueue_welcome_email
             
-            # Send welcome email
-            send_welcome_email(attendee.email, attendee.name)
-            
-            # Send session code email
-            send_session_code_email(
-                email=attendee.email,
-                name=attendee.name,
-                session_code=session.session_code,
-                session_title=session.title,
-                teacher=session.teacher
-            )
+            enqueue_welcome_email(attendee.email, attendee.name)
+            enqueue_session_code_email(attendee.email, attendee.name, session)
             messages.success(request, f'Registration successful! Check your email for session details.')
         except Exception as e:
             # Don't fail registration if email fails
@@ -733,15 +686,15 @@ def student_login(request):
 
 
 
-def quiz_view(request):
-    attendee_id = request.session.get('attendee_id')
-    class_session_id = request.session.get('class_session_id')
+async def quiz_view(request):
+    attendee_id = await request.session.aget('attendee_id')
+    class_session_id = await request.session.aget('class_session_id')
 
     if not attendee_id or not class_session_id:
         return redirect('submit_response')
 
     try:
-        class_session = ClassSession.objects.get(id=class_session_id)
+        class_session = await ClassSession.objects.aget(id=class_session_id)
     except ClassSession.DoesNotExist:
         return redirect('submit_response')
 
@@ -772,26 +725,26 @@ def quiz_view(request):
         })
 
     try:
-        attendee = Attendee.objects.get(id=attendee_id)
+        attendee = await Attendee.objects.aget(id=attendee_id)
     except Attendee.DoesNotExist:
         return redirect('submit_response')
 
     # ✅ Get or create quiz progress for this session
-    quiz_progress, created = QuizProgress.objects.get_or_create(
+    quiz_progress, created = await QuizProgress.objects.aget_or_create(
         attendee=attendee,
         class_session=class_session
     )
 
     # Ensure progress/completion is up-to-date before computing stats
-    quiz_progress.update_completion_status()
-    progress_stats = quiz_progress.get_progress_stats()
+    await quiz_progress.aupdate_completion_status()
+    progress_stats = await quiz_progress.aget_progress_stats()
     
     # Debug: Print progress stats
     print(f"DEBUG - Progress Stats: {progress_stats}")
-    print(f"DEBUG - Answered IDs: {quiz_progress.get_answered_question_ids()}")
+    print(f"DEBUG - Answered IDs: {await quiz_progress.aget_answered_question_ids()}")
 
     # Get only unanswered questions (allows answering newly added questions)
-    unanswered_questions = quiz_progress.get_unanswered_questions()
+    unanswered_questions = await quiz_progress.aget_unanswered_questions()
     
     # If all questions are answered and session is marked complete, show completion page
     if quiz_progress.is_fully_completed and progress_stats['pending'] == 0:
@@ -802,8 +755,8 @@ def quiz_view(request):
         })
     
     # If no unanswered questions but not marked complete, update status
-    if not unanswered_questions.exists():
-        quiz_progress.update_completion_status()
+    if not unanswered_questions:
+        await quiz_progress.aupdate_completion_status()
         return render(request, 'survey/already_submitted.html', {
             'attendee': attendee,
             'class_session': class_session,
@@ -814,7 +767,7 @@ def quiz_view(request):
     if request.method == "POST":
         print("POST data:", dict(request.POST))  # Debug
 
-        saved_count = 0
+        answers = []
         for q in unanswered_questions:
             # Handle both multiple choice and text response questions
             if q.question_type == 'text_response':
@@ -825,16 +778,12 @@ def quiz_view(request):
                 if not text_answer:
                     continue
                 
-                # Prevent duplicates per question for this attendee
-                if Response.objects.filter(attendee=attendee, question=q).exists():
-                    continue
-                
-                Response.objects.create(
+                answers.append(Response(
                     attendee=attendee,
                     question=q,
+                    class_session_id=q.class_session_id,
                     text_response=text_answer
-                )
-                saved_count += 1
+                ))
             else:
                 # Multiple choice question - required
                 key = f"question_{q.id}"
@@ -843,28 +792,38 @@ def quiz_view(request):
                 if not selected_option:
                     continue
 
-                # Prevent duplicates per question for this attendee
-                if Response.objects.filter(attendee=attendee, question=q).exists():
-                    continue
-
-                Response.objects.create(
+                answers.append(Response(
                     attendee=attendee,
                     question=q,
+                    class_session_id=q.class_session_id,
                     selected_option=int(selected_option)
-                )
-                saved_count += 1
+                ))
+
+        saved_count = 0
+        if answers:
+            # One INSERT for every answer. One answer per question: on a double
+            # submit the first one wins and the other request's rows are skipped
+            await Response.objects.abulk_create(answers, ignore_conflicts=True)
+            submitted = {
+                answer.question_id: (answer.selected_option, answer.text_response) for answer in answers
+            }
+            async for question_id, selected_option, text_response in Response.objects.filter(
+                attendee=attendee, question_id__in=list(submitted)
+            ).values_list('question_id', 'selected_option', 'text_response'):
+                if submitted[question_id] == (selected_option, text_response):
+                    saved_count += 1
 
         # Handle feedback/review submission (optional)
         feedback_content = request.POST.get('feedback_content', '').strip()
         if feedback_content:
             # Check if review already exists for this attendee and session
-            existing_review = Review.objects.filter(
+            existing_review = await Review.objects.filter(
                 attendee=attendee,
                 content=feedback_content
-            ).exists()
+            ).aexists()
             
             if not existing_review:
-                Review.objects.create(
+                await Review.objects.acreate(
                     attendee=attendee,
                     content=feedback_content,
                     feedback_type='quiz'  # Mark as quiz feedback
@@ -873,16 +832,16 @@ def quiz_view(request):
 
         if saved_count > 0:
             # Update quiz progress
-            quiz_progress.update_completion_status()
+            await quiz_progress.aupdate_completion_status()
             
             # Check if there are still more questions to answer
-            remaining_unanswered = quiz_progress.get_unanswered_questions()
+            remaining_unanswered = await quiz_progress.aget_unanswered_questions()
             
-            if remaining_unanswered.exists():
+            if remaining_unanswered:
                 # Still have questions to answer
                 messages.success(
                     request, 
-                    f"✅ Saved {saved_count} answer(s)! You still have {remaining_unanswered.count()} question(s) remaining."
+                    f"✅ Saved {saved_count} answer(s)! You still have {len(remaining_unanswered)} question(s) remaining."
                 )
                 return redirect('quiz')
             else:
@@ -891,7 +850,7 @@ def quiz_view(request):
                     'attendee': attendee,
                     'class_session': class_session,
                     'saved_count': saved_count,
-                    'progress_stats': quiz_progress.get_progress_stats()
+                    'progress_stats': await quiz_progress.aget_progress_stats()
                 })
 
         # If nothing saved but feedback was provided, that's okay
@@ -912,11 +871,11 @@ def quiz_view(request):
     # Record quiz start time if not already recorded
     if not attendee.quiz_started_at:
         attendee.quiz_started_at = now
-        attendee.save()
+        await attendee.asave()
 
     # Calculate remaining time: 5 minutes per question
     MINUTES_PER_QUESTION = 5
-    total_questions = Question.objects.filter(class_session=class_session).count()  # Total questions in the session
+    total_questions = await Question.objects.filter(class_session=class_session).acount()  # Total questions in the session
     quiz_allowed_seconds = total_questions * MINUTES_PER_QUESTION * 60
     
     time_elapsed = (now - attendee.quiz_started_at).total_seconds()
@@ -925,16 +884,16 @@ def quiz_view(request):
     # If time has run out, auto-submit any pending answers and mark complete
     if time_remaining <= 0:
         quiz_progress.is_fully_completed = True
-        quiz_progress.save()
+        await quiz_progress.asave()
         return render(request, 'survey/already_submitted.html', {
             'attendee': attendee,
             'class_session': class_session,
             'message': 'Time expired! Quiz auto-submitted.',
-            'progress_stats': quiz_progress.get_progress_stats()
+            'progress_stats': await quiz_progress.aget_progress_stats()
         })
 
     # Refresh progress stats right before rendering
-    progress_stats = quiz_progress.get_progress_stats()
+    progress_stats = await quiz_progress.aget_progress_stats()
     
     # Debug: Print final progress stats
     print(f"DEBUG - Final Progress Stats before render: {progress_stats}")
@@ -1003,18 +962,18 @@ def student_logout(request):
     return redirect('home')
 
 
-def session_home(request):
+async def session_home(request):
     """Session home page showing countdown and session status"""
-    attendee_id = request.session.get('attendee_id')
-    class_session_id = request.session.get('class_session_id')
+    attendee_id = await request.session.aget('attendee_id')
+    class_session_id = await request.session.aget('class_session_id')
 
     if not attendee_id or not class_session_id:
         messages.error(request, 'Please login first')
         return redirect('student_login')
 
     try:
-        attendee = Attendee.objects.get(id=attendee_id)
-        class_session = ClassSession.objects.get(id=class_session_id)
+        attendee = await Attendee.objects.aget(id=attendee_id)
+        class_session = await ClassSession.objects.aget(id=class_session_id)
     except (Attendee.DoesNotExist, ClassSession.DoesNotExist):
         messages.error(request, 'Session or student not found')
         return redirect('student_login')
@@ -1022,13 +981,13 @@ def session_home(request):
     now = timezone.now()  # Use UTC for comparison
     
     # Get or create quiz progress for this session
-    quiz_progress, created = QuizProgress.objects.get_or_create(
+    quiz_progress, created = await QuizProgress.objects.aget_or_create(
         attendee=attendee,
         class_session=class_session
     )
     
     # Get progress statistics
-    progress_stats = quiz_progress.get_progress_stats()
+    progress_stats = await quiz_progress.aget_progress_stats()
     
     # Calculate time differences
     if now < class_session.start_time:
@@ -1085,6 +1044,22 @@ def session_home(request):
     return render(request, 'survey/session_home.html', context)
 
 
+async def session_events(request):
+    """Live status and progress for the session home page (Server-Sent Events, see survey/live.py)"""
+    attendee_id = await request.session.aget('attendee_id')
+    class_session_id = await request.session.aget('class_session_id')
+
+    if not attendee_id or not class_session_id:
+        return HttpResponse('Please login first', status=403)
+
+    return live.stream_response(request, live.SessionWatcher(class_session_id, attendee_id))
+
+
+async def session_list_events(request):
+    """Tells the homepage when sessions are added, edited or removed (Server-Sent Events)"""
+    return live.stream_response(request, live.SessionListWatcher())
+
+
 # ============= ADMIN VIEWS =============
 
 def admin_login(request):
@@ -1133,7 +1108,7 @@ def admin_dashboard(request):
     total_responses = Response.objects.count()
     
     # Get all sessions with attendee counts and status
-    sessions = ClassSession.objects.all().order_by('-start_time')
+    sessions = ClassSession.objects.annotate(attendee_count=Count('attendee')).order_by('-start_time')
     
     # Filter sessions by status if requested
     if session_filter != 'all':
@@ -1146,12 +1121,9 @@ def admin_dashboard(request):
         elif session_filter == 'finished':
             sessions = sessions.filter(end_time__lt=now)
     
-    # Search sessions by title or teacher (if search filter allows)
+    # Search sessions by title, teacher or code (if search filter allows), best matches first
     if search_query and search_filter in ['all', 'sessions']:
-        sessions = sessions.filter(
-            Q(title__icontains=search_query) | 
-            Q(teacher__icontains=search_query)
-        )
+        sessions = search_queryset(sessions, search_query)
     elif search_filter == 'sessions' and not search_query:
         pass  # Show all sessions
     elif search_filter not in ['all', 'sessions']:
@@ -1160,46 +1132,48 @@ def admin_dashboard(request):
     # Get recent attendees (last 10) with search
     recent_attendees = Attendee.objects.all().order_by('-id')
     if search_query and search_filter in ['all', 'attendees']:
-        recent_attendees = recent_attendees.filter(
-            Q(name__icontains=search_query) | 
-            Q(email__icontains=search_query) |
-            Q(phone__icontains=search_query)
-        )
+        recent_attendees = search_queryset(recent_attendees, search_query)
     elif search_filter == 'attendees' and not search_query:
         pass  # Show all attendees
     elif search_filter not in ['all', 'attendees']:
         recent_attendees = Attendee.objects.none()  # Hide attendees if filtering by other types
-    recent_attendees = recent_attendees[:10]
+    recent_attendees = list(recent_attendees.select_related('class_session')[:10])
     
-    # Add attended sessions and submit status to each attendee
+    # Add attended sessions and submit status to each attendee.
+    # Looked up for all listed attendees at once instead of per attendee.
     from .models import SessionAttendance
+    attendee_ids = [attendee.id for attendee in recent_attendees]
+    sessions_by_attendee = {attendee_id: set() for attendee_id in attendee_ids}
+    for attendee_id, session_id in SessionAttendance.objects.filter(
+        attendee_id__in=attendee_ids
+    ).values_list('attendee_id', 'class_session_id'):
+        sessions_by_attendee[attendee_id].add(session_id)
+    
+    # (attendee, session) pairs the attendees have submitted responses for
+    responded = set(
+        Response.objects.filter(attendee_id__in=attendee_ids)
+        .values_list('attendee_id', 'class_session_id')
+        .distinct()
+    )
+    for attendee_id, session_id in responded:
+        sessions_by_attendee[attendee_id].add(session_id)
+    
+    all_session_ids = set().union(*sessions_by_attendee.values()) if sessions_by_attendee else set()
+    attended_sessions = list(ClassSession.objects.filter(id__in=all_session_ids).order_by('-start_time'))
+    
     for attendee in recent_attendees:
-        # Get all sessions this attendee has attended OR submitted responses for
-        attended_via_attendance = SessionAttendance.objects.filter(attendee=attendee).values_list('class_session_id', flat=True)
-        submitted_sessions = Response.objects.filter(attendee=attendee).values_list('question__class_session_id', flat=True).distinct()
-        
-        # Combine both to get all unique sessions
-        all_session_ids = set(list(attended_via_attendance) + list(submitted_sessions))
-        
-        # Get the actual session objects
-        attendee.attended_sessions_list = ClassSession.objects.filter(id__in=all_session_ids).order_by('-start_time')
+        session_ids = sessions_by_attendee[attendee.id]
+        attendee.attended_sessions_list = [session for session in attended_sessions if session.id in session_ids]
         
         # Check if they have submitted responses for their CURRENT session
-        if attendee.class_session:
-            attendee.has_responses = Response.objects.filter(
-                attendee=attendee,
-                question__class_session=attendee.class_session
-            ).exists()
-        else:
-            attendee.has_responses = False
+        attendee.has_responses = (attendee.id, attendee.class_session_id) in responded
     
     # Get recent reviews (last 5) with search - ONLY general reviews, NOT quiz feedback
-    recent_reviews = Review.objects.filter(feedback_type='review').order_by('-submitted_at')
+    recent_reviews = Review.objects.filter(feedback_type='review').select_related(
+        'attendee__class_session'
+    ).order_by('-submitted_at')
     if search_query and search_filter in ['all', 'reviews']:
-        recent_reviews = recent_reviews.filter(
-            Q(content__icontains=search_query) |
-            Q(attendee__name__icontains=search_query)
-        )
+        recent_reviews = search_queryset(recent_reviews, search_query)
     elif search_filter == 'reviews' and not search_query:
         pass  # Show all reviews
     elif search_filter not in ['all', 'reviews']:
@@ -1223,8 +1197,17 @@ def admin_dashboard(request):
             session.status_label = '🔴 Finished'
             session.status_class = 'badge-danger'
     
+    # Deletions started in the last day, with their progress
+    from datetime import timedelta
+    from .models import DeletionJob
+    deletion_jobs = list(DeletionJob.objects.filter(created_at__gte=now - timedelta(days=1))[:5])
+    
     context = {
         'admin_username': request.session.get('admin_username'),
+        'deletion_jobs': deletion_jobs,
+        'has_active_deletions': any(
+            job.status in (DeletionJob.STATUS_PENDING, DeletionJob.STATUS_RUNNING) for job in deletion_jobs
+        ),
         'total_attendees': total_attendees,
         'total_sessions': total_sessions,
         'total_questions': total_questions,
@@ -1321,7 +1304,7 @@ def admin_session_view(request, session_id):
     # Get session statistics
     attendees = Attendee.objects.filter(class_session=session)
     questions = Question.objects.filter(class_session=session).order_by('id')
-    responses = Response.objects.filter(question__class_session=session)
+    responses = Response.objects.filter(class_session=session)
     
     # Calculate session status
     from django.utils import timezone
@@ -1537,11 +1520,17 @@ def admin_session_delete(request, session_id):
         messages.error(request, 'Please login as admin')
         return redirect('admin_login')
     
+    from .deletion import create_deletion_job
+    from .models import DeletionJob
+
     try:
         session = ClassSession.objects.get(id=session_id)
-        session_title = session.title
-        session.delete()
-        messages.success(request, f'Session "{session_title}" deleted successfully!')
+        # Removed with its questions, attendees and answers by the background worker
+        create_deletion_job(
+            DeletionJob.KIND_SESSIONS, [session.id], description=f'Session "{session.title}"',
+            created_by=request.session.get('admin_username') or '',
+        )
+        messages.success(request, f'🗑️ Session "{session.title}" is being deleted. Progress is shown on the dashboard.')
     except ClassSession.DoesNotExist:
         messages.error(request, 'Session not found')
     
@@ -1555,7 +1544,7 @@ def admin_attendee_view(request, attendee_id):
         return redirect('admin_login')
     
     try:
-        attendee = Attendee.objects.get(id=attendee_id)
+        attendee = Attendee.objects.select_related('class_session').get(id=attendee_id)
     except Attendee.DoesNotExist:
         messages.error(request, 'Attendee not found')
         return redirect('admin_dashboard')
@@ -1564,22 +1553,38 @@ def admin_attendee_view(request, attendee_id):
     from .models import SessionAttendance
     attended_sessions = SessionAttendance.objects.filter(attendee=attendee).select_related('class_session')
     
+    # Load everything needed for the per-session breakdown up front, so the
+    # page costs the same number of queries however many sessions were attended
+    session_ids = [attendance.class_session_id for attendance in attended_sessions]
+    responses_by_session = {}
+    for response in Response.objects.filter(
+        attendee=attendee,
+        class_session_id__in=session_ids
+    ).select_related('question').order_by('id'):
+        responses_by_session.setdefault(response.class_session_id, []).append(response)
+    
+    mc_question_counts = dict(
+        Question.objects.filter(class_session_id__in=session_ids, question_type='multiple_choice')
+        .values('class_session_id')
+        .annotate(total=Count('id'))
+        .values_list('class_session_id', 'total')
+    )
+    completed_session_ids = set(
+        QuizProgress.objects.filter(
+            attendee=attendee,
+            class_session_id__in=session_ids,
+            is_fully_completed=True
+        ).values_list('class_session_id', flat=True)
+    )
+    
     # Group responses by session
     sessions_data = []
     for attendance in attended_sessions:
         session = attendance.class_session
-        
-        # Get responses for this session
-        session_responses = Response.objects.filter(
-            attendee=attendee,
-            question__class_session=session
-        ).select_related('question')
+        session_responses = responses_by_session.get(session.id, [])
         
         # Calculate session statistics
-        total_mc_questions = Question.objects.filter(
-            class_session=session,
-            question_type='multiple_choice'
-        ).count()
+        total_mc_questions = mc_question_counts.get(session.id, 0)
         
         mc_responses = [r for r in session_responses if r.question.question_type == 'multiple_choice']
         text_responses = [r for r in session_responses if r.question.question_type == 'text_response']
@@ -1588,16 +1593,7 @@ def admin_attendee_view(request, attendee_id):
         score = round((correct_answers / total_mc_questions * 100) if total_mc_questions > 0 else 0, 2)
         
         # Check submission status using QuizProgress
-        quiz_progress = QuizProgress.objects.filter(
-            attendee=attendee,
-            class_session=session
-        ).first()
-        
-        is_completed = quiz_progress.is_fully_completed if quiz_progress else False
-        
-        # Get feedback/reviews for this attendee (not session-specific)
-        # We'll show all reviews but could filter by session if Review model had session field
-        feedback = Review.objects.filter(attendee=attendee).order_by('-submitted_at')
+        is_completed = session.id in completed_session_ids
         
         sessions_data.append({
             'session': session,
@@ -1670,11 +1666,16 @@ def admin_attendee_delete(request, attendee_id):
         messages.error(request, 'Please login as admin')
         return redirect('admin_login')
     
+    from .deletion import create_deletion_job
+    from .models import DeletionJob
+
     try:
         attendee = Attendee.objects.get(id=attendee_id)
-        attendee_name = attendee.name
-        attendee.delete()
-        messages.success(request, f'Attendee "{attendee_name}" deleted successfully!')
+        create_deletion_job(
+            DeletionJob.KIND_ATTENDEES, [attendee.id], description=f'Attendee "{attendee.name}"',
+            created_by=request.session.get('admin_username') or '',
+        )
+        messages.success(request, f'🗑️ Attendee "{attendee.name}" is being deleted. Progress is shown on the dashboard.')
     except Attendee.DoesNotExist:
         messages.error(request, 'Attendee not found')
     
@@ -1723,11 +1724,182 @@ def admin_bulk_delete_attendees(request):
     if request.method == 'POST':
         attendee_ids = request.POST.getlist('attendee_ids')
         if attendee_ids:
-            count = Attendee.objects.filter(id__in=attendee_ids).delete()[0]
-            messages.success(request, f'{count} attendee(s) deleted successfully!')
+            from .deletion import create_deletion_job
+            from .models import DeletionJob
+
+            ids = list(Attendee.objects.filter(id__in=attendee_ids).values_list('id', flat=True))
+            if ids:
+                create_deletion_job(
+                    DeletionJob.KIND_ATTENDEES, ids, description=f'{len(ids)} attendee(s)',
+                    created_by=request.session.get('admin_username') or '',
+                )
+            messages.success(request, f'🗑️ {len(ids)} attendee(s) are being deleted. Progress is shown on the dashboard.')
         else:
             messages.warning(request, 'No attendees selected')
     
     return redirect('admin_dashboard')
 
 
+
+
+# ============= REQUEST PROFILES =============
+
+PROFILE_VIEW_FILTERS = [
+    ('', 'All'),
+    ('admin_dashboard', 'Admin Dashboard'),
+    ('quiz', 'Quiz'),
+    ('api:', 'REST API'),
+]
+
+
+def admin_profiles(request):
+    """List recent request profiles captured by RequestProfilingMiddleware"""
+    if not request.session.get('is_admin'):
+        messages.error(request, 'Please login as admin')
+        return redirect('admin_login')
+
+    from .profiling import list_profiles
+
+    view_filter = request.GET.get('view', '')
+    profiles = list_profiles(view_name=view_filter or None)
+
+    context = {
+        'profiles': profiles,
+        'view_filter': view_filter,
+        'view_filters': PROFILE_VIEW_FILTERS,
+        'admin_username': request.session.get('admin_username'),
+    }
+
+    return render(request, 'survey/admin_profiles.html', context)
+
+
+def admin_database_status(request):
+    """JSON health check and connection pool metrics of each database, for this worker process"""
+    if not request.session.get('is_admin'):
+        messages.error(request, 'Please login as admin')
+        return redirect('admin_login')
+
+    from django.http import JsonResponse
+    from .db_health import database_status
+
+    status = database_status()
+    healthy = all(database['ok'] for database in status.values())
+    return JsonResponse({'ok': healthy, 'databases': status}, status=200 if healthy else 503)
+
+
+def admin_profile_download(request, profile_id, kind):
+    """Download the collapsed stacks (.folded) or SQL trace (.json) of a profile"""
+    if not request.session.get('is_admin'):
+        messages.error(request, 'Please login as admin')
+        return redirect('admin_login')
+
+    from django.http import FileResponse, Http404
+    from .profiling import get_profile_path
+
+    path = get_profile_path(profile_id, kind)
+    if path is None:
+        raise Http404('Profile not found')
+
+    content_type = 'application/json' if kind == 'json' else 'text/plain'
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=path.name, content_type=content_type)
+
+
+# ============= SESSION-CODE BROADCASTS =============
+
+def admin_broadcasts(request):
+    """Announce a session code to all past attendees and follow delivery progress"""
+    if not request.session.get('is_admin'):
+        messages.error(request, 'Please login as admin')
+        return redirect('admin_login')
+
+    from .broadcast import attach_delivery_stats, create_broadcast
+    from .models import Broadcast
+
+    if request.method == 'POST':
+        try:
+            session = ClassSession.objects.get(id=request.POST.get('session_id'))
+            rate = int(request.POST.get('rate_per_minute') or 60)
+        except (ClassSession.DoesNotExist, ValueError):
+            messages.error(request, 'Please choose a session and a valid rate')
+            return redirect('admin_broadcasts')
+        if rate <= 0:
+            messages.error(request, 'Rate must be at least 1 email per minute')
+            return redirect('admin_broadcasts')
+
+        broadcast = create_broadcast(
+            session, rate_per_minute=rate, created_by=request.session.get('admin_username') or ''
+        )
+        messages.success(
+            request,
+            f'📣 Broadcast of "{session.title}" started for {broadcast.total_recipients} recipient(s)!'
+        )
+        return redirect('admin_broadcasts')
+
+    from .throttle import throttle_stats
+
+    broadcasts = attach_delivery_stats(list(Broadcast.objects.select_related('class_session')[:20]))
+
+    context = {
+        'broadcasts': broadcasts,
+        'sessions': ClassSession.objects.order_by('-start_time'),
+        'has_active': any(b.status in (Broadcast.STATUS_PENDING, Broadcast.STATUS_RUNNING) for b in broadcasts),
+        'throttle_stats': throttle_stats(),
+        'admin_username': request.session.get('admin_username'),
+    }
+
+    return render(request, 'survey/admin_broadcasts.html', context)
+
+
+def admin_broadcast_cancel(request, broadcast_id):
+    """Stop queueing a broadcast and drop its undelivered emails"""
+    if not request.session.get('is_admin'):
+        messages.error(request, 'Please login as admin')
+        return redirect('admin_login')
+
+    from .models import Broadcast, EmailOutbox
+
+    if request.method == 'POST':
+        updated = Broadcast.objects.filter(
+            id=broadcast_id, status__in=[Broadcast.STATUS_PENDING, Broadcast.STATUS_RUNNING]
+        ).update(status=Broadcast.STATUS_CANCELLED, finished_at=timezone.now())
+        if updated:
+            dropped, _ = EmailOutbox.objects.filter(
+                broadcast_id=broadcast_id, status=EmailOutbox.STATUS_PENDING
+            ).delete()
+            messages.success(request, f'Broadcast cancelled ({dropped} queued email(s) dropped)')
+        else:
+            messages.error(request, 'Broadcast not found or already finished')
+
+    return redirect('admin_broadcasts')
+
+
+# ============= EXPORTS =============
+
+def admin_export(request, dataset, fmt):
+    """Download attendees, responses, scores or feedback for every session as CSV or XLSX"""
+    if not request.session.get('is_admin'):
+        messages.error(request, 'Please login as admin')
+        return redirect('admin_login')
+
+    from django.http import Http404
+    from .exports import DATASETS, FORMATS, export_response
+
+    if dataset not in DATASETS or fmt not in FORMATS:
+        raise Http404('Unknown export')
+    return export_response(request, dataset, fmt)
+
+
+def admin_session_export(request, session_id, dataset, fmt):
+    """Download one session's attendees, responses, scores or feedback as CSV or XLSX"""
+    if not request.session.get('is_admin'):
+        messages.error(request, 'Please login as admin')
+        return redirect('admin_login')
+
+    from django.http import Http404
+    from .exports import DATASETS, FORMATS, export_response
+
+    if dataset not in DATASETS or fmt not in FORMATS:
+        raise Http404('Unknown export')
+    if not ClassSession.objects.filter(id=session_id).exists():
+        raise Http404('Session not found')
+    return export_response(request, dataset, fmt, session_id=session_id)